@@ -0,0 +1,66 @@
+// Validation for the loosely typed (string or array of strings) CLI args.
+
+export function validateInputs(inputs: undefined | string | boolean | string[]): string[] {
+  if (typeof inputs === 'boolean') {
+    throw new Error(`--input must be a string or array of strings; got ${inputs}`);
+  } else if (inputs === undefined) {
+    return [];
+  } else if (typeof inputs === 'string') {
+    return [inputs];
+  } else {
+    return inputs;
+  }
+}
+
+function validateOneArg(s: string): [string, string] {
+  const i = s.indexOf('=');
+  if (i < 0) {
+    throw new Error(`Each --arg must have an equals sign, but got ${s}`);
+  }
+  return [s.substring(0, i), s.substring(i + 1)];
+}
+
+export function validateInnerArgs(args: undefined | string | boolean | string[]): Record<string, string> {
+  const innerArgs: Record<string, string> = {};
+  if (typeof args === 'boolean') {
+    throw new Error(`--arg must be a string or array of strings; got ${args}`);
+  } else if (typeof args === 'undefined') {
+    // Nothing
+  } else if (typeof args === 'string') {
+    const [k, v] = validateOneArg(args);
+    innerArgs[k] = v;
+  } else {
+    for (const s of args) {
+      const [k, v] = validateOneArg(s);
+      innerArgs[k] = v;
+    }
+  }
+  return innerArgs;
+}
+
+export function validatePositiveInt(name: string, s: string | undefined, fallback: number): number {
+  if (s === undefined) {
+    return fallback;
+  }
+  const n = Number(s);
+  if (!Number.isInteger(n) || n < 1) {
+    throw new Error(`--${name} must be a positive integer; got ${s}`);
+  }
+  return n;
+}
+
+export interface RunLimits {
+  timeoutMs?: number;
+  maxHeapBytes?: number;
+  maxFsBytes?: number;
+}
+
+// The limits given by --timeout (in seconds), --maxHeapMb and --maxFsMb.
+export function validateLimits(args: { timeout?: string, maxHeapMb?: string, maxFsMb?: string }): RunLimits {
+  const mb = 1024 * 1024;
+  return {
+    timeoutMs: args.timeout === undefined ? undefined : validatePositiveInt('timeout', args.timeout, 0) * 1000,
+    maxHeapBytes: args.maxHeapMb === undefined ? undefined : validatePositiveInt('maxHeapMb', args.maxHeapMb, 0) * mb,
+    maxFsBytes: args.maxFsMb === undefined ? undefined : validatePositiveInt('maxFsMb', args.maxFsMb, 0) * mb,
+  };
+}
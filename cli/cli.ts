@@ -10,6 +10,8 @@ const main = defineCommand({
   },
   subCommands: {
     run: () => import('./commands/run').then((r) => r.default),
+    batch: () => import('./commands/batch').then((r) => r.default),
+    serve: () => import('./commands/serve').then((r) => r.default),
   }
 })
 
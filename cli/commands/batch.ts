@@ -0,0 +1,184 @@
+// Example usages:
+// # Convert every jpg in photos/ to png, using 4 warm interpreters.
+// $ npx jiti cli/cli.ts batch convert-image --input 'photos/*.jpg' --outputDir out --arg format=.png --concurrency 4
+// # Strip the exif data from everything in a directory.
+// $ npx jiti cli/cli.ts batch strip-exif --input photos --outputDir out
+import { defineCommand } from 'citty';
+import { availableParallelism } from 'node:os';
+import { mkdirSync, statSync } from 'node:fs';
+import { mkdtemp, rename, rm } from 'node:fs/promises';
+import path from 'node:path';
+import { NodeWorkerPool, PoolJobResult } from '../../utils/worker-pool';
+import { compiledWasmModules } from '../../utils/loaders';
+import { loadScript } from '../../utils/config';
+import { expandInputs } from '../../utils/expand-inputs';
+import { validateInnerArgs, validateInputs, validateLimits, validatePositiveInt } from '../args';
+import { fmtTimings, sumDebug, writeTimingsJson } from '../timings';
+import { FiolinRunDebug } from '../../common/types';
+
+function fmtSecs(ms: number): string {
+  return `${(ms / 1000).toFixed(2)}s`;
+}
+
+export default defineCommand({
+  meta: {
+    name: 'batch',
+    description: 'Run the given fiolin script once per input file, using a pool of workers',
+  },
+  args: {
+    name: {
+      type: 'positional',
+      description: 'The fiolin script to run',
+      required: true,
+    },
+    input: {
+      // Logically a string or array of strings, but we have to validate it.
+      description: 'Input directory, glob (e.g. "photos/*.jpg"), or file; may be repeated',
+      required: true,
+    },
+    outputDir: {
+      type: 'string',
+      description: 'Directory to put output files in (runs whose outputs would overwrite another\'s fail)',
+      required: true,
+    },
+    concurrency: {
+      type: 'string',
+      description: 'Number of worker threads (defaults to the number of cores)',
+    },
+    arg: {
+      // Logically a string or array of strings, but we have to validate it.
+      description: 'Arguments to pass to the script',
+    },
+    cacheDir: {
+      type: 'string',
+      description: 'Directory for caches (e.g. installed packages) shared between runs',
+    },
+    offline: {
+      type: 'boolean',
+      description: 'Only use python packages already in the cacheDir; never download',
+    },
+    cacheResults: {
+      type: 'boolean',
+      description: 'Reuse the results of deterministic scripts run on identical inputs before (requires --cacheDir)',
+    },
+    timeout: {
+      type: 'string',
+      description: 'Stop each run that takes longer than this many seconds (the worker carries on with the next)',
+    },
+    maxHeapMb: {
+      type: 'string',
+      description: 'Stop each run whose interpreter\'s memory grows past this many MiB',
+    },
+    maxFsMb: {
+      type: 'string',
+      description: 'Stop each run whose output and temporary files add up to more than this many MiB',
+    },
+    recycleHeapMb: {
+      type: 'string',
+      description: 'Replace a worker\'s interpreter (in the background) once its memory grows past this many MiB',
+    },
+    timings: {
+      type: 'boolean',
+      description: 'Print how long each phase took, summed over all the runs',
+    },
+    timingsJson: {
+      type: 'string',
+      description: 'Write the timings and byte counts to this file as JSON',
+    },
+    verbose: {
+      type: 'boolean',
+      description: 'Print all the script logs rather than just warnings and errors',
+    },
+  },
+  async run({ args }) {
+    if (args.offline && !args.cacheDir) {
+      throw new Error('--offline requires --cacheDir');
+    }
+    if (args.cacheResults && !args.cacheDir) {
+      throw new Error('--cacheResults requires --cacheDir');
+    }
+    const inputPaths = validateInputs(args.input).flatMap(expandInputs);
+    const innerArgs = validateInnerArgs(args.arg);
+    const concurrency = Math.min(
+      inputPaths.length,
+      validatePositiveInt('concurrency', args.concurrency, availableParallelism()));
+    console.log(`Running ${args.name} on ${inputPaths.length} files with ${concurrency} workers`);
+    const script = loadScript(args.name);
+    const pool = new NodeWorkerPool({
+      size: concurrency, verbose: args.verbose, cacheDir: args.cacheDir,
+      offline: args.offline, cacheResults: args.cacheResults, ...validateLimits(args),
+      recycleHeapBytes: args.recycleHeapMb === undefined ?
+        undefined : validatePositiveInt('recycleHeapMb', args.recycleHeapMb, 0) * 1024 * 1024,
+      wasmModules: await compiledWasmModules((script.runtime.wasmModules || []).map((m) => m.name)),
+    });
+    const start = performance.now();
+    let succeeded = 0;
+    let failed = 0;
+    let bytesIn = 0;
+    const debugs: { input: string, ok: boolean, debug?: FiolinRunDebug }[] = [];
+    // Each run writes into a directory of its own, and its outputs are only
+    // moved into outputDir if no run that finished before it had outputs with
+    // the same names (e.g., a/x.png and b/x.png both becoming x.png);
+    // otherwise it fails rather than overwriting them.
+    mkdirSync(args.outputDir, { recursive: true });
+    const claimed = new Map<string, string>();
+    const claim = (input: string, outputs: string[]): string | undefined => {
+      const clash = outputs.find((o) => claimed.has(o));
+      if (clash) return `output ${clash} clashes with that of ${claimed.get(clash)}`;
+      for (const o of outputs) claimed.set(o, input);
+      return undefined;
+    };
+    const runOne = async (input: string): Promise<PoolJobResult> => {
+      const staging = await mkdtemp(path.join(args.outputDir, '.batch-'));
+      try {
+        const result = await pool.run({
+          fiol: args.name, inputPaths: [input], outputDir: staging, args: innerArgs,
+          measureFs: !!(args.timings || args.timingsJson),
+        });
+        if (!result.ok) return result;
+        const clash = claim(input, result.outputs);
+        if (clash) return { ok: false, error: clash, debug: result.debug };
+        for (const o of result.outputs) {
+          await rename(path.join(staging, o), path.join(args.outputDir, o));
+        }
+        return result;
+      } finally {
+        await rm(staging, { recursive: true, force: true });
+      }
+    };
+    try {
+      await Promise.all(inputPaths.map(async (input) => {
+        const jobStart = performance.now();
+        const result = await runOne(input);
+        const elapsed = fmtSecs(performance.now() - jobStart);
+        debugs.push({ input, ok: result.ok, debug: result.debug });
+        if (result.ok) {
+          succeeded++;
+          bytesIn += statSync(input).size;
+          console.log(`OK   ${input} -> ${result.outputs.join(', ')} (${elapsed})`);
+        } else {
+          failed++;
+          console.error(`FAIL ${input}: ${result.error} (${elapsed})`);
+        }
+      }));
+    } finally {
+      await pool.close();
+    }
+    const secs = (performance.now() - start) / 1000;
+    const filesPerSec = (succeeded + failed) / secs;
+    const mbPerSec = bytesIn / (1024 * 1024) / secs;
+    console.log(
+      `${succeeded} succeeded, ${failed} failed in ${secs.toFixed(2)}s ` +
+      `(${filesPerSec.toFixed(2)} files/s, ${mbPerSec.toFixed(2)} MB/s of input)`);
+    if (args.timings) {
+      const all = debugs.flatMap(({ debug }) => debug ? [debug] : []);
+      console.log(`Timings (summed over ${all.length} runs):\n${fmtTimings(sumDebug(all))}`);
+    }
+    if (args.timingsJson) {
+      writeTimingsJson(args.timingsJson, debugs);
+    }
+    if (failed > 0) {
+      process.exitCode = 1;
+    }
+  },
+});
@@ -1,46 +1,15 @@
 // Example usages:
 // # Run unlock-ppt with one input file (locked.ppt) and outputs dumped in .
 // $ npx jiti cli/cli.ts run unlock-ppt --input locked.ppt --outputDir .
+// # Convert two images at once (split across threads, since convert-image is
+// # perFile)
+// $ npx jiti cli/cli.ts run convert-image --input a.jpg --input b.jpg --arg format=.png --outputDir .
+import { availableParallelism } from 'node:os';
 import { NodeFiolinRunner } from '../../utils/runner';
 import { defineCommand } from 'citty';
-
-function validateInputs(inputs: undefined | string | boolean | string[]): string[] {
-  if (typeof inputs === 'boolean') {
-    throw new Error(`--input must be a string or array of strings; got ${inputs}`);
-  } else if (inputs === undefined) {
-    return [];
-  } else if (typeof inputs === 'string') {
-    return [inputs];
-  } else {
-    return inputs;
-  }
-}
-
-function validateOneArg(s: string): [string, string] {
-  const i = s.indexOf('=');
-  if (i < 0) {
-    throw new Error(`Each --arg must have an equals sign, but got ${s}`);
-  }
-  return [s.substring(0, i), s.substring(i + 1)];
-}
-
-function validateInnerArgs(args: undefined | string | boolean | string[]): Record<string, string> {
-  const innerArgs: Record<string, string> = {};
-  if (typeof args === 'boolean') {
-    throw new Error(`--arg must be a string or array of strings; got ${args}`);
-  } else if (typeof args === 'undefined') {
-    // Nothing
-  } else if (typeof args === 'string') {
-    const [k, v] = validateOneArg(args);
-    innerArgs[k] = v;
-  } else {
-    for (const s of args) {
-      const [k, v] = validateOneArg(s);
-      innerArgs[k] = v;
-    }
-  }
-  return innerArgs;
-}
+import { validateInnerArgs, validateInputs, validateLimits, validatePositiveInt } from '../args';
+import { fmtTimings, writeTimingsJson } from '../timings';
+import { FiolinRunDebug } from '../../common/types';
 
 export default defineCommand({
   meta: {
@@ -65,12 +34,73 @@ export default defineCommand({
     arg: {
       // Logically a string or array of strings, but we have to validate it.
       description: 'Arguments to pass to the script',
-    }
+    },
+    cacheDir: {
+      type: 'string',
+      description: 'Directory for caches (e.g. installed packages) shared between runs',
+    },
+    offline: {
+      type: 'boolean',
+      description: 'Only use python packages already in the cacheDir; never download',
+    },
+    cacheResults: {
+      type: 'boolean',
+      description: 'Reuse the results of deterministic scripts run on identical inputs before (requires --cacheDir)',
+    },
+    timings: {
+      type: 'boolean',
+      description: 'Print how long each phase of the run took',
+    },
+    timingsJson: {
+      type: 'string',
+      description: 'Write the timings and byte counts to this file as JSON',
+    },
+    concurrency: {
+      type: 'string',
+      description: 'Worker threads to split the inputs of per-file scripts across (defaults to the number of cores)',
+    },
+    timeout: {
+      type: 'string',
+      description: 'Stop the script if it runs for longer than this many seconds',
+    },
+    maxHeapMb: {
+      type: 'string',
+      description: 'Stop the script if the interpreter\'s memory grows past this many MiB',
+    },
+    maxFsMb: {
+      type: 'string',
+      description: 'Stop the script if its output and temporary files add up to more than this many MiB',
+    },
   },
   async run({ args }) {
     const inputPaths = validateInputs(args.input);
     const innerArgs = validateInnerArgs(args.arg);
-    const runner = new NodeFiolinRunner(args.name, args.outputDir);
-    await runner.runWithLocalFs(inputPaths, { args: innerArgs });
+    if (args.offline && !args.cacheDir) {
+      throw new Error('--offline requires --cacheDir');
+    }
+    if (args.cacheResults && !args.cacheDir) {
+      throw new Error('--cacheResults requires --cacheDir');
+    }
+    const concurrency = validatePositiveInt('concurrency', args.concurrency, availableParallelism());
+    const runner = new NodeFiolinRunner(args.name, args.outputDir, undefined, {
+      cacheDir: args.cacheDir, offline: args.offline, cacheResults: args.cacheResults,
+      fanOutThreads: concurrency, ...validateLimits(args),
+    });
+    const debugs: FiolinRunDebug[] = [];
+    try {
+      const measureFs = !!(args.timings || args.timingsJson);
+      await runner.runWithLocalFs(inputPaths, { args: innerArgs, measureFs }, (r) => {
+        if (r.debug) debugs.push(r.debug);
+      });
+    } finally {
+      for (const debug of debugs) {
+        if (args.timings) {
+          console.error(`Timings:\n${fmtTimings(debug)}`);
+        }
+        if (args.timingsJson) {
+          writeTimingsJson(args.timingsJson, debug);
+        }
+      }
+    }
   },
 });
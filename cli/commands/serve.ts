@@ -0,0 +1,133 @@
+// Example usages:
+// # Serve every fiol on localhost:8080, with one warm interpreter per core.
+// $ npx jiti cli/cli.ts serve
+// # Serve just convert-image (installing its packages up front) on a socket.
+// $ npx jiti cli/cli.ts serve --fiol convert-image --socket /tmp/fiolin.sock --cacheDir ~/.cache/fiolin
+// # Then, to run it:
+// $ curl --unix-socket /tmp/fiolin.sock -F input=@a.jpg -F format=.png -o a.png http://localhost/run/convert-image
+import { defineCommand } from 'citty';
+import { availableParallelism } from 'node:os';
+import { FiolServer, ListenTarget } from '../../utils/fiol-server';
+import { NodeWorkerPool } from '../../utils/worker-pool';
+import { compiledWasmModules } from '../../utils/loaders';
+import { loadAll } from '../../utils/config';
+import { validateInputs, validateLimits, validatePositiveInt } from '../args';
+
+export default defineCommand({
+  meta: {
+    name: 'serve',
+    description: 'Serve runs of fiolin scripts over HTTP, keeping a pool of warm workers',
+  },
+  args: {
+    fiol: {
+      // Logically a string or array of strings, but we have to validate it.
+      description: 'Fiol to serve, whose packages are installed up front; may be repeated (defaults to all of them)',
+    },
+    port: {
+      type: 'string',
+      description: 'Port to listen on (defaults to 8080)',
+    },
+    host: {
+      type: 'string',
+      description: 'Address to listen on (defaults to 127.0.0.1)',
+    },
+    socket: {
+      type: 'string',
+      description: 'Unix socket to listen on instead of a port',
+    },
+    concurrency: {
+      type: 'string',
+      description: 'Number of worker threads, i.e. runs at once (defaults to the number of cores)',
+    },
+    maxQueue: {
+      type: 'string',
+      description: 'Runs that may wait for a free worker before more are turned away with a 503 (defaults to 4 per worker)',
+    },
+    maxUploadMb: {
+      type: 'string',
+      description: 'Turn away requests whose body is bigger than this many MiB (defaults to 100)',
+    },
+    cacheDir: {
+      type: 'string',
+      description: 'Directory for caches (e.g. installed packages) shared between runs',
+    },
+    offline: {
+      type: 'boolean',
+      description: 'Only use python packages already in the cacheDir; never download',
+    },
+    cacheResults: {
+      type: 'boolean',
+      description: 'Reuse the results of deterministic scripts run on identical inputs before (requires --cacheDir)',
+    },
+    timeout: {
+      type: 'string',
+      description: 'Stop each run that takes longer than this many seconds',
+    },
+    maxHeapMb: {
+      type: 'string',
+      description: 'Stop each run whose interpreter\'s memory grows past this many MiB',
+    },
+    maxFsMb: {
+      type: 'string',
+      description: 'Stop each run whose output and temporary files add up to more than this many MiB',
+    },
+    recycleHeapMb: {
+      type: 'string',
+      description: 'Replace a worker\'s interpreter (in the background) once its memory grows past this many MiB',
+    },
+    verbose: {
+      type: 'boolean',
+      description: 'Print all the script logs rather than just warnings and errors',
+    },
+  },
+  async run({ args }) {
+    if (args.offline && !args.cacheDir) {
+      throw new Error('--offline requires --cacheDir');
+    }
+    if (args.cacheResults && !args.cacheDir) {
+      throw new Error('--cacheResults requires --cacheDir');
+    }
+    if (args.socket && (args.port || args.host)) {
+      throw new Error('--socket can\'t be combined with --port or --host');
+    }
+    const all = await loadAll();
+    const warm = validateInputs(args.fiol);
+    for (const fiol of warm) {
+      if (!all[fiol]) throw new Error(`No such fiol: ${fiol}`);
+    }
+    const fiols = warm.length > 0 ? warm : Object.keys(all);
+    const concurrency = validatePositiveInt('concurrency', args.concurrency, availableParallelism());
+    const maxQueue = args.maxQueue === '0' ? 0 : validatePositiveInt('maxQueue', args.maxQueue, 4 * concurrency);
+    const wasmNames = new Set(fiols.flatMap((f) => (all[f].runtime.wasmModules || []).map((m) => m.name)));
+    const pool = new NodeWorkerPool({
+      size: concurrency, verbose: args.verbose, cacheDir: args.cacheDir,
+      offline: args.offline, cacheResults: args.cacheResults, ...validateLimits(args),
+      recycleHeapBytes: args.recycleHeapMb === undefined ?
+        undefined : validatePositiveInt('recycleHeapMb', args.recycleHeapMb, 0) * 1024 * 1024,
+      wasmModules: await compiledWasmModules([...wasmNames]),
+      warm,
+    });
+    const server = new FiolServer(pool, {
+      fiols, maxQueue,
+      maxBodyBytes: validatePositiveInt('maxUploadMb', args.maxUploadMb, 100) * 1024 * 1024,
+    });
+    const target: ListenTarget = args.socket ?
+      { socket: args.socket } :
+      { port: validatePositiveInt('port', args.port, 8080), host: args.host || '127.0.0.1' };
+    await server.listen(target);
+    console.log(
+      `Serving ${fiols.length} fiols with ${concurrency} workers on ` +
+      ('socket' in target ? target.socket : `http://${target.host}:${target.port}`));
+    await new Promise<void>((resolve) => {
+      const stop = () => {
+        console.log('Shutting down once the runs in progress finish');
+        server.close().then(resolve, (e) => {
+          console.error(e);
+          resolve();
+        });
+      };
+      process.once('SIGINT', stop);
+      process.once('SIGTERM', stop);
+    });
+  },
+});
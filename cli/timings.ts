@@ -0,0 +1,44 @@
+// Formatting for the debug info (timings and byte counts) of runs.
+import { writeFileSync } from 'node:fs';
+import { FiolinMemoryUsage, FiolinRunDebug, FiolinRunPhase } from '../common/types';
+import { maxMemory } from '../common/fan-out';
+
+function fmtBytes(n: number): string {
+  if (n < 1024) return `${n}B`;
+  if (n < 1024 * 1024) return `${(n / 1024).toFixed(1)}KiB`;
+  return `${(n / (1024 * 1024)).toFixed(1)}MiB`;
+}
+
+export function fmtTimings(debug: FiolinRunDebug): string {
+  const lines = debug.timings.map(([phase, ms]) => `  ${phase.padEnd(16)}${ms.toFixed(1).padStart(10)}ms`);
+  lines.push(`  ${'TOTAL'.padEnd(16)}${debug.totalMs.toFixed(1).padStart(10)}ms`);
+  lines.push(`  in: ${fmtBytes(debug.bytesIn)}, out: ${fmtBytes(debug.bytesOut)}`);
+  if (debug.memory) {
+    const { heapBytes, fsBytes } = debug.memory;
+    lines.push(`  heap: ${fmtBytes(heapBytes)}` + (fsBytes !== undefined ? `, scratch files: ${fmtBytes(fsBytes)}` : ''));
+  }
+  return lines.join('\n');
+}
+
+// Adds up the debug info from several runs (taking the peak memory use).
+export function sumDebug(debugs: FiolinRunDebug[]): FiolinRunDebug {
+  const timings = new Map<FiolinRunPhase, number>();
+  let totalMs = 0;
+  let bytesIn = 0;
+  let bytesOut = 0;
+  let memory: FiolinMemoryUsage | undefined;
+  for (const d of debugs) {
+    for (const [phase, ms] of d.timings) {
+      timings.set(phase, (timings.get(phase) || 0) + ms);
+    }
+    totalMs += d.totalMs;
+    bytesIn += d.bytesIn;
+    bytesOut += d.bytesOut;
+    memory = maxMemory(memory, d.memory);
+  }
+  return { timings: [...timings.entries()], totalMs, bytesIn, bytesOut, memory };
+}
+
+export function writeTimingsJson(path: string, data: unknown) {
+  writeFileSync(path, JSON.stringify(data, null, 2) + '\n');
+}
@@ -0,0 +1,67 @@
+import { describe, expect, it } from 'vitest';
+import { buildAutocompleteIndex, queryAutocompleteIndex, tokenize } from './autocomplete-index';
+import { AutocompleteSuggestion } from './types';
+
+function mkSuggestion(id: string, title: string, description: string, extensions?: string[]): AutocompleteSuggestion {
+  return { id, link: `/s/${id}/`, meta: { title, description, extensions } };
+}
+
+const suggestions = [
+  mkSuggestion('convert-image', 'Convert Image', 'Convert images between formats.', ['png', 'jpg', 'gif']),
+  mkSuggestion('merge-pdf', 'Merge PDFs', 'Combine multiple PDFs into one.', ['pdf']),
+  mkSuggestion('favicon', 'Favicon Generator', 'Make a favicon from a PNG image.', ['ico', 'png']),
+  mkSuggestion('extract-tar', 'Extract Tar', 'Extract files from a tarball.', ['tar', 'gz']),
+];
+
+function titles(query: string, maxResults = 5): string[] {
+  const index = buildAutocompleteIndex(suggestions);
+  return queryAutocompleteIndex(index, query, maxResults).map(([_, title]) => title);
+}
+
+describe('tokenize', () => {
+  it('splits on punctuation and lowercases', () => {
+    expect(tokenize('Merge PDFs, *.png files')).toEqual(['merge', 'pdfs', 'png', 'files']);
+  });
+});
+
+describe('autocomplete index', () => {
+  it('survives a JSON round trip', () => {
+    const index = buildAutocompleteIndex(suggestions);
+    const copy = JSON.parse(JSON.stringify(index));
+    expect(queryAutocompleteIndex(copy, 'pdf', 5)).toEqual(queryAutocompleteIndex(index, 'pdf', 5));
+  });
+
+  it('matches partial terms', () => {
+    expect(titles('mer')).toEqual(['Merge PDFs']);
+    expect(titles('tarb')).toEqual(['Extract Tar']);
+  });
+
+  it('matches short queries anywhere in a term', () => {
+    expect(titles('fa')).toEqual(['Favicon Generator']);
+    expect(titles('rg')).toEqual(['Merge PDFs']);
+    expect(titles('x')).toEqual(['Extract Tar']);
+    expect(titles('q')).toEqual([]);
+  });
+
+  it('only matches terms containing the whole query', () => {
+    // "abcab" has all the trigrams of "bcabc" (and "abcabc") but neither term.
+    const index = buildAutocompleteIndex([mkSuggestion('x', 'X', 'abcab')]);
+    expect(queryAutocompleteIndex(index, 'bcab', 5)).toEqual([['/s/x/', 'X']]);
+    expect(queryAutocompleteIndex(index, 'bcabc', 5)).toEqual([]);
+    expect(queryAutocompleteIndex(index, 'abcabc', 5)).toEqual([]);
+  });
+
+  it('ranks exact and extension matches higher', () => {
+    // Both mention png as an extension, but favicon also has it in the text.
+    expect(titles('png')).toEqual(['Favicon Generator', 'Convert Image']);
+    expect(titles('.gif')).toEqual(['Convert Image']);
+    // Convert Image has both "image" and the partial match "images".
+    expect(titles('image')).toEqual(['Convert Image', 'Favicon Generator']);
+  });
+
+  it('sums over query terms and limits the results', () => {
+    // Ties go to the earlier suggestion.
+    expect(titles('extract png')).toEqual(['Favicon Generator', 'Convert Image', 'Extract Tar']);
+    expect(titles('extract png', 1)).toEqual(['Favicon Generator']);
+  });
+});
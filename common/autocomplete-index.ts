@@ -0,0 +1,127 @@
+import { AutocompleteIndex, AutocompleteSuggestion } from './types';
+
+// How much a term counts for, per occurrence, depending on where it's from.
+// File extensions are the most telling thing someone can type.
+const TEXT_WEIGHT = 1;
+const EXTENSION_WEIGHT = 2;
+// Multiplier for query terms that match a term exactly rather than partially.
+const EXACT_MATCH_MULTIPLIER = 3;
+
+// Lowercases and splits on anything but letters and numbers, so that e.g.
+// "PDFs," or ".png" match "pdfs" and "png".
+export function tokenize(s: string): string[] {
+  return s.toLowerCase().split(/[^\p{L}\p{N}]+/u).filter((t) => t !== '');
+}
+
+function gramsOf(term: string): string[] {
+  const grams: string[] = [];
+  for (let i = 0; i + 3 <= term.length; i++) {
+    grams.push(term.substring(i, i + 3));
+  }
+  return grams;
+}
+
+export function buildAutocompleteIndex(suggestions: AutocompleteSuggestion[]): AutocompleteIndex {
+  const termIds = new Map<string, number>();
+  const terms: string[] = [];
+  const postings: Map<number, number>[] = [];
+  const grams: Record<string, number[]> = {};
+  suggestions.forEach((s, doc) => {
+    const weighted: [string, number][] = [
+      ...tokenize(s.meta.title).map((t): [string, number] => [t, TEXT_WEIGHT]),
+      ...tokenize(s.meta.description).map((t): [string, number] => [t, TEXT_WEIGHT]),
+      ...(s.meta.extensions || []).flatMap(tokenize).map((t): [string, number] => [t, EXTENSION_WEIGHT]),
+    ];
+    for (const [term, weight] of weighted) {
+      let id = termIds.get(term);
+      if (id === undefined) {
+        id = terms.length;
+        termIds.set(term, id);
+        terms.push(term);
+        postings.push(new Map());
+        for (const g of new Set(gramsOf(term))) {
+          // Term ids are assigned in ascending order, so these stay sorted.
+          (grams[g] ||= []).push(id);
+        }
+      }
+      postings[id].set(doc, (postings[id].get(doc) || 0) + weight);
+    }
+  });
+  return {
+    docs: suggestions.map((s) => [s.link, s.meta.title]),
+    terms,
+    postings: postings.map((p) => [...p.entries()].flat()),
+    grams,
+  };
+}
+
+// Intersects ascending lists of ids.
+function intersect(lists: number[][]): number[] {
+  lists.sort((a, b) => a.length - b.length);
+  let result = lists[0];
+  for (const list of lists.slice(1)) {
+    const next: number[] = [];
+    let j = 0;
+    for (const id of result) {
+      while (j < list.length && list[j] < id) j++;
+      if (j === list.length) break;
+      if (list[j] === id) next.push(id);
+    }
+    result = next;
+  }
+  return result;
+}
+
+// The ids of the terms containing q.
+function matchingTerms(index: AutocompleteIndex, q: string): number[] {
+  if (q.length < 3) {
+    // Too short to have trigrams, so the terms are scanned instead.
+    const ids: number[] = [];
+    index.terms.forEach((term, id) => {
+      if (term.includes(q)) ids.push(id);
+    });
+    return ids;
+  }
+  const lists: number[][] = [];
+  for (let i = 0; i + 3 <= q.length; i++) {
+    const ids = index.grams[q.substring(i, i + 3)];
+    if (!ids) return [];
+    lists.push(ids);
+  }
+  // Having all of q's trigrams doesn't guarantee containing q itself.
+  return intersect(lists).filter((id) => index.terms[id].includes(q));
+}
+
+// Keeps the k highest scores, with ties going to the earlier doc.
+function topK(scores: Map<number, number>, k: number): number[] {
+  const top: [number, number][] = [];
+  for (const [doc, score] of scores) {
+    if (top.length === k && !beats(score, doc, top[k - 1])) continue;
+    let i = top.length === k ? k - 1 : top.length;
+    while (i > 0 && beats(score, doc, top[i - 1])) i--;
+    top.splice(i, 0, [score, doc]);
+    if (top.length > k) top.pop();
+  }
+  return top.map(([_, doc]) => doc);
+}
+
+function beats(score: number, doc: number, other: [number, number]): boolean {
+  return score > other[0] || (score === other[0] && doc < other[1]);
+}
+
+// Scores each suggestion matching any of the query's terms, returning the
+// [link, title] of the best (at most maxResults) of them.
+export function queryAutocompleteIndex(index: AutocompleteIndex, query: string, maxResults: number): [string, string][] {
+  const scores = new Map<number, number>();
+  for (const q of new Set(tokenize(query))) {
+    for (const id of matchingTerms(index, q)) {
+      const multiplier = index.terms[id] === q ? EXACT_MATCH_MULTIPLIER : 1;
+      const posting = index.postings[id];
+      for (let i = 0; i < posting.length; i += 2) {
+        const doc = posting[i];
+        scores.set(doc, (scores.get(doc) || 0) + posting[i + 1] * multiplier);
+      }
+    }
+  }
+  return topK(scores, maxResults).map((doc) => index.docs[doc]);
+}
@@ -1,5 +1,5 @@
 import { loadPyodide } from 'pyodide';
-import { readFile } from './emscripten-fs';
+import { mountMemfs, readBlob, readFile, unmountIfMounted, writeBlob, writeFile } from './emscripten-fs';
 import { describe, expect, it } from 'vitest';
 
 const indexUrl = (() => {
@@ -22,4 +22,26 @@ describe('emscripten-fs utils', () => {
       readFile(pyodide.FS, '/nonexistent', pyodide.ERRNO_CODES);
     }).toThrow(/\[ENOENT \(errno=44\)\]/);
   });
+
+  it('copies blobs in and out in chunks', async () => {
+    const pyodide = await loadPyodide({ indexURL: indexUrl });
+    const contents = new Uint8Array(9 * 1024 * 1024 + 17);
+    for (let i = 0; i < contents.length; i++) contents[i] = i % 251;
+    await writeBlob(pyodide.FS, '/tmp/big', new Blob([contents]), pyodide.ERRNO_CODES);
+    expect(pyodide.FS.stat('/tmp/big').size).toEqual(contents.length);
+    const blob = readBlob(pyodide.FS, '/tmp/big', pyodide.ERRNO_CODES);
+    expect(new Uint8Array(await blob.arrayBuffer())).toEqual(contents);
+  });
+
+  it('replaces mounted directories wholesale', async () => {
+    const pyodide = await loadPyodide({ indexURL: indexUrl });
+    mountMemfs(pyodide.FS, '/scratch', pyodide.ERRNO_CODES);
+    writeFile(pyodide.FS, '/scratch/foo', 'foo', pyodide.ERRNO_CODES);
+    mountMemfs(pyodide.FS, '/scratch', pyodide.ERRNO_CODES);
+    expect(pyodide.FS.readdir('/scratch')).toEqual(['.', '..']);
+    writeFile(pyodide.FS, '/scratch/bar', 'bar', pyodide.ERRNO_CODES);
+    expect(unmountIfMounted(pyodide.FS, '/scratch', pyodide.ERRNO_CODES)).toBe(true);
+    expect(pyodide.FS.readdir('/scratch')).toEqual(['.', '..']);
+    expect(unmountIfMounted(pyodide.FS, '/nonexistent', pyodide.ERRNO_CODES)).toBe(false);
+  });
 });
@@ -42,6 +42,42 @@ export function mkDir(fs: any, path: string, errCodes?: ErrnoCodes) {
   }
 }
 
+// Mounts a fresh, empty MEMFS at path (creating the directory if need be),
+// first unmounting whatever was already mounted there.
+export function mountMemfs(fs: any, path: string, errCodes?: ErrnoCodes) {
+  if (!unmountIfMounted(fs, path, errCodes)) {
+    mkDir(fs, path, errCodes);
+  }
+  try {
+    fs.mount(fs.filesystems.MEMFS, {}, path);
+  } catch (e) {
+    throw toErrWithErrno(e, { prefix: `mount("${path}") failed`, errCodes });
+  }
+}
+
+// Unmounts the file system mounted at path, if any. Unlike deleting its
+// contents, this doesn't visit (or stat) each file in it. Returns false if
+// path doesn't exist at all.
+export function unmountIfMounted(fs: any, path: string, errCodes?: ErrnoCodes): boolean {
+  let node: any;
+  try {
+    // Without follow_mount, this is the directory mounted on rather than the
+    // root of what's mounted there.
+    node = fs.lookupPath(path, { follow_mount: false }).node;
+  } catch (e) {
+    if (isNotFound(e)) return false;
+    throw toErrWithErrno(e, { prefix: `lookupPath("${path}") failed`, errCodes });
+  }
+  if (fs.isMountpoint(node)) {
+    try {
+      fs.unmount(path);
+    } catch (e) {
+      throw toErrWithErrno(e, { prefix: `unmount("${path}") failed`, errCodes });
+    }
+  }
+  return true;
+}
+
 export function rmRf(fs: any, path: string, errCodes?: ErrnoCodes) {
   try {
     const stats = fs.stat(path);
@@ -78,6 +114,55 @@ export function writeFile(fs: any, path: string, contents: string | ArrayBuffer,
   }
 }
 
+// Size of the pieces writeBlob/readBlob copy at a time.
+const BLOB_CHUNK_SIZE = 4 * 1024 * 1024;
+
+// Like writeFile, but copies the Blob a chunk at a time so that its contents
+// never have to be in the JS heap all at once.
+export async function writeBlob(fs: any, path: string, blob: Blob, errCodes?: ErrnoCodes) {
+  let stream: any;
+  try {
+    stream = fs.open(path, 'w');
+    // Allocate the whole file up front rather than growing it as we go.
+    fs.ftruncate(stream.fd, blob.size);
+  } catch (e) {
+    throw toErrWithErrno(e, { prefix: `writeBlob("${path}") failed`, errCodes });
+  }
+  try {
+    for (let pos = 0; pos < blob.size; pos += BLOB_CHUNK_SIZE) {
+      const chunk = new Uint8Array(await blob.slice(pos, pos + BLOB_CHUNK_SIZE).arrayBuffer());
+      fs.write(stream, chunk, 0, chunk.length);
+    }
+  } catch (e) {
+    throw toErrWithErrno(e, { prefix: `writeBlob("${path}") failed`, errCodes });
+  } finally {
+    fs.close(stream);
+  }
+}
+
+// Like readFile, but copies the file out a chunk at a time into a Blob, so that
+// the browser is free to page it out of memory (and so that callers can free
+// the file from MEMFS afterwards without a second full copy ever existing).
+export function readBlob(fs: any, path: string, errCodes?: ErrnoCodes): Blob {
+  try {
+    const size: number = fs.stat(path).size;
+    const stream = fs.open(path, 'r');
+    try {
+      const chunks: Blob[] = [];
+      for (let pos = 0; pos < size; pos += BLOB_CHUNK_SIZE) {
+        const chunk = new Uint8Array(Math.min(BLOB_CHUNK_SIZE, size - pos));
+        const n = fs.read(stream, chunk, 0, chunk.length, pos);
+        chunks.push(new Blob([chunk.subarray(0, n)]));
+      }
+      return new Blob(chunks);
+    } finally {
+      fs.close(stream);
+    }
+  } catch (e) {
+    throw toErrWithErrno(e, { prefix: `readBlob("${path}") failed`, errCodes });
+  }
+}
+
 export function listDir(fs: any, path: string, recursive?: boolean, errCodes?: ErrnoCodes): string[] {
   const files: string[] = [];
   const dirs: string[] = [path];
@@ -92,7 +177,6 @@ export function listDir(fs: any, path: string, recursive?: boolean, errCodes?: E
     for (let f of dlist) {
       if (f === '.' || f === '..') continue;
       f = pathJoin(path, f);
-      console.log(f);
       files.push(f);
       // Note: bug in emscripten file system; /proc/self/fd doesn't (yet)
       // support stat action.
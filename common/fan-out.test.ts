@@ -0,0 +1,83 @@
+import { describe, expect, it } from 'vitest';
+import { canFanOut, fanOut, mergeResponses } from './fan-out';
+import { getStdout, mkFile, mkRunner, mkScript } from './runner-test-util';
+import { FiolinScript } from './types';
+
+function perFile(script: FiolinScript): FiolinScript {
+  script.interface.inputFiles = 'SINGLE';
+  script.interface.outputFiles = 'SINGLE';
+  script.interface.perFile = true;
+  return script;
+}
+
+const upperScript = perFile(mkScript(`
+  import fiolin
+  with open(fiolin.get_input_path()) as f:
+    contents = f.read()
+  print(f'processing {fiolin.get_input_basename()}')
+  with open(f'/output/{fiolin.get_input_basename()}', 'w') as f:
+    f.write(contents.upper())
+`));
+
+describe('canFanOut', () => {
+  it('only splits perFile scripts with several inputs, no event and no canvas', () => {
+    const inputs = [mkFile('a', 'a'), mkFile('b', 'b')];
+    expect(canFanOut(upperScript, { inputs })).toBe(true);
+    expect(canFanOut(upperScript, { inputs: inputs.slice(1) })).toBe(false);
+    expect(canFanOut(mkScript(''), { inputs })).toBe(false);
+    const canvas = perFile(mkScript(''));
+    canvas.interface.form = { children: [{ type: 'CANVAS', name: 'preview', height: 1, width: 1 }] };
+    expect(canFanOut(canvas, { inputs })).toBe(false);
+  });
+});
+
+describe('mergeResponses', () => {
+  it('renames clashing outputs and reports the first error', async () => {
+    const request = { inputs: [mkFile('a', ''), mkFile('b', ''), mkFile('c', '')] };
+    const merged = await mergeResponses(request, [
+      { outputs: [mkFile('out.txt', 'a')], log: [['INFO', 'a']] },
+      { outputs: [mkFile('out.txt', 'b')], log: [['INFO', 'b']] },
+      { outputs: [], log: [['ERROR', 'c']], error: new Error('c failed'), lineno: 3 },
+    ], 10);
+    expect(merged.outputs.map((f) => f.name)).toEqual(['out.txt', 'out-2.txt']);
+    expect(await merged.outputs[1].text()).toEqual('b');
+    expect(merged.error?.message).toEqual('c failed');
+    expect(merged.lineno).toEqual(3);
+    expect(merged.log.filter(([ll, _]) => ll !== 'DEBUG')).toEqual([
+      ['INFO', 'a'], ['INFO', 'b'], ['ERROR', 'c'],
+    ]);
+    expect(merged.debug?.totalMs).toEqual(10);
+  });
+});
+
+describe('fanOut', () => {
+  it('runs each input separately and merges the results', async () => {
+    const inputs = [mkFile('a.txt', 'foo'), mkFile('b.txt', 'bar'), mkFile('c.txt', 'baz')];
+    const response = await fanOut([mkRunner(), mkRunner()], upperScript, { inputs });
+    expect(response.error).toBeUndefined();
+    expect(response.outputs.map((f) => f.name).sort()).toEqual(['a.txt', 'b.txt', 'c.txt']);
+    expect(await Promise.all(response.outputs.map((f) => f.text()))).toEqual(['FOO', 'BAR', 'BAZ']);
+    expect(getStdout(response)).toEqual('processing a.txt\nprocessing b.txt\nprocessing c.txt\n');
+    expect(response.debug?.bytesIn).toEqual(9);
+  });
+
+  it('zips the merged outputs together', async () => {
+    const script = perFile(mkScript(`
+      import fiolin
+      fiolin.cp(fiolin.get_input_path(), f'/output/{fiolin.get_input_basename()}')
+      fiolin.zip_outputs()
+    `));
+    const inputs = [mkFile('a.txt', 'foo'), mkFile('b.txt', 'bar')];
+    const response = await fanOut([mkRunner(), mkRunner()], script, { inputs });
+    expect(response.error).toBeUndefined();
+    expect(response.outputs.map((f) => f.name)).toEqual(['output.zip']);
+    expect(response.zipRequested).toBeUndefined();
+  });
+
+  it('is used by a single runner given several inputs', async () => {
+    const inputs = [mkFile('a.txt', 'foo'), mkFile('b.txt', 'bar')];
+    const response = await mkRunner().run(upperScript, { inputs });
+    expect(response.error).toBeUndefined();
+    expect(await Promise.all(response.outputs.map((f) => f.text()))).toEqual(['FOO', 'BAR']);
+  });
+});
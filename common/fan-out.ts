@@ -0,0 +1,124 @@
+import { toErr } from './errors';
+import { hasCanvas } from './form-utils';
+import { FiolinFormEvent, FiolinLogLevel, FiolinMemoryUsage, FiolinRunner, FiolinRunPhase, FiolinRunRequest, FiolinRunResponse, FiolinScript, FormUpdate, RUN_PHASES } from './types';
+import { zipFiles } from './zip';
+
+// Whether the request may be split into one run per input (see
+// FiolinScriptInterface.perFile). Form events belong to a particular
+// interaction, so those runs are never split. Nor are runs of scripts with
+// canvases, which only one of the runners (e.g., the main web worker) can
+// draw on.
+export function canFanOut(script: FiolinScript, request: { inputs: unknown[], event?: FiolinFormEvent }): boolean {
+  if (!script.interface.perFile || request.inputs.length <= 1 || request.event) return false;
+  return !(script.interface.form && hasCanvas(script.interface.form));
+}
+
+// One request per input; everything else is shared. Zipping is left to the
+// merge, so that the outputs of all the runs end up in the same archive.
+export function splitRequest(request: FiolinRunRequest): FiolinRunRequest[] {
+  return request.inputs.map((input) => ({ ...request, inputs: [input], skipZip: true }));
+}
+
+// Renames name (e.g. foo.png -> foo-2.png) until it isn't already taken.
+function uniqueName(name: string, taken: Set<string>): string {
+  let unique = name;
+  const dot = name.lastIndexOf('.');
+  const [stem, ext] = dot > 0 ? [name.substring(0, dot), name.substring(dot)] : [name, ''];
+  for (let i = 2; taken.has(unique); i++) {
+    unique = `${stem}-${i}${ext}`;
+  }
+  taken.add(unique);
+  return unique;
+}
+
+// Merges the responses to the requests from splitRequest(request) (in the same
+// order) into a response to request itself. The logs are concatenated (each
+// headed by the name of its input), outputs with clashing names are renamed,
+// and the first error (if any) is reported; the outputs of the runs that
+// succeeded are kept regardless. wallMs is the time taken by the runs as a
+// whole, which (if they ran in parallel) is less than the sum of their times.
+export async function mergeResponses(request: FiolinRunRequest, responses: FiolinRunResponse[], wallMs: number): Promise<FiolinRunResponse> {
+  const log: [FiolinLogLevel, string][] = [];
+  const formUpdates: FormUpdate[] = [];
+  const taken = new Set<string>();
+  const timings = new Map<FiolinRunPhase, number>();
+  let outputs: File[] = [];
+  const merged: Pick<FiolinRunResponse, 'error' | 'lineno' | 'partial' | 'zipRequested'> = {};
+  let bytesIn = 0;
+  let bytesOut = 0;
+  let memory: FiolinMemoryUsage | undefined;
+  responses.forEach((response, i) => {
+    log.push(['DEBUG', `Input ${i + 1} of ${responses.length}: ${request.inputs[i].name}`]);
+    log.push(...response.log);
+    formUpdates.push(...(response.formUpdates || []));
+    for (const f of response.outputs) {
+      const name = uniqueName(f.name, taken);
+      outputs.push(name === f.name ? f : new File([f], name));
+    }
+    if (response.error && !merged.error) {
+      merged.error = response.error;
+      merged.lineno = response.lineno;
+    }
+    merged.partial ||= response.partial;
+    merged.zipRequested ||= response.zipRequested;
+    for (const [phase, ms] of response.debug?.timings || []) {
+      timings.set(phase, (timings.get(phase) || 0) + ms);
+    }
+    bytesIn += response.debug?.bytesIn || 0;
+    bytesOut += response.debug?.bytesOut || 0;
+    memory = maxMemory(memory, response.debug?.memory);
+  });
+  if (merged.zipRequested && !request.skipZip) {
+    merged.zipRequested = undefined;
+    if (outputs.length > 0) {
+      const start = performance.now();
+      outputs = [await zipFiles(outputs)];
+      timings.set('ZIP', (timings.get('ZIP') || 0) + performance.now() - start);
+      bytesOut = outputs[0].size;
+    }
+  }
+  return {
+    outputs, log, formUpdates, ...merged,
+    debug: {
+      timings: RUN_PHASES.filter((p) => timings.has(p)).map((p) => [p, timings.get(p)!]),
+      totalMs: wallMs,
+      bytesIn, bytesOut, memory,
+    },
+  };
+}
+
+// The most memory used by either run; the runs may have been on different
+// interpreters, so adding them up would mean nothing.
+export function maxMemory(a?: FiolinMemoryUsage, b?: FiolinMemoryUsage): FiolinMemoryUsage | undefined {
+  if (!a || !b) return a || b;
+  const fsBytes = a.fsBytes === undefined || b.fsBytes === undefined ?
+    a.fsBytes ?? b.fsBytes :
+    Math.max(a.fsBytes, b.fsBytes);
+  return { heapBytes: Math.max(a.heapBytes, b.heapBytes), fsBytes };
+}
+
+// Runs each input of the request separately, spread across the given runners
+// (each running one input at a time), and merges the responses. If set,
+// forceReload applies to the first run on each runner.
+export async function fanOut(runners: FiolinRunner[], script: FiolinScript, request: FiolinRunRequest, forceReload?: boolean): Promise<FiolinRunResponse> {
+  if (runners.length === 0) {
+    throw new Error('fanOut requires at least one runner');
+  }
+  const start = performance.now();
+  const requests = splitRequest(request);
+  const responses: FiolinRunResponse[] = new Array(requests.length);
+  let next = 0;
+  await Promise.all(runners.map(async (runner) => {
+    let reload = forceReload;
+    while (next < requests.length) {
+      const i = next++;
+      try {
+        responses[i] = await runner.run(script, requests[i], reload);
+      } catch (e) {
+        responses[i] = { outputs: [], log: [], error: toErr(e) };
+      }
+      reload = false;
+    }
+  }));
+  return mergeResponses(request, responses, performance.now() - start);
+}
@@ -93,6 +93,18 @@ export function idToComponentMap(form: FiolinForm): FiolinFormComponentMap<Fioli
   return map;
 }
 
+// Whether the form has a canvas anywhere in it.
+export function hasCanvas(form: FiolinForm): boolean {
+  return form.children.some(hasCanvasHelper);
+}
+
+function hasCanvasHelper(component: FiolinFormComponent): boolean {
+  if (component.type === 'CANVAS') return true;
+  if (component.type === 'DIV') return component.children.some(hasCanvasHelper);
+  if (component.type === 'LABEL') return hasCanvasHelper(component.child);
+  return false;
+}
+
 function formToIdsHelper(component: FiolinFormComponent, map: FiolinFormComponentMapImpl<FiolinFormComponent>) {
   const id = maybeComponentToId(component);
   if (id !== undefined) {
@@ -0,0 +1,7 @@
+// SHA-256 of the given data as a hex string. Uses WebCrypto, so it works the
+// same in node, the browser, and web workers.
+export async function sha256Hex(data: string | ArrayBuffer | ArrayBufferView): Promise<string> {
+  const bytes = typeof data === 'string' ? new TextEncoder().encode(data) : data;
+  const digest = await crypto.subtle.digest('SHA-256', bytes);
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+}
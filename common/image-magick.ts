@@ -1,20 +1,116 @@
 import { PyodideInterface } from 'pyodide';
-import { FiolinWasmLoader } from './types';
+import { FiolinWasmLoader, ICanvasRenderingContext2D } from './types';
 import * as im from '@imagemagick/magick-wasm';
 import { isNotFound, mkDir, rmRf, toErrWithErrno } from './emscripten-fs';
 import { dedent } from './indent';
 
+// The interpreter whose FS is currently mounted at /py.
+let mountedOn: PyodideInterface | undefined;
+// ImageMagick is a singleton, so it only needs initializing once per realm;
+// later loads (new runners, interpreter reloads) just activate it.
+let initialized: Promise<void> | undefined;
+
+// Copies the image's pixels onto the canvas in one bulk copy (rather than
+// crossing the python/js boundary once per byte).
+function drawToCanvas(ctx: ICanvasRenderingContext2D, img: im.IMagickImage, x: number, y: number, width?: number, height?: number) {
+  const w = img.width;
+  const h = img.height;
+  if ((width !== undefined && width !== w) || (height !== undefined && height !== h)) {
+    throw new Error(`Expected image to be ${width}x${height}; got ${w}x${h}`);
+  }
+  img.write(im.MagickFormat.Rgba, (rgba) => {
+    if (rgba.length !== w * h * 4) {
+      throw new Error(`Expected image data to have length ${w}x${h}x4 = ${w * h * 4}; got ${rgba.length}`);
+    }
+    const imgData = ctx.createImageData(w, h);
+    imgData.data.set(rgba);
+    ctx.putImageData(imgData, x, y);
+  });
+}
+
+// Clears the canvas and draws a copy of the image, resized (by ImageMagick) to
+// fit within width x height and centered.
+function drawPreview(ctx: ICanvasRenderingContext2D, img: im.IMagickImage, width: number, height: number) {
+  img.clone((copy) => {
+    copy.resize(width, height);
+    const x = Math.floor((width - copy.width) / 2);
+    const y = Math.floor((height - copy.height) / 2);
+    ctx.clearRect(0, 0, width, height);
+    drawToCanvas(ctx, copy, x, y);
+  });
+}
+
+function imFs(): any {
+  return (im.ImageMagick as any)._api.FS;
+}
+
+// Reads an image straight from the python file system (via the /py mount)
+// into ImageMagick, without the bytes ever passing through python or js.
+function readImage(path: string): im.IMagickImage {
+  const img = im.MagickImage.create();
+  try {
+    img.read(`/py${path}`);
+  } catch (e) {
+    img.dispose();
+    throw e;
+  }
+  return img;
+}
+
+// Encodes an image (or collection) and writes it straight into the python file
+// system; the only copy is from ImageMagick's buffer into the file.
+function writeImage(img: im.IMagickImage | im.IMagickImageCollection, path: string, format: im.MagickFormat) {
+  img.write(format, (data) => { imFs().writeFile(`/py${path}`, data) });
+}
+
+// A copy of the image that (unlike MagickImage.clone's) outlives the call.
+// The public API has no way to keep a native clone, so the image is encoded to
+// MIFF (ImageMagick's native lossless format) and decoded again; that's exact,
+// but costs about as much as reading the image, so it's best kept to small
+// images.
+function cloneImage(img: im.IMagickImage): im.IMagickImage {
+  const copy = im.MagickImage.create();
+  img.write(im.MagickFormat.Miff, (data) => { copy.read(data) });
+  return copy;
+}
+
+export type ImageMagickSource = URL | WebAssembly.Module | Int8Array | Uint8Array | Uint8ClampedArray;
+
 export class ImageMagickLoader extends FiolinWasmLoader {
-  private src: URL | WebAssembly.Module;
+  private src: ImageMagickSource | (() => Promise<ImageMagickSource>);
 
-  constructor(imSrc: URL | WebAssembly.Module | Int8Array | Uint8Array | Uint8ClampedArray) {
+  // The source can be a function, so that (e.g.) compiling the module is put
+  // off until a script actually needs it.
+  constructor(imSrc: ImageMagickSource | (() => Promise<ImageMagickSource>)) {
     super();
     this.src = imSrc;
   }
 
   async loadModule(pyodide: PyodideInterface): Promise<any> {
-    await im.initializeImageMagick(this.src);
-    const imfs = (im.ImageMagick as any)._api.FS;
+    if (!initialized) {
+      const src = this.src;
+      initialized = (async () => {
+        await im.initializeImageMagick(typeof src === 'function' ? await src() : src);
+      })();
+    }
+    try {
+      await initialized;
+    } catch (e) {
+      // Let the next load try again.
+      initialized = undefined;
+      throw e;
+    }
+    // Not activated here: the runner activates modules right before each run,
+    // and an interpreter loading in the background (see PyodideRunnerPool)
+    // mustn't steal /py from one that's running.
+    return { ...im, _fiolin: { drawToCanvas, drawPreview, readImage, writeImage, cloneImage } };
+  }
+
+  // ImageMagick is a singleton, so its /py mount has to follow whichever
+  // interpreter is about to run.
+  activate(pyodide: PyodideInterface) {
+    if (mountedOn === pyodide) return;
+    const imfs = imFs();
     try {
       const _ = imfs.stat('/py');
       imfs.unmount('/py')
@@ -29,14 +125,14 @@ export class ImageMagickLoader extends FiolinWasmLoader {
     }
     mkDir(imfs, '/py', pyodide.ERRNO_CODES);
     imfs.mount(pyodide.FS.filesystems.PROXYFS, { root: '/', fs: pyodide.FS }, '/py');
-    return im;
+    mountedOn = pyodide;
   }
 
   pyWrapper(moduleName: string): string {
     return dedent(`
       import js
       import fiolin
-      from pyodide import ffi
+      import os
 
       # Re-export stuff from the wasm module
       for k, v in js.${moduleName}.object_entries():
@@ -45,27 +141,54 @@ export class ImageMagickLoader extends FiolinWasmLoader {
       def read_image(path):
         """Read an image from file.
 
-        This has two advantages over ImageMagick.read:
+        This has three advantages over ImageMagick.read:
         - The loaded image is not immediately destroyed, so you don't have to
           fit all your logic into a callback.
         - This accepts regular paths, without the need to account for the
           mount point in the module.
+        - It is decoded straight from the file, without a copy of the file
+          contents in python.
+
+        Call .dispose() on the image once you're done with it.
+        """
+        return _fiolin.readImage(os.path.abspath(path))
+
+      def write_image(img, path, fmt):
+        """Encode an image (or MagickImageCollection) in the given MagickFormat and write it to path.
+
+        Unlike writing the data passed to img.write's callback, this never
+        copies the encoded image into python.
+        """
+        _fiolin.writeImage(img, os.path.abspath(path), fmt)
+
+      def clone_image(img):
+        """Return a copy of img that, unlike img.clone's, outlives the call.
+
+        The copy is made by encoding and decoding img, which costs about as much
+        as reading it, so prefer img.clone (or shrinking img first) for large
+        images. Call .dispose() on the copy once you're done with it.
         """
-        with open(path, 'rb') as f:
-          return MagickImage.create(ffi.to_js(f.read()))
+        return _fiolin.cloneImage(img)
+
+      async def draw_to_canvas(ctx, img, x, y, width=None, height=None):
+        """Draw image to canvas 2d context.
 
-      async def draw_to_canvas(ctx, img, x, y, width, height):
-        """Draw image to canvas 2d context."""
+        If given, width and height must match the image's dimensions.
+        """
+        if not ctx:
+          return
+        _fiolin.drawToCanvas(ctx, img, x, y, width, height)
+
+      async def draw_preview(ctx, img, width, height):
+        """Clear the canvas and draw the image on it, scaled to fit and centered.
+
+        The image itself is left unchanged; the resizing is done on a copy
+        inside ImageMagick, which is much faster than drawing the full-size
+        image.
+        """
         if not ctx:
           return
-        async with fiolin.callback_to_ctx(img.write, MagickFormat.Rgba) as rgba:
-          n = width * height * 4
-          if len(rgba) != n:
-            raise ValueError(f'Expected image data to have length {width}x{height}x4 = {n}; got {len(rgba)}')
-          img_data = ctx.createImageData(width, height)
-          for i in range(n):
-            img_data.data[i] = rgba[i]
-          ctx.putImageData(img_data, x, y)
+        _fiolin.drawPreview(ctx, img, width, height)
     `);
   }
 }
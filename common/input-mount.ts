@@ -0,0 +1,62 @@
+import { PyodideInterface } from 'pyodide';
+import { mountMemfs, toErrWithErrno, unmountIfMounted, writeBlob } from './emscripten-fs';
+
+// Makes the input files available under /input for the duration of a run.
+export abstract class InputMounter {
+  // Called with an empty /input directory with nothing mounted on it; the
+  // inputs should be mounted there (rather than written into it).
+  abstract mount(pyodide: PyodideInterface, inputs: File[]): Promise<void>;
+  // Called at the end of every run (even if mount failed). Whatever is
+  // mounted at /input should be unmounted, leaving it empty for the next run.
+  unmount(pyodide: PyodideInterface): void {}
+}
+
+// Copies the inputs into a fresh MEMFS. Works everywhere and leaves the inputs
+// writable, but the inputs take up space in the wasm heap (until the run is
+// over and the whole MEMFS is dropped).
+export class CopyInputMounter extends InputMounter {
+  async mount(pyodide: PyodideInterface, inputs: File[]): Promise<void> {
+    mountMemfs(pyodide.FS, '/input', pyodide.ERRNO_CODES);
+    for (const input of inputs) {
+      await writeBlob(pyodide.FS, `/input/${input.name}`, input, pyodide.ERRNO_CODES);
+    }
+  }
+
+  unmount(pyodide: PyodideInterface) {
+    unmountIfMounted(pyodide.FS, '/input', pyodide.ERRNO_CODES);
+  }
+}
+
+// Mounts the input Files directly with WORKERFS, so reads go straight to the
+// underlying Blobs and nothing is copied into the wasm heap. Inputs are
+// read-only. Only usable in web workers (it relies on FileReaderSync); see
+// available().
+export class WorkerFsInputMounter extends InputMounter {
+  // Interpreters that currently have inputs mounted (a mounter may be shared
+  // by several runners).
+  private readonly _mounted: WeakSet<PyodideInterface>;
+
+  constructor() {
+    super();
+    this._mounted = new WeakSet();
+  }
+
+  static available(): boolean {
+    return typeof (globalThis as any).FileReaderSync !== 'undefined';
+  }
+
+  async mount(pyodide: PyodideInterface, inputs: File[]): Promise<void> {
+    try {
+      pyodide.FS.mount(pyodide.FS.filesystems.WORKERFS, { files: inputs }, '/input');
+    } catch (e) {
+      throw toErrWithErrno(e, { prefix: 'mount("/input") failed', errCodes: pyodide.ERRNO_CODES });
+    }
+    this._mounted.add(pyodide);
+  }
+
+  unmount(pyodide: PyodideInterface) {
+    if (!this._mounted.has(pyodide)) return;
+    this._mounted.delete(pyodide);
+    pyodide.FS.unmount('/input');
+  }
+}
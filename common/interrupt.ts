@@ -0,0 +1,70 @@
+// Interrupting python that's running (see PyodideInterface.setInterruptBuffer).
+// Pyodide checks the first slot of the buffer as it runs, and raises
+// KeyboardInterrupt inside the script once it holds SIGINT; the second slot
+// says why, so that the runner can report it.
+export const SIGINT = 2;
+
+export const INTERRUPT_REASONS = ['CANCELLED', 'TIMEOUT'] as const;
+export type InterruptReason = (typeof INTERRUPT_REASONS)[number];
+
+// Whether the buffer can be written by other threads. Shared memory needs a
+// cross-origin isolated page in the browser; elsewhere it's always there.
+export function canShareInterrupts(): boolean {
+  return typeof SharedArrayBuffer !== 'undefined' && (globalThis as any).crossOriginIsolated !== false;
+}
+
+// Without shared memory, interrupts can only come from the same thread, and
+// so only land while the script is awaiting something.
+export function mkInterruptBuffer(): Int32Array {
+  return canShareInterrupts() ? new Int32Array(new SharedArrayBuffer(8)) : new Int32Array(2);
+}
+
+// What the second slot holds for each reason (0 meaning none).
+export function reasonCode(reason: InterruptReason): number {
+  return INTERRUPT_REASONS.indexOf(reason) + 1;
+}
+
+export function interrupt(buffer: Int32Array, reason: InterruptReason) {
+  // The reason has to be visible by the time the signal is.
+  Atomics.store(buffer, 1, reasonCode(reason));
+  Atomics.store(buffer, 0, SIGINT);
+}
+
+// The reason for the most recent interrupt, if there's been one since the
+// last clear.
+export function interruptReason(buffer: Int32Array): InterruptReason | undefined {
+  return INTERRUPT_REASONS[Atomics.load(buffer, 1) - 1];
+}
+
+export function clearInterrupt(buffer: Int32Array) {
+  Atomics.store(buffer, 0, 0);
+  Atomics.store(buffer, 1, 0);
+}
+
+// Interrupts a run that goes past its deadline.
+export abstract class Watchdog {
+  abstract arm(buffer: Int32Array, ms: number): void;
+  abstract disarm(): void;
+  // Releases anything the watchdog holds (e.g., a thread) once it's no longer
+  // needed.
+  async close(): Promise<void> {
+    this.disarm();
+  }
+}
+
+// Uses a timer in the same thread, so it can only fire while the script is
+// awaiting something; a script stuck in a loop never lets it. See
+// ThreadWatchdog (../utils/watchdog.ts) for one that can always fire.
+export class TimerWatchdog extends Watchdog {
+  private _timeout?: ReturnType<typeof setTimeout>;
+
+  arm(buffer: Int32Array, ms: number) {
+    this.disarm();
+    this._timeout = setTimeout(() => interrupt(buffer, 'TIMEOUT'), ms);
+  }
+
+  disarm() {
+    clearTimeout(this._timeout);
+    this._timeout = undefined;
+  }
+}
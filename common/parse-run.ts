@@ -1,7 +1,7 @@
 import { pArr, pInst, pNum, pRec, pStr, pObjWithProps, pOpt, pTuple, pStrUnion, pBool, ObjPath, pTaggedUnion, pStrLit } from './parse';
 import { pFormEvent } from './parse-event';
 import { pFiolinFormComponentId, pPartialFiolinFormComponent } from './parse-form';
-import { FiolinLogLevel, FiolinRunRequest, FiolinRunResponse, FormUpdate, ICanvasRenderingContext2D, LOG_LEVELS } from './types';
+import { FiolinLogLevel, FiolinMemoryUsage, FiolinRunDebug, FiolinRunPhase, FiolinRunRequest, FiolinRunResponse, FormUpdate, ICanvasRenderingContext2D, LOG_LEVELS, RUN_PHASES } from './types';
 
 function getWindow() {
   try {
@@ -29,6 +29,8 @@ export const pFiolinRunRequest = pObjWithProps<FiolinRunRequest>({
   args: pOpt(pRec(pStr)),
   canvases: pOpt(pRec<ICanvasRenderingContext2D>(pCanvas2D)),
   event: pOpt(pFormEvent),
+  skipZip: pOpt(pBool),
+  timeoutMs: pOpt(pNum),
 });
 
 export const pLogEntry = pTuple<[FiolinLogLevel, string]>([
@@ -65,6 +67,20 @@ export function pFormUpdate(p: ObjPath, v: unknown): FormUpdate {
   })(p, v);
 };
 
+export const pFiolinRunDebug = pObjWithProps<FiolinRunDebug>({
+  timings: pArr(pTuple<[FiolinRunPhase, number]>([
+    pStrUnion<typeof RUN_PHASES>(RUN_PHASES),
+    pNum,
+  ])),
+  totalMs: pNum,
+  bytesIn: pNum,
+  bytesOut: pNum,
+  memory: pOpt(pObjWithProps<FiolinMemoryUsage>({
+    heapBytes: pNum,
+    fsBytes: pOpt(pNum),
+  })),
+});
+
 export const pFiolinRunResponse = pObjWithProps<FiolinRunResponse>({
   outputs: pArr(pInst(File)),
   log: pArr(pLogEntry),
@@ -72,4 +88,6 @@ export const pFiolinRunResponse = pObjWithProps<FiolinRunResponse>({
   lineno: pOpt(pNum),
   partial: pOpt(pBool),
   formUpdates: pOpt(pArr(pFormUpdate)),
+  debug: pOpt(pFiolinRunDebug),
+  zipRequested: pOpt(pBool),
 });
@@ -1,5 +1,6 @@
-import { pArr, pStr, pStrUnion, pObjWithProps, pStrLit, pOpt } from './parse';
-import { FiolinScript, FiolinScriptCode, FiolinScriptMeta, FiolinScriptRuntime, FiolinScriptInterface, FiolinPyPackage, FiolinWasmModule, FILE_ARITIES, TERMINAL_MODES } from './types';
+import { ObjPath, pArr, pBool, pStr, pStrUnion, pObjWithProps, pStrLit, pOpt } from './parse';
+import { hasCanvas } from './form-utils';
+import { FiolinScript, FiolinScriptCode, FiolinScriptMeta, FiolinScriptRuntime, FiolinScriptInterface, FiolinPyPackage, FiolinWasmModule, FiolinScriptBuild, FiolinPinnedPackage, FILE_ARITIES, TERMINAL_MODES } from './types';
 import { pForm } from './parse-form';
 
 export const pFileArity = pStrUnion<typeof FILE_ARITIES>(FILE_ARITIES);
@@ -12,14 +13,27 @@ const pMeta = pObjWithProps<FiolinScriptMeta>({
   extensions: pOpt(pArr(pStr)),
 });
 
-const pInterface = pObjWithProps<FiolinScriptInterface>({
+const pInterfaceProps = pObjWithProps<FiolinScriptInterface>({
   inputFiles: pFileArity,
   inputAccept: pOpt(pStr),
   outputFiles: pFileArity,
   form: pOpt(pForm),
-  terminal: pOpt(pTerminalMode)
+  terminal: pOpt(pTerminalMode),
+  perFile: pOpt(pBool),
+  deterministic: pOpt(pBool),
+  coalesceEvents: pOpt(pBool),
 });
 
+// Per-file runs are spread over several runners, but only one of them can draw
+// on the form's canvases.
+function pInterface(p: ObjPath, v: unknown): FiolinScriptInterface {
+  const parsed = pInterfaceProps(p, v);
+  if (parsed.perFile && parsed.form && hasCanvas(parsed.form)) {
+    throw p.dot('perFile').err('be unset for a script whose form has a CANVAS');
+  }
+  return parsed;
+}
+
 const pPyPkg = pObjWithProps<FiolinPyPackage>({
   type: pStrLit('PYPI'),
   name: pStr,
@@ -34,9 +48,23 @@ const pRuntime = pObjWithProps<FiolinScriptRuntime>({
 
 const pCode = pObjWithProps<FiolinScriptCode>({ python: pStr });
 
+const pPinnedPkg = pObjWithProps<FiolinPinnedPackage>({
+  name: pStr,
+  version: pStr,
+});
+
+const pBuild = pObjWithProps<FiolinScriptBuild>({
+  sourceHash: pStr,
+  pyodide: pStr,
+  builtins: pArr(pPinnedPkg),
+  pythonPkgs: pArr(pPinnedPkg),
+  bytecode: pOpt(pStr),
+});
+
 export const pFiolinScript = pObjWithProps<FiolinScript>({
   meta: pMeta,
   interface: pInterface,
   runtime: pRuntime,
   code: pCode,
+  build: pOpt(pBuild),
 });
@@ -0,0 +1,33 @@
+import { FiolinMemoryUsage, FiolinRunDebug, FiolinRunPhase } from './types';
+
+// Accumulates how long each phase of a run takes.
+export class PhaseTimer {
+  private readonly _start: number;
+  private readonly _timings: Map<FiolinRunPhase, number>;
+
+  constructor() {
+    this._start = performance.now();
+    this._timings = new Map();
+  }
+
+  add(phase: FiolinRunPhase, ms: number) {
+    this._timings.set(phase, (this._timings.get(phase) || 0) + ms);
+  }
+
+  async time<T>(phase: FiolinRunPhase, f: () => T | Promise<T>): Promise<T> {
+    const start = performance.now();
+    try {
+      return await f();
+    } finally {
+      this.add(phase, performance.now() - start);
+    }
+  }
+
+  debug(bytesIn: number, bytesOut: number, memory?: FiolinMemoryUsage): FiolinRunDebug {
+    return {
+      timings: [...this._timings.entries()],
+      totalMs: performance.now() - this._start,
+      bytesIn, bytesOut, memory,
+    };
+  }
+}
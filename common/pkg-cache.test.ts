@@ -0,0 +1,66 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from 'vitest';
+import { MemoryPackageCacheStorage, PackageCache, PackageCacheMissError } from './pkg-cache';
+
+function bytes(s: string): Uint8Array {
+  return new TextEncoder().encode(s);
+}
+
+describe('PackageCache', () => {
+  beforeEach(() => { vi.useFakeTimers(); });
+  afterEach(() => { vi.useRealTimers(); });
+
+  it('stores identical contents once', async () => {
+    const storage = new MemoryPackageCacheStorage();
+    const cache = new PackageCache(storage);
+    await cache.put('https://a.test/x.whl', bytes('same'));
+    await cache.put('https://b.test/x.whl', bytes('same'));
+    const index = await storage.readIndex();
+    expect(Object.keys(index!.urls)).toHaveLength(2);
+    expect(Object.keys(index!.blobs)).toHaveLength(1);
+    expect((await cache.get('https://b.test/x.whl'))?.contents).toEqual(bytes('same'));
+  });
+
+  it('evicts the least recently used blobs', async () => {
+    const cache = new PackageCache(new MemoryPackageCacheStorage(), { maxBytes: 10 });
+    await cache.put('a.whl', bytes('aaaa'));
+    vi.advanceTimersByTime(1);
+    await cache.put('b.whl', bytes('bbbb'));
+    vi.advanceTimersByTime(1);
+    await cache.get('a.whl');
+    vi.advanceTimersByTime(1);
+    await cache.put('c.whl', bytes('cccc'));
+    expect(await cache.get('a.whl')).toBeDefined();
+    expect(await cache.get('b.whl')).toBeUndefined();
+    expect(await cache.get('c.whl')).toBeDefined();
+  });
+
+  it('records hits without rewriting the index', async () => {
+    const storage = new MemoryPackageCacheStorage();
+    const cache = new PackageCache(storage);
+    await cache.put('a.whl', bytes('aaaa'));
+    const updateIndex = vi.spyOn(storage, 'updateIndex');
+    expect((await cache.get('a.whl'))?.contents).toEqual(bytes('aaaa'));
+    expect(await cache.get('b.whl')).toBeUndefined();
+    expect(updateIndex).not.toHaveBeenCalled();
+  });
+
+  it('treats index entries whose blob is gone as misses', async () => {
+    const storage = new MemoryPackageCacheStorage();
+    const cache = new PackageCache(storage);
+    await cache.put('a.whl', bytes('aaaa'));
+    const hash = (await storage.readIndex())!.urls['a.whl'].hash;
+    await storage.deleteBlob(hash);
+    expect(await cache.get('a.whl')).toBeUndefined();
+    expect((await storage.readIndex())!.urls['a.whl']).toBeUndefined();
+  });
+
+  it('serves cached downloads when offline', async () => {
+    const cache = new PackageCache(new MemoryPackageCacheStorage());
+    await cache.put('https://files.test/foo.whl', bytes('foo'), 'application/zip');
+    const fetcher = cache.fetcher({ offline: true });
+    const resp = await fetcher('https://files.test/foo.whl');
+    expect(resp.headers.get('content-type')).toEqual('application/zip');
+    expect(await resp.text()).toEqual('foo');
+    await expect(fetcher('https://files.test/bar.whl')).rejects.toThrow(PackageCacheMissError);
+  });
+});
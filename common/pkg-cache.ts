@@ -0,0 +1,204 @@
+import { sha256Hex } from './hash';
+
+// Where a download came from, and which blob holds its contents.
+export interface PackageCacheUrlEntry {
+  hash: string;
+  contentType?: string;
+}
+
+export interface PackageCacheBlobEntry {
+  size: number;
+  lastUsed: number;
+}
+
+export interface PackageCacheIndex {
+  urls: Record<string, PackageCacheUrlEntry>;
+  blobs: Record<string, PackageCacheBlobEntry>;
+}
+
+export function emptyPackageCacheIndex(): PackageCacheIndex {
+  return { urls: {}, blobs: {} };
+}
+
+// The platform-specific part of a PackageCache (disk for node, the Cache API
+// for the browser).
+export abstract class PackageCacheStorage {
+  abstract readIndex(): Promise<PackageCacheIndex | undefined>;
+  // Reads the index, lets update change it in place, and writes it back, all
+  // as one step with respect to every other cache sharing the same storage
+  // (e.g., in other worker threads or processes).
+  abstract updateIndex<T>(update: (index: PackageCacheIndex) => T): Promise<T>;
+  abstract readBlob(hash: string): Promise<Uint8Array | undefined>;
+  abstract writeBlob(hash: string, contents: Uint8Array): Promise<void>;
+  abstract deleteBlob(hash: string): Promise<void>;
+}
+
+export class MemoryPackageCacheStorage extends PackageCacheStorage {
+  private _index?: PackageCacheIndex;
+  private readonly _blobs: Map<string, Uint8Array>;
+
+  constructor() {
+    super();
+    this._blobs = new Map();
+  }
+
+  async readIndex() { return this._index && structuredClone(this._index); }
+  async updateIndex<T>(update: (index: PackageCacheIndex) => T): Promise<T> {
+    const index = this._index || emptyPackageCacheIndex();
+    const result = update(index);
+    this._index = structuredClone(index);
+    return result;
+  }
+  async readBlob(hash: string) { return this._blobs.get(hash); }
+  async writeBlob(hash: string, contents: Uint8Array) { this._blobs.set(hash, contents); }
+  async deleteBlob(hash: string) { this._blobs.delete(hash); }
+}
+
+export class PackageCacheMissError extends Error {
+  constructor(message: string, options?: ErrorOptions) {
+    super(message, options);
+    this.name = 'PackageCacheMissError';
+  }
+}
+
+export interface PackageCacheOptions {
+  // Evict least recently used blobs once the total size exceeds this.
+  maxBytes?: number;
+}
+
+export interface PackageFetcherOptions {
+  // Never touch the network; fail on anything that isn't cached.
+  offline?: boolean;
+  log?: (s: string) => void;
+}
+
+const DEFAULT_MAX_BYTES = 512 * 1024 * 1024;
+
+// Wheels (and other archives) at a given URL never change, but index/metadata
+// responses (e.g., https://pypi.org/pypi/<name>/json) do, so those prefer the
+// network when it's available.
+function isImmutable(url: string): boolean {
+  return /\.(whl|tar\.gz|zip|tar)(\?.*)?$/.test(url);
+}
+
+function urlOf(input: RequestInfo | URL): string {
+  if (typeof input === 'string') return input;
+  if (input instanceof URL) return input.href;
+  return input.url;
+}
+
+// A cache of downloads, stored by the hash of their contents (so identical
+// files fetched from different URLs are only stored once) with size-bounded
+// LRU eviction.
+export class PackageCache {
+  private readonly _storage: PackageCacheStorage;
+  private readonly _maxBytes: number;
+  // When blobs were last read (by hash), which is only written to the index
+  // along with the next put rather than on every hit.
+  private readonly _used: Map<string, number>;
+
+  constructor(storage: PackageCacheStorage, opts?: PackageCacheOptions) {
+    this._storage = storage;
+    this._maxBytes = opts?.maxBytes ?? DEFAULT_MAX_BYTES;
+    this._used = new Map();
+  }
+
+  async get(url: string): Promise<{ contents: Uint8Array, contentType?: string } | undefined> {
+    const index = await this._storage.readIndex();
+    const entry = index?.urls[url];
+    if (!entry || !index.blobs[entry.hash]) return undefined;
+    const contents = await this._storage.readBlob(entry.hash);
+    if (!contents) {
+      // Evicted (by another cache) since the index was read.
+      await this._storage.updateIndex((index) => {
+        if (index.urls[url]?.hash === entry.hash) delete index.urls[url];
+      });
+      return undefined;
+    }
+    this._used.set(entry.hash, Date.now());
+    return { contents, contentType: entry.contentType };
+  }
+
+  async put(url: string, contents: Uint8Array, contentType?: string): Promise<void> {
+    const hash = await sha256Hex(contents);
+    // The blob is written before the index refers to it, and evicted blobs
+    // are deleted after it stops referring to them, so that readers never
+    // see an entry without its blob (short of races between writers, which
+    // get treats as a miss).
+    if (!(await this._storage.readIndex())?.blobs[hash]) {
+      await this._storage.writeBlob(hash, contents);
+    }
+    const evicted = await this._storage.updateIndex((index) => {
+      for (const [h, lastUsed] of this._used) {
+        if (index.blobs[h]) index.blobs[h].lastUsed = Math.max(index.blobs[h].lastUsed, lastUsed);
+      }
+      this._used.clear();
+      index.blobs[hash] = { size: contents.byteLength, lastUsed: Date.now() };
+      index.urls[url] = { hash, contentType };
+      return this.evict(index);
+    });
+    for (const h of evicted) {
+      await this._storage.deleteBlob(h);
+    }
+  }
+
+  // Drops least recently used blobs (and the urls that refer to them) from
+  // the index, returning their hashes.
+  private evict(index: PackageCacheIndex): string[] {
+    let total = 0;
+    for (const b of Object.values(index.blobs)) total += b.size;
+    if (total <= this._maxBytes) return [];
+    const lru = Object.entries(index.blobs).sort(([, a], [, b]) => a.lastUsed - b.lastUsed);
+    const evicted = new Set<string>();
+    for (const [hash, blob] of lru) {
+      if (total <= this._maxBytes) break;
+      delete index.blobs[hash];
+      evicted.add(hash);
+      total -= blob.size;
+    }
+    for (const [url, entry] of Object.entries(index.urls)) {
+      if (evicted.has(entry.hash)) delete index.urls[url];
+    }
+    return [...evicted];
+  }
+
+  // A drop-in replacement for fetch (e.g. for micropip) that reads through
+  // the cache.
+  fetcher(opts?: PackageFetcherOptions): (input: RequestInfo | URL, init?: RequestInit) => Promise<Response> {
+    const log = opts?.log || (() => {});
+    const fromCache = async (url: string): Promise<Response | undefined> => {
+      const cached = await this.get(url);
+      if (!cached) return undefined;
+      log(`Using cached ${url}`);
+      const headers: Record<string, string> = {};
+      if (cached.contentType) headers['content-type'] = cached.contentType;
+      return new Response(cached.contents, { status: 200, headers });
+    };
+    return async (input, init) => {
+      const url = urlOf(input);
+      if (init?.method && init.method.toUpperCase() !== 'GET') {
+        return fetch(input, init);
+      }
+      if (opts?.offline || isImmutable(url)) {
+        const cached = await fromCache(url);
+        if (cached) return cached;
+        if (opts?.offline) {
+          throw new PackageCacheMissError(`Offline and ${url} is not cached`);
+        }
+      }
+      log(`Fetching ${url}`);
+      let resp: Response;
+      try {
+        resp = await fetch(input, init);
+      } catch (e) {
+        const cached = await fromCache(url);
+        if (cached) return cached;
+        throw e;
+      }
+      if (!resp.ok) return resp;
+      const contents = new Uint8Array(await resp.arrayBuffer());
+      await this.put(url, contents, resp.headers.get('content-type') || undefined);
+      return new Response(contents, { status: resp.status, headers: resp.headers });
+    };
+  }
+}
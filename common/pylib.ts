@@ -4,15 +4,20 @@ export function getFiolinPy(pyodide: PyodideInterface): string {
   const codePairs = Object.entries(pyodide.ERRNO_CODES);
   return `"""Helpful fiolin-related python utilities."""
 import asyncio
+import base64
 import contextlib
 import enum
 import functools
+import importlib.util
 import js
+import json
+import marshal
 import os
 from pyodide import ffi
 import re
 import sys
 import traceback
+import types
 
 def state():
   """Get saved state from the previous run."""
@@ -354,20 +359,63 @@ async def callback_to_ctx(f, *args, **kwargs):
   finally:
     done.set(True)
     await task
+
+_SCRIPT_PATH = '/home/pyodide/script.py'
+_MAX_COMPILED_SCRIPTS = 16
+# Compiled script.py code by the hash of its source, least recently used first.
+_compiled_scripts = {}
+
+def _load_script(key, bytecode=None):
+  """Run script.py as the script module, compiling it only if key (the hash of its source) is new.
+
+  The bytecode recorded by a build (see _script_bytecode), if given, is used
+  in place of compiling, as long as it's for this version of python. As with
+  importlib.reload, an existing script module is reused, so its globals are
+  overwritten rather than cleared.
+  """
+  code = _compiled_scripts.pop(key, None)
+  if code is None:
+    code = _unmarshal_script(bytecode) if bytecode else None
+    if code is None:
+      with open(_SCRIPT_PATH) as f:
+        code = compile(f.read(), _SCRIPT_PATH, 'exec')
+    if len(_compiled_scripts) >= _MAX_COMPILED_SCRIPTS:
+      del _compiled_scripts[next(iter(_compiled_scripts))]
+  _compiled_scripts[key] = code
+  module = sys.modules.get('script')
+  if module is None:
+    module = types.ModuleType('script')
+    module.__file__ = _SCRIPT_PATH
+    sys.modules['script'] = module
+  exec(code, module.__dict__)
+  return module
+
+def _script_bytecode(source):
+  """Compile the source of script.py into the form _load_script accepts."""
+  code = compile(source, _SCRIPT_PATH, 'exec')
+  return base64.b64encode(importlib.util.MAGIC_NUMBER + marshal.dumps(code)).decode('ascii')
+
+def _unmarshal_script(bytecode):
+  data = base64.b64decode(bytecode)
+  magic = importlib.util.MAGIC_NUMBER
+  if data[:len(magic)] != magic:
+    return None
+  return marshal.loads(data[len(magic):])
+
+def _build_info(source):
+  """The installed packages and the compiled script, as JSON, for a build (see scripts/bundle.ts)."""
+  import micropip
+  pkgs = [{'name': p.name, 'version': p.version, 'source': p.source} for p in micropip.list().values()]
+  return json.dumps({'packages': pkgs, 'bytecode': _script_bytecode(source)})
 `;
 }
 
 export function getWrapperPy(): string {
   return `
 import fiolin
-import importlib
-import sys
 
 try:
-  if 'script' in sys.modules:
-    script = importlib.reload(sys.modules['script'])
-  else:
-    script = importlib.import_module('script')
+  script = fiolin._load_script(fiolin.js.scriptHash, fiolin.js.scriptBytecode)
   main = getattr(script, 'main', None)
   if main:
     await main()
@@ -0,0 +1,38 @@
+import { describe, expect, it } from 'vitest';
+import { RingBuffer } from './ring-buffer';
+
+describe('RingBuffer', () => {
+  it('keeps everything until full', () => {
+    const buf = new RingBuffer<number>(3);
+    buf.push(1, 2);
+    expect(buf.length).toEqual(2);
+    expect(buf.dropped).toEqual(0);
+    expect(buf.toArray()).toEqual([1, 2]);
+  });
+
+  it('drops the oldest items once full', () => {
+    const buf = new RingBuffer<number>(3);
+    buf.push(1, 2, 3, 4);
+    buf.push(5);
+    expect(buf.length).toEqual(3);
+    expect(buf.dropped).toEqual(2);
+    expect(buf.toArray()).toEqual([3, 4, 5]);
+    expect(buf.at(0)).toEqual(3);
+    expect(buf.at(2)).toEqual(5);
+    expect(buf.at(3)).toBeUndefined();
+  });
+
+  it('clears', () => {
+    const buf = new RingBuffer<number>(2);
+    buf.push(1, 2, 3);
+    buf.clear();
+    expect(buf.length).toEqual(0);
+    expect(buf.dropped).toEqual(0);
+    buf.push(4);
+    expect(buf.toArray()).toEqual([4]);
+  });
+
+  it('rejects bad capacities', () => {
+    expect(() => new RingBuffer(0)).toThrow(/positive integer/);
+  });
+});
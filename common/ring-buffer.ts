@@ -0,0 +1,62 @@
+// A fixed-capacity FIFO that drops its oldest items to make room once full.
+export class RingBuffer<T> {
+  public readonly capacity: number;
+  private readonly _items: (T | undefined)[];
+  private _start: number;
+  private _length: number;
+  private _dropped: number;
+
+  constructor(capacity: number) {
+    if (!Number.isInteger(capacity) || capacity < 1) {
+      throw new Error(`RingBuffer capacity must be a positive integer; got ${capacity}`);
+    }
+    this.capacity = capacity;
+    this._items = new Array(capacity);
+    this._start = 0;
+    this._length = 0;
+    this._dropped = 0;
+  }
+
+  get length(): number {
+    return this._length;
+  }
+
+  // The number of items dropped since the last clear().
+  get dropped(): number {
+    return this._dropped;
+  }
+
+  push(...items: T[]) {
+    for (const item of items) {
+      if (this._length < this.capacity) {
+        this._items[(this._start + this._length) % this.capacity] = item;
+        this._length++;
+      } else {
+        this._items[this._start] = item;
+        this._start = (this._start + 1) % this.capacity;
+        this._dropped++;
+      }
+    }
+  }
+
+  // The ith oldest item still in the buffer.
+  at(i: number): T | undefined {
+    if (i < 0 || i >= this._length) return undefined;
+    return this._items[(this._start + i) % this.capacity];
+  }
+
+  toArray(): T[] {
+    const arr: T[] = [];
+    for (let i = 0; i < this._length; i++) {
+      arr.push(this._items[(this._start + i) % this.capacity]!);
+    }
+    return arr;
+  }
+
+  clear() {
+    this._items.fill(undefined);
+    this._start = 0;
+    this._length = 0;
+    this._dropped = 0;
+  }
+}
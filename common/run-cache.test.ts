@@ -0,0 +1,99 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from 'vitest';
+import { MemoizingRunner, MemoryRunCacheStorage, RunCache, runCacheKey } from './run-cache';
+import { FiolinRunner, FiolinRunRequest, FiolinRunResponse, FiolinScript } from './types';
+
+function mkScript(deterministic?: boolean): FiolinScript {
+  return {
+    meta: { title: 'title', description: 'desc' },
+    interface: { inputFiles: 'ANY', outputFiles: 'ANY', deterministic },
+    runtime: {},
+    code: { python: 'pass' },
+  };
+}
+
+// Upper-cases its inputs, counting how many times it actually ran.
+class FakeRunner implements FiolinRunner {
+  public runs = 0;
+  public partial = false;
+  async installPkgs() {}
+  async run(_: FiolinScript, request: FiolinRunRequest): Promise<FiolinRunResponse> {
+    this.runs++;
+    const outputs = await Promise.all(request.inputs.map(async (f) => {
+      return new File([(await f.text()).toUpperCase()], f.name, { type: 'text/plain' });
+    }));
+    return { outputs, log: [['INFO', 'ran']], partial: this.partial || undefined };
+  }
+}
+
+function mkRequest(contents: string, args?: Record<string, string>): FiolinRunRequest {
+  return { inputs: [new File([contents], 'in.txt', { type: 'text/plain' })], args };
+}
+
+describe('runCacheKey', () => {
+  it('depends on the inputs and args', async () => {
+    const script = mkScript(true);
+    const key = await runCacheKey(script, mkRequest('a', { x: '1', y: '2' }));
+    expect(await runCacheKey(script, mkRequest('a', { y: '2', x: '1' }))).toEqual(key);
+    expect(await runCacheKey(script, mkRequest('b', { x: '1', y: '2' }))).not.toEqual(key);
+    expect(await runCacheKey(script, mkRequest('a', { x: '1' }))).not.toEqual(key);
+  });
+
+  it('skips non-deterministic scripts, canvases and events', async () => {
+    expect(await runCacheKey(mkScript(), mkRequest('a'))).toBeUndefined();
+    const canvas = mkScript(true);
+    canvas.interface.form = { children: [{ type: 'DIV', dir: 'ROW', children: [{ type: 'CANVAS', name: 'c', height: 1, width: 1 }] }] };
+    expect(await runCacheKey(canvas, mkRequest('a'))).toBeUndefined();
+    const request: FiolinRunRequest = {
+      ...mkRequest('a'),
+      event: { type: 'INPUT', subtype: 'input', value: 'x', target: { name: 'b' }, timeStamp: 0 },
+    };
+    expect(await runCacheKey(mkScript(true), request)).toBeUndefined();
+  });
+});
+
+describe('MemoizingRunner', () => {
+  beforeEach(() => { vi.useFakeTimers(); });
+  afterEach(() => { vi.useRealTimers(); });
+
+  it('reuses the results of identical runs', async () => {
+    const inner = new FakeRunner();
+    const runner = new MemoizingRunner(inner, new RunCache(new MemoryRunCacheStorage()));
+    const first = await runner.run(mkScript(true), mkRequest('hello'));
+    const second = await runner.run(mkScript(true), mkRequest('hello'));
+    expect(inner.runs).toEqual(1);
+    expect(await second.outputs[0].text()).toEqual('HELLO');
+    expect(second.outputs[0].name).toEqual(first.outputs[0].name);
+    expect(second.outputs[0].type).toEqual('text/plain');
+    expect(second.log).toEqual([['INFO', 'ran']]);
+    await runner.run(mkScript(true), mkRequest('goodbye'));
+    await runner.run(mkScript(true), mkRequest('hello'), true);
+    expect(inner.runs).toEqual(3);
+  });
+
+  it('does not cache partial runs or non-deterministic scripts', async () => {
+    const inner = new FakeRunner();
+    const runner = new MemoizingRunner(inner, new RunCache(new MemoryRunCacheStorage()));
+    await runner.run(mkScript(), mkRequest('a'));
+    await runner.run(mkScript(), mkRequest('a'));
+    inner.partial = true;
+    await runner.run(mkScript(true), mkRequest('a'));
+    await runner.run(mkScript(true), mkRequest('a'));
+    expect(inner.runs).toEqual(4);
+  });
+
+  it('evicts the least recently used runs', async () => {
+    const storage = new MemoryRunCacheStorage();
+    const inner = new FakeRunner();
+    // Enough for two of these runs but not three.
+    const runner = new MemoizingRunner(inner, new RunCache(storage, { maxBytes: 250 }));
+    for (const contents of ['a', 'b', 'a', 'c']) {
+      await runner.run(mkScript(true), mkRequest(contents));
+      vi.advanceTimersByTime(1);
+    }
+    expect(inner.runs).toEqual(3);
+    expect(Object.keys((await storage.readIndex())!.runs)).toHaveLength(2);
+    await runner.run(mkScript(true), mkRequest('a'));
+    await runner.run(mkScript(true), mkRequest('b'));
+    expect(inner.runs).toEqual(4);
+  });
+});
@@ -0,0 +1,243 @@
+import { hasCanvas } from './form-utils';
+import { sha256Hex } from './hash';
+import { IConsole } from './runner';
+import { runtimeKey } from './snapshot';
+import { FiolinLogLevel, FiolinRunner, FiolinRunRequest, FiolinRunResponse, FiolinScript, FormUpdate } from './types';
+
+// Bump this to invalidate every cached result, e.g. if the runner changes in a
+// way that affects scripts' outputs.
+const RUN_CACHE_VERSION = 1;
+
+export interface RunCacheEntry {
+  size: number;
+  lastUsed: number;
+}
+
+export interface RunCacheIndex {
+  runs: Record<string, RunCacheEntry>;
+}
+
+export function emptyRunCacheIndex(): RunCacheIndex {
+  return { runs: {} };
+}
+
+// The platform-specific part of a RunCache (disk for node, IndexedDB for the
+// browser). Each run is stored as a single blob (see encodeRun).
+export abstract class RunCacheStorage {
+  abstract readIndex(): Promise<RunCacheIndex | undefined>;
+  // Reads the index, lets update change it in place, and writes it back, all
+  // as one step with respect to every other cache sharing the same storage
+  // (e.g., in other worker threads or processes).
+  abstract updateIndex<T>(update: (index: RunCacheIndex) => T): Promise<T>;
+  abstract readBlob(key: string): Promise<Uint8Array | undefined>;
+  abstract writeBlob(key: string, contents: Uint8Array): Promise<void>;
+  abstract deleteBlob(key: string): Promise<void>;
+}
+
+export class MemoryRunCacheStorage extends RunCacheStorage {
+  private _index?: RunCacheIndex;
+  private readonly _blobs: Map<string, Uint8Array>;
+
+  constructor() {
+    super();
+    this._blobs = new Map();
+  }
+
+  async readIndex() { return this._index && structuredClone(this._index); }
+  async updateIndex<T>(update: (index: RunCacheIndex) => T): Promise<T> {
+    const index = this._index || emptyRunCacheIndex();
+    const result = update(index);
+    this._index = structuredClone(index);
+    return result;
+  }
+  async readBlob(key: string) { return this._blobs.get(key); }
+  async writeBlob(key: string, contents: Uint8Array) { this._blobs.set(key, contents); }
+  async deleteBlob(key: string) { this._blobs.delete(key); }
+}
+
+// The parts of a response worth keeping; the debug info describes the
+// original run rather than the cached one.
+interface CachedRun {
+  outputs: File[];
+  log: [FiolinLogLevel, string][];
+  formUpdates?: FormUpdate[];
+  zipRequested?: boolean;
+}
+
+interface CachedRunHeader {
+  outputs: { name: string, type: string, size: number }[];
+  log: [FiolinLogLevel, string][];
+  formUpdates?: FormUpdate[];
+  zipRequested?: boolean;
+}
+
+// Stored as the length of a JSON header (4 bytes, big endian), the header
+// itself, and then the contents of the outputs one after another.
+async function encodeRun(run: CachedRun): Promise<Uint8Array> {
+  const contents = await Promise.all(run.outputs.map(async (f) => new Uint8Array(await f.arrayBuffer())));
+  const header: CachedRunHeader = {
+    outputs: run.outputs.map((f, i) => ({ name: f.name, type: f.type, size: contents[i].byteLength })),
+    log: run.log, formUpdates: run.formUpdates, zipRequested: run.zipRequested,
+  };
+  const headerBytes = new TextEncoder().encode(JSON.stringify(header));
+  const total = 4 + headerBytes.byteLength + contents.reduce((n, c) => n + c.byteLength, 0);
+  const blob = new Uint8Array(total);
+  new DataView(blob.buffer).setUint32(0, headerBytes.byteLength);
+  blob.set(headerBytes, 4);
+  let offset = 4 + headerBytes.byteLength;
+  for (const c of contents) {
+    blob.set(c, offset);
+    offset += c.byteLength;
+  }
+  return blob;
+}
+
+function decodeRun(blob: Uint8Array): CachedRun {
+  const view = new DataView(blob.buffer, blob.byteOffset, blob.byteLength);
+  const headerLen = view.getUint32(0);
+  const header: CachedRunHeader = JSON.parse(new TextDecoder().decode(blob.subarray(4, 4 + headerLen)));
+  let offset = 4 + headerLen;
+  const outputs = header.outputs.map(({ name, type, size }) => {
+    const file = new File([blob.subarray(offset, offset + size)], name, { type });
+    offset += size;
+    return file;
+  });
+  return { outputs, log: header.log, formUpdates: header.formUpdates, zipRequested: header.zipRequested };
+}
+
+// The key under which the result of running script on request is cached, or
+// undefined if it mustn't be cached. Only scripts that declare themselves
+// deterministic are cached, and never those that draw on canvases (a side
+// effect the cache can't replay) or runs handling form events (which continue
+// an earlier, partial run and so depend on the interpreter's state).
+export async function runCacheKey(script: FiolinScript, request: FiolinRunRequest): Promise<string | undefined> {
+  if (!script.interface.deterministic || request.event) return undefined;
+  if (script.interface.form && hasCanvas(script.interface.form)) return undefined;
+  const inputs = await Promise.all(request.inputs.map(async (f) => {
+    return [f.name, f.type, await sha256Hex(await f.arrayBuffer())];
+  }));
+  return await sha256Hex(JSON.stringify({
+    version: RUN_CACHE_VERSION,
+    python: script.code.python,
+    runtime: runtimeKey(script.runtime),
+    inputs,
+    args: Object.entries(request.args || {}).sort(([a], [b]) => a < b ? -1 : a > b ? 1 : 0),
+    skipZip: !!request.skipZip,
+  }));
+}
+
+export interface RunCacheOptions {
+  // Evict least recently used runs once the total size exceeds this.
+  maxBytes?: number;
+}
+
+const DEFAULT_MAX_BYTES = 256 * 1024 * 1024;
+
+// The results of earlier runs (see runCacheKey), with size-bounded LRU
+// eviction.
+export class RunCache {
+  private readonly _storage: RunCacheStorage;
+  private readonly _maxBytes: number;
+  // When runs were last read (by key), which is only written to the index
+  // along with the next put rather than on every hit.
+  private readonly _used: Map<string, number>;
+
+  constructor(storage: RunCacheStorage, opts?: RunCacheOptions) {
+    this._storage = storage;
+    this._maxBytes = opts?.maxBytes ?? DEFAULT_MAX_BYTES;
+    this._used = new Map();
+  }
+
+  async get(key: string): Promise<CachedRun | undefined> {
+    const index = await this._storage.readIndex();
+    if (!index?.runs[key]) return undefined;
+    const blob = await this._storage.readBlob(key);
+    if (!blob) {
+      // Evicted (by another cache) since the index was read.
+      await this._storage.updateIndex((index) => { delete index.runs[key] });
+      return undefined;
+    }
+    this._used.set(key, Date.now());
+    return decodeRun(blob);
+  }
+
+  async put(key: string, run: CachedRun): Promise<void> {
+    const blob = await encodeRun(run);
+    if (blob.byteLength > this._maxBytes) return;
+    // As with PackageCache.put, the blob is written before the index refers
+    // to it and evicted blobs are deleted after it stops referring to them.
+    await this._storage.writeBlob(key, blob);
+    const evicted = await this._storage.updateIndex((index) => {
+      for (const [k, lastUsed] of this._used) {
+        if (index.runs[k]) index.runs[k].lastUsed = Math.max(index.runs[k].lastUsed, lastUsed);
+      }
+      this._used.clear();
+      index.runs[key] = { size: blob.byteLength, lastUsed: Date.now() };
+      return this.evict(index);
+    });
+    for (const k of evicted) {
+      await this._storage.deleteBlob(k);
+    }
+  }
+
+  // Drops least recently used runs from the index, returning their keys.
+  private evict(index: RunCacheIndex): string[] {
+    let total = 0;
+    for (const r of Object.values(index.runs)) total += r.size;
+    const lru = Object.entries(index.runs).sort(([, a], [, b]) => a.lastUsed - b.lastUsed);
+    const evicted: string[] = [];
+    for (const [key, run] of lru) {
+      if (total <= this._maxBytes) break;
+      delete index.runs[key];
+      evicted.push(key);
+      total -= run.size;
+    }
+    return evicted;
+  }
+}
+
+// Answers repeated runs from a RunCache rather than running them again (see
+// runCacheKey for which runs are eligible). Everything else is passed through
+// to the wrapped runner.
+export class MemoizingRunner implements FiolinRunner {
+  private readonly _runner: FiolinRunner;
+  private readonly _cache: RunCache;
+  private readonly _console?: IConsole;
+
+  constructor(runner: FiolinRunner, cache: RunCache, console?: IConsole) {
+    this._runner = runner;
+    this._cache = cache;
+    this._console = console;
+  }
+
+  async installPkgs(script: FiolinScript): Promise<void> {
+    await this._runner.installPkgs(script);
+  }
+
+  async run(script: FiolinScript, request: FiolinRunRequest, forceReload?: boolean): Promise<FiolinRunResponse> {
+    const start = performance.now();
+    const key = await runCacheKey(script, request);
+    if (key && !forceReload) {
+      const cached = await this._cache.get(key).catch((e) => {
+        this._console?.warn(`Failed to read cached result: ${e}`);
+        return undefined;
+      });
+      if (cached) {
+        this._console?.debug(`Reusing the cached result of an identical run`);
+        const bytesIn = request.inputs.reduce((n, f) => n + f.size, 0);
+        const bytesOut = cached.outputs.reduce((n, f) => n + f.size, 0);
+        return {
+          ...cached,
+          debug: { timings: [], totalMs: performance.now() - start, bytesIn, bytesOut },
+        };
+      }
+    }
+    const response = await this._runner.run(script, request, forceReload);
+    if (key && !response.error && !response.partial) {
+      await this._cache.put(key, response).catch((e) => {
+        this._console?.warn(`Failed to cache result: ${e}`);
+      });
+    }
+    return response;
+  }
+}
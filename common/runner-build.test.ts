@@ -0,0 +1,61 @@
+import { describe, expect, it } from 'vitest';
+import { getStdout, mkRunner, mkScript } from './runner-test-util';
+import { buildSourceHash } from './runner';
+
+const importsJson = mkScript(`
+  import json
+  print(json.dumps({'says': 'a'}))
+`);
+
+const importsMicropip = mkScript(`
+  import micropip
+  print(micropip.__name__)
+`);
+
+describe('PyodideRunner builds', () => {
+  it('resolves the packages and compiles the script', async () => {
+    const runner = mkRunner();
+    const build = await runner.resolveBuild(importsMicropip);
+    expect(build.sourceHash).toEqual(await buildSourceHash(importsMicropip));
+    expect(build.builtins.map((p) => p.name)).toContain('micropip');
+    expect(build.builtins.every((p) => p.version.length > 0)).toBe(true);
+    expect(build.pythonPkgs).toEqual([]);
+    expect(build.bytecode).toBeTruthy();
+    // Only what the script needed.
+    const other = await runner.resolveBuild(importsJson);
+    expect(other.builtins).toEqual([]);
+  });
+
+  it('runs trusted builds', async () => {
+    const builder = mkRunner();
+    const build = await builder.resolveBuild(importsMicropip);
+    const runner = mkRunner({ trustBuilds: true });
+    const response = await runner.run({ ...importsMicropip, build }, { inputs: [] });
+    expect(response.error).toBeUndefined();
+    expect(getStdout(response)).toMatch(/micropip/);
+  });
+
+  it('uses the compiled code only while it matches the source', async () => {
+    const runner = mkRunner({ trustBuilds: true });
+    // A build whose code doesn't correspond to the source shows which one ran.
+    const build = await runner.resolveBuild(mkScript(`print('compiled')`));
+    const matching = { ...build, sourceHash: await buildSourceHash(importsJson) };
+    const ran = await runner.run({ ...importsJson, build: matching }, { inputs: [] });
+    expect(getStdout(ran)).toMatch(/compiled/);
+    const edited = mkScript(`print('edited')`);
+    const fallback = await runner.run({ ...edited, build: matching }, { inputs: [] });
+    expect(getStdout(fallback)).toMatch(/edited/);
+    // Likewise if only the runtime was edited.
+    const newRuntime = { ...importsJson, runtime: { pythonPkgs: [{ type: 'PYPI' as const, name: 'idna' }] } };
+    const reresolved = await runner.run({ ...newRuntime, build: matching }, { inputs: [] });
+    expect(getStdout(reresolved)).toMatch(/says/);
+  });
+
+  it('ignores builds unless told to trust them', async () => {
+    const runner = mkRunner();
+    const build = await runner.resolveBuild(mkScript(`print('compiled')`));
+    const matching = { ...build, sourceHash: await buildSourceHash(importsJson) };
+    const response = await runner.run({ ...importsJson, build: matching }, { inputs: [] });
+    expect(getStdout(response)).toMatch(/says/);
+  });
+});
@@ -1,7 +1,25 @@
 import { describe, expect, it } from 'vitest';
 import { getStdout, mkFile, mkRunner, mkScript } from './runner-test-util';
+import { createHash } from 'node:crypto';
 
 describe('PyodideRunner file system', () => {
+  it('copies in inputs larger than a chunk', async () => {
+    const runner = mkRunner();
+    const script = mkScript(`
+      import fiolin
+      import hashlib
+      with open(fiolin.get_input_path(), 'rb') as f:
+        contents = f.read()
+      print(len(contents), hashlib.sha256(contents).hexdigest())
+    `);
+    const contents = new Uint8Array(9 * 1024 * 1024 + 17);
+    for (let i = 0; i < contents.length; i++) contents[i] = i % 251;
+    const digest = createHash('sha256').update(contents).digest('hex');
+    const response = await runner.run(script, { inputs: [new File([contents], 'big')] });
+    expect(response.error).toBeUndefined();
+    expect(getStdout(response).trim()).toEqual(`${contents.length} ${digest}`);
+  });
+
   it('resets between runs', async () => {
     const runner = mkRunner();
     const script = mkScript(`
@@ -50,6 +68,27 @@ describe('PyodideRunner file system', () => {
     }
   });
 
+  it('starts each run with empty scratch directories', async () => {
+    const runner = mkRunner();
+    const script = mkScript(`
+      import fiolin
+      import os
+      print(len(os.listdir('/tmp')), len(os.listdir('/output')))
+      os.makedirs('/tmp/a/b')
+      for i in range(2000):
+        with open(f'/tmp/a/b/{i}', 'w') as f:
+          f.write(str(i))
+      with open('/output/out', 'w') as f:
+        f.write('out')
+    `);
+    for (let i = 0; i < 2; i++) {
+      const response = await runner.run(script, { inputs: [] });
+      expect(response.error).toBeUndefined();
+      expect(getStdout(response).trim()).toEqual('0 0');
+      expect(response.outputs.map((f) => f.name)).toEqual(['out']);
+    }
+  });
+
   describe('checks number of input/output files', () => {
     it('checks inputs when inputFiles NONE', async () => {
       const runner = mkRunner();
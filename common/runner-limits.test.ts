@@ -0,0 +1,81 @@
+import { describe, expect, it } from 'vitest';
+import { getStdout, mkRunner, mkScript } from './runner-test-util';
+import { QuotaExceededError, RunInterruptedError } from './types';
+
+const awaitForever = mkScript(`
+  import asyncio
+  async def main():
+    while True:
+      await asyncio.sleep(0.01)
+`);
+
+const sayHi = mkScript(`print('hi')`);
+
+describe('PyodideRunner limits', () => {
+  it('interrupts scripts past their deadline', async () => {
+    const runner = mkRunner({ timeoutMs: 200 });
+    const response = await runner.run(awaitForever, { inputs: [] });
+    expect(response.error).toBeInstanceOf(RunInterruptedError);
+    expect((response.error as RunInterruptedError).reason).toEqual('TIMEOUT');
+    // The same interpreter carries on with the next run.
+    const next = await runner.run(sayHi, { inputs: [] });
+    expect(next.error).toBeUndefined();
+    expect(getStdout(next)).toMatch(/hi/);
+  });
+
+  it('lets requests override the deadline', async () => {
+    const runner = mkRunner({ timeoutMs: 60000 });
+    const response = await runner.run(awaitForever, { inputs: [], timeoutMs: 200 });
+    expect((response.error as RunInterruptedError).reason).toEqual('TIMEOUT');
+  });
+
+  it('can be cancelled', async () => {
+    const runner = mkRunner();
+    const pending = runner.run(awaitForever, { inputs: [] });
+    setTimeout(() => runner.cancel(), 200);
+    const response = await pending;
+    expect((response.error as RunInterruptedError).reason).toEqual('CANCELLED');
+  });
+
+  it('caps the scratch files', async () => {
+    const runner = mkRunner({ maxFsBytes: 1024 * 1024 });
+    const script = mkScript(`
+      with open('/tmp/big', 'wb') as f:
+        f.write(b'x' * 2 * 1024 * 1024)
+    `);
+    const response = await runner.run(script, { inputs: [] });
+    expect(response.error).toBeInstanceOf(QuotaExceededError);
+    expect(response.error).toMatchObject({ resource: 'FS', limit: 1024 * 1024, used: 2 * 1024 * 1024 });
+    // The scratch directories start out empty again.
+    const next = await runner.run(sayHi, { inputs: [] });
+    expect(next.error).toBeUndefined();
+  });
+
+  it('caps the heap', async () => {
+    const runner = mkRunner({ maxHeapBytes: 1024 });
+    const response = await runner.run(sayHi, { inputs: [] });
+    expect(response.error).toBeInstanceOf(QuotaExceededError);
+    expect(response.error).toMatchObject({ resource: 'HEAP', limit: 1024 });
+  });
+
+  it('reports memory usage', async () => {
+    const runner = mkRunner();
+    const script = mkScript(`
+      with open('/tmp/scratch', 'wb') as f:
+        f.write(b'x' * 1000)
+    `);
+    const response = await runner.run(script, { inputs: [], measureFs: true });
+    expect(response.error).toBeUndefined();
+    expect(response.debug?.memory?.fsBytes).toEqual(1000);
+    expect(response.debug?.memory?.heapBytes).toBeGreaterThan(1024 * 1024);
+    expect(runner.memoryUsage).toEqual(response.debug?.memory);
+  });
+
+  it('only measures the scratch files when asked to', async () => {
+    const runner = mkRunner();
+    const response = await runner.run(sayHi, { inputs: [] });
+    expect(response.error).toBeUndefined();
+    expect(response.debug?.memory?.fsBytes).toBeUndefined();
+    expect(response.debug?.memory?.heapBytes).toBeGreaterThan(1024 * 1024);
+  });
+});
@@ -0,0 +1,88 @@
+import { describe, expect, it, vi } from 'vitest';
+import { getDebug, getStdout, mkFile, mkRunnerPool, mkScript, multiRe } from './runner-test-util';
+
+const idnaScript = mkScript(`
+  import idna
+  print(idna.encode('ドメイン.テスト'))
+`, { pkgs: ['idna'] });
+
+const magickScript = mkScript(`
+  import imagemagick
+  print(imagemagick.Magick.imageMagickVersion)
+`, { mods: ['imagemagick'] });
+
+describe('PyodideRunnerPool', () => {
+  it('keeps an interpreter per runtime', async () => {
+    const pool = mkRunnerPool();
+    for (const script of [idnaScript, magickScript]) {
+      const response = await pool.run(script, { inputs: [mkFile('foo', 'foo')] });
+      expect(response.error).toBeUndefined();
+    }
+    expect(pool.size).toEqual(2);
+    {
+      const response = await pool.run(idnaScript, { inputs: [mkFile('foo', 'foo')] });
+      expect(response.error).toBeUndefined();
+      expect(getStdout(response).trim()).toEqual("b'xn--eckwd4c7c.xn--zckzah'");
+      expect(getDebug(response)).toMatch(multiRe(
+        /Required packages\/modules already installed.*/,
+        /Resetting FS.*/
+      ));
+    }
+    {
+      const response = await pool.run(magickScript, { inputs: [mkFile('foo', 'foo')] });
+      expect(response.error).toBeUndefined();
+      expect(getStdout(response).trim()).toMatch(/ImageMagick.*imagemagick.org/);
+      expect(getDebug(response)).toMatch(/Required packages\/modules already installed/);
+    }
+  });
+
+  it('evicts the least recently used interpreter', async () => {
+    const pool = mkRunnerPool({ maxRunners: 1 });
+    for (const script of [idnaScript, magickScript]) {
+      const response = await pool.run(script, { inputs: [mkFile('foo', 'foo')] });
+      expect(response.error).toBeUndefined();
+    }
+    expect(pool.size).toEqual(1);
+    const response = await pool.run(idnaScript, { inputs: [mkFile('foo', 'foo')] });
+    expect(response.error).toBeUndefined();
+    expect(getDebug(response)).toMatch(/Installing package idna/);
+  });
+
+  it('swaps in a fresh interpreter once the heap is too big', async () => {
+    const pool = mkRunnerPool({ recycleHeapBytes: 1 });
+    // Counts the runs on each interpreter.
+    const script = mkScript(`
+      import builtins
+      builtins.runs = getattr(builtins, 'runs', 0) + 1
+      print(builtins.runs)
+    `);
+    const first = await pool.run(script, { inputs: [] });
+    expect(getStdout(first).trim()).toEqual('1');
+    expect(first.debug?.memory?.heapBytes).toBeGreaterThan(1);
+    // The old interpreter serves runs until the new one is ready.
+    const second = await pool.run(script, { inputs: [] });
+    expect(getStdout(second).trim()).toEqual('2');
+    await vi.waitFor(async () => {
+      const response = await pool.run(script, { inputs: [] });
+      expect(getStdout(response).trim()).toEqual('1');
+    }, { timeout: 60000, interval: 100 });
+  }, 120000);
+
+  it('never swaps out the interpreter of a partial run', async () => {
+    const pool = mkRunnerPool({ recycleHeapBytes: 1 });
+    const script = mkScript(`
+      import fiolin
+      n = (fiolin.state() or 0) + 1
+      print(n)
+      fiolin.continue_with(n)
+    `);
+    // Only runs that aren't partial start preparing a replacement.
+    expect((await pool.run(mkScript('pass'), { inputs: [] })).error).toBeUndefined();
+    for (let i = 1; i <= 3; i++) {
+      const response = await pool.run(script, { inputs: [] });
+      expect(getStdout(response).trim()).toEqual(`${i}`);
+      // Plenty of time for the replacement to be ready.
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  }, 120000);
+});
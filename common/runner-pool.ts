@@ -0,0 +1,151 @@
+import { FiolinRunner, FiolinRunRequest, FiolinRunResponse, FiolinScript } from './types';
+import { IConsole, PyodideRunner } from './runner';
+import { runtimeKey } from './snapshot';
+
+export interface PyodideRunnerPoolOptions {
+  // The maximum number of interpreters kept alive at once (default 3).
+  maxRunners?: number;
+  console?: IConsole;
+  // Once a run leaves an interpreter's WASM heap bigger than this, it's
+  // replaced by a fresh one with the same runtime. The replacement is loaded
+  // (and its packages installed) in the background, and the old interpreter
+  // keeps serving runs until it's ready. It's only swapped in after a run that
+  // isn't partial, since event runs continue from the state partial ones
+  // leave behind (see fiolin.continue_with).
+  recycleHeapBytes?: number;
+}
+
+const DEFAULT_MAX_RUNNERS = 3;
+
+// Keeps one PyodideRunner per runtime (i.e., set of python packages and wasm
+// modules), so that switching between scripts with different runtimes is a
+// lookup rather than a reload. Runners beyond maxRunners are evicted in least
+// recently used order.
+export class PyodideRunnerPool implements FiolinRunner {
+  private readonly _mkRunner: () => PyodideRunner;
+  private readonly _maxRunners: number;
+  private readonly _console?: IConsole;
+  // Iteration order of a Map is insertion order, so the first entry is always
+  // the least recently used.
+  private readonly _runners: Map<string, PyodideRunner>;
+  // A loaded runner not yet assigned to a runtime, so that the first script
+  // doesn't wait for an interpreter to start.
+  private _spare?: PyodideRunner;
+  private readonly _recycleHeapBytes?: number;
+  // Runtimes whose replacement interpreter is being loaded.
+  private readonly _recycling: Set<string>;
+  // Replacement interpreters that are ready, waiting for a run that isn't
+  // partial to finish on the ones they replace.
+  private readonly _replacements: Map<string, PyodideRunner>;
+  // Settles once the runs started so far on each runner finish, which they
+  // have to before it's closed.
+  private readonly _inProgress: WeakMap<PyodideRunner, Promise<void>>;
+  public loaded: Promise<void>;
+
+  constructor(mkRunner: () => PyodideRunner, options?: PyodideRunnerPoolOptions) {
+    this._mkRunner = mkRunner;
+    this._maxRunners = options?.maxRunners ?? DEFAULT_MAX_RUNNERS;
+    if (this._maxRunners < 1) {
+      throw new Error(`maxRunners must be at least 1; got ${this._maxRunners}`);
+    }
+    this._console = options?.console;
+    this._recycleHeapBytes = options?.recycleHeapBytes;
+    this._recycling = new Set();
+    this._replacements = new Map();
+    this._inProgress = new WeakMap();
+    this._runners = new Map();
+    this._spare = mkRunner();
+    this.loaded = this._spare.loaded;
+  }
+
+  get size(): number {
+    return this._runners.size;
+  }
+
+  private acquire(script: FiolinScript): PyodideRunner {
+    const key = runtimeKey(script.runtime);
+    let runner = this._runners.get(key);
+    if (runner) {
+      this._runners.delete(key);
+      this._runners.set(key, runner);
+      return runner;
+    }
+    runner = this._spare || this._mkRunner();
+    this._spare = undefined;
+    this._runners.set(key, runner);
+    for (const oldest of this._runners.keys()) {
+      if (this._runners.size <= this._maxRunners) break;
+      this._console?.debug(`Evicting interpreter for runtime ${oldest}`);
+      this.retire(this._runners.get(oldest)!);
+      this._runners.delete(oldest);
+      const replacement = this._replacements.get(oldest);
+      if (replacement) {
+        this.retire(replacement);
+        this._replacements.delete(oldest);
+      }
+    }
+    return runner;
+  }
+
+  // Closes the runner once whatever is running on it finishes. It must
+  // already be out of the pool, so that nothing new starts on it.
+  private retire(runner: PyodideRunner) {
+    const inProgress = this._inProgress.get(runner) || Promise.resolve();
+    inProgress.then(() => runner.close()).catch((e) => {
+      this._console?.warn(`Failed to close an interpreter: ${e}`);
+    });
+  }
+
+  async installPkgs(script: FiolinScript): Promise<void> {
+    await this.acquire(script).installPkgs(script);
+  }
+
+  async run(script: FiolinScript, request: FiolinRunRequest, forceReload?: boolean): Promise<FiolinRunResponse> {
+    const runner = this.acquire(script);
+    const done = runner.run(script, request, forceReload);
+    const prev = this._inProgress.get(runner);
+    this._inProgress.set(runner, Promise.allSettled([prev, done]).then(() => {}));
+    const response = await done;
+    // A partial run's state lives in this interpreter until a later run
+    // finishes the session.
+    if (response.partial) return response;
+    const key = runtimeKey(script.runtime);
+    const replacement = this._replacements.get(key);
+    if (replacement && this._runners.get(key) === runner) {
+      this._replacements.delete(key);
+      this._runners.set(key, replacement);
+      this.retire(runner);
+      return response;
+    }
+    const heapBytes = runner.memoryUsage?.heapBytes;
+    if (this._recycleHeapBytes !== undefined && heapBytes !== undefined && heapBytes > this._recycleHeapBytes) {
+      this.recycle(script, runner, heapBytes);
+    }
+    return response;
+  }
+
+  // Prepares a fresh interpreter for the runner's runtime, which is swapped in
+  // (see run) once it's loaded and has the script's packages installed.
+  // Dropping the old interpreter is what frees its heap (and anything scripts
+  // left in module-level state).
+  private recycle(script: FiolinScript, old: PyodideRunner, heapBytes: number) {
+    const key = runtimeKey(script.runtime);
+    if (this._recycling.has(key) || this._replacements.has(key)) return;
+    this._recycling.add(key);
+    this._console?.debug(`Heap reached ${heapBytes} bytes; preparing a fresh interpreter for runtime ${key}`);
+    const fresh = this._mkRunner();
+    fresh.installPkgs(script).then(() => {
+      // Unless the old one was evicted in the meantime.
+      if (this._runners.get(key) === old) {
+        this._replacements.set(key, fresh);
+      } else {
+        this.retire(fresh);
+      }
+    }, (e) => {
+      this._console?.warn(`Failed to prepare a fresh interpreter: ${e}`);
+      this.retire(fresh);
+    }).finally(() => {
+      this._recycling.delete(key);
+    });
+  }
+}
@@ -1,5 +1,6 @@
 import { describe, expect, it } from 'vitest';
 import { getDebug, getStdout, mkFile, mkRunner, mkScript, multiRe } from './runner-test-util';
+import { MemorySnapshotStore } from './snapshot';
 
 describe('PyodideRunner runtime options', () => {
   describe('python package installation', () => {
@@ -96,6 +97,43 @@ describe('PyodideRunner runtime options', () => {
         ));
       }
     });
+
+    it('names the package that failed to install', async () => {
+      const runner = mkRunner();
+      const script = mkScript(`
+        import idna
+      `, { pkgs: ['idna', 'fiolin-no-such-package'] });
+      const response = await runner.run(script, { inputs: [] });
+      expect(response.error?.name).toEqual('InstallPkgsError');
+      expect(response.error?.message).toEqual('Failed to install package fiolin-no-such-package');
+    });
+  });
+
+  describe('package snapshots', () => {
+    it('restores installed pkgs from a snapshot', async () => {
+      const snapshots = new MemorySnapshotStore();
+      const script = mkScript(`
+        import idna
+        print(idna.encode('ドメイン.テスト'))
+      `, { pkgs: ['idna'] });
+      {
+        const runner = mkRunner({ snapshots });
+        const response = await runner.run(script, { inputs: [] });
+        expect(response.error).toBeUndefined();
+        expect(getDebug(response)).toMatch(multiRe(
+          /Installing package idna.*/,
+          /Saving snapshot of installed python packages.*/,
+        ));
+      }
+      {
+        const runner = mkRunner({ snapshots });
+        const response = await runner.run(script, { inputs: [] });
+        expect(response.error).toBeUndefined();
+        expect(getStdout(response).trim()).toEqual("b'xn--eckwd4c7c.xn--zckzah'");
+        expect(getDebug(response)).toMatch(/Restoring python packages from snapshot/);
+        expect(getDebug(response)).not.toMatch(/Installing package idna/);
+      }
+    });
   });
 
   describe('wasm module installation', () => {
@@ -4,6 +4,10 @@ import { dedent } from './indent';
 import { IConsole, PyodideRunner } from './runner';
 import { FiolinForm, FiolinRunResponse, FiolinScript, FiolinScriptRuntime, FiolinWasmLoader, OutputValidator } from './types';
 import { readFileSync } from 'node:fs';
+import { SnapshotStore } from './snapshot';
+import { PyodideRunnerPool } from './runner-pool';
+import { InputMounter } from './input-mount';
+import { Watchdog } from './interrupt';
 
 export interface mkScriptOptions {
   pkgs?: string[];
@@ -65,6 +69,14 @@ export interface mkRunnerOptions {
   loaderOverrides?: Record<string, FiolinWasmLoader>;
   console?: IConsole;
   validators?: OutputValidator[];
+  snapshots?: SnapshotStore;
+  inputMounter?: InputMounter;
+  maxLogEntries?: number;
+  timeoutMs?: number;
+  watchdog?: Watchdog;
+  maxHeapBytes?: number;
+  maxFsBytes?: number;
+  trustBuilds?: boolean;
 }
 
 export function mkRunner(opts?: mkRunnerOptions): PyodideRunner {
@@ -74,6 +86,20 @@ export function mkRunner(opts?: mkRunnerOptions): PyodideRunner {
     loaders,
     console: opts?.console,
     validators: opts?.validators,
+    snapshots: opts?.snapshots,
+    inputMounter: opts?.inputMounter,
+    maxLogEntries: opts?.maxLogEntries,
+    timeoutMs: opts?.timeoutMs,
+    watchdog: opts?.watchdog,
+    maxHeapBytes: opts?.maxHeapBytes,
+    maxFsBytes: opts?.maxFsBytes,
+    trustBuilds: opts?.trustBuilds,
+  });
+}
+
+export function mkRunnerPool(opts?: mkRunnerOptions & { maxRunners?: number, recycleHeapBytes?: number }): PyodideRunnerPool {
+  return new PyodideRunnerPool(() => mkRunner(opts), {
+    maxRunners: opts?.maxRunners, recycleHeapBytes: opts?.recycleHeapBytes,
   });
 }
 
@@ -1,5 +1,5 @@
 import { describe, expect, it } from 'vitest';
-import { getStdout, mkRunner, mkScript } from './runner-test-util';
+import { getStdout, mkFile, mkRunner, mkScript } from './runner-test-util';
 
 describe('PyodideRunner basics', () => {
   it('runs', async () => {
@@ -10,6 +10,71 @@ describe('PyodideRunner basics', () => {
     expect(getStdout(response)).toMatch(/hello/);
   });
 
+  it('reports timings and byte counts', async () => {
+    const runner = mkRunner();
+    const script = mkScript(`
+      import fiolin
+      fiolin.cp(fiolin.get_input_path(), '/output/copy')
+      fiolin.zip_outputs()
+    `);
+    {
+      const response = await runner.run(script, { inputs: [mkFile('foo', 'foofoo')] });
+      expect(response.error).toBeUndefined();
+      const phases = response.debug!.timings.map(([phase, _]) => phase);
+      expect(phases).toEqual([
+        'LOAD', 'INSTALL_PKGS', 'LOAD_IMPORTS', 'RESET_FS', 'MOUNT_INPUTS',
+        'EXECUTE', 'EXTRACT_OUTPUTS', 'VALIDATE', 'ZIP',
+      ]);
+      expect(response.debug!.bytesIn).toEqual(6);
+      expect(response.debug!.bytesOut).toEqual(response.outputs[0].size);
+    }
+    {
+      // The interpreter was already loaded.
+      const response = await runner.run(script, { inputs: [mkFile('foo', 'foofoo')] });
+      expect(response.debug!.timings.map(([phase, _]) => phase)).not.toContain('LOAD');
+    }
+  });
+
+  it('reruns module-level code and picks up script changes', async () => {
+    const runner = mkRunner();
+    const script = mkScript(`
+      import sys
+      counter = globals().get('counter', 0) + 1
+      print(f'v1 {counter} {__name__} {sys.modules[__name__].__file__}')
+    `);
+    {
+      const response = await runner.run(script, { inputs: [] });
+      expect(response.error).toBeUndefined();
+      expect(getStdout(response)).toEqual('v1 1 script /home/pyodide/script.py\n');
+    }
+    {
+      // Like a module reload, globals from the previous run are still visible.
+      const response = await runner.run(script, { inputs: [] });
+      expect(getStdout(response)).toEqual('v1 2 script /home/pyodide/script.py\n');
+    }
+    {
+      const edited = mkScript(`print('v2')`);
+      const response = await runner.run(edited, { inputs: [] });
+      expect(getStdout(response)).toEqual('v2\n');
+    }
+  });
+
+  it('caps the log', async () => {
+    const runner = mkRunner({ maxLogEntries: 50 });
+    const script = mkScript(`
+      for i in range(100):
+        print(i)
+    `);
+    const response = await runner.run(script, { inputs: [] });
+    expect(response.error).toBeUndefined();
+    expect(response.log.length).toEqual(51);
+    expect(response.log[0][0]).toEqual('WARN');
+    expect(response.log[0][1]).toMatch(/^\d+ earlier log entries were dropped$/);
+    // Only the most recent output survives.
+    expect(getStdout(response)).not.toMatch(/^0\n/);
+    expect(getStdout(response)).toMatch(/\n99\n$/);
+  });
+
   describe('error handling', () => {
     it('reports exceptions and line numbers', async () => {
       const runner = mkRunner();
@@ -1,6 +1,6 @@
 import { loadPyodide, PyodideInterface } from 'pyodide';
-import { FiolinJsGlobal, FiolinLogLevel, FiolinPyPackage, FiolinRunner, FiolinRunRequest, FiolinRunResponse, FiolinScript, FiolinScriptRuntime, FiolinWasmLoader, FiolinWasmModule, FormUpdate, InstallPkgsError, OutputValidator } from './types';
-import { mkDir, readFile, rmRf, toErrWithErrno, writeFile } from './emscripten-fs';
+import { FiolinJsGlobal, FiolinLogLevel, FiolinMemoryUsage, FiolinPyPackage, FiolinRunner, FiolinRunRequest, FiolinRunResponse, FiolinScript, FiolinScriptBuild, FiolinScriptRuntime, FiolinWasmLoader, FiolinWasmModule, FormUpdate, InstallPkgsError, OutputValidator, QuotaExceededError, RunInterruptedError } from './types';
+import { listDir, mkDir, mountMemfs, readBlob, rmRf, toErrWithErrno, unmountIfMounted, writeFile } from './emscripten-fs';
 import { getFiolinPy, getWrapperPy } from './pylib';
 import { cmpSet } from './cmp';
 import { FiolinFormComponentMapImpl, idToComponentMap, idToRepr } from './form-utils';
@@ -8,7 +8,21 @@ import { FiolinFormComponent, FiolinFormComponentMap } from './types/form';
 import { parseAs } from './parse';
 import { pFormUpdate } from './parse-run';
 import { resultify } from './resultify';
-import { zipFilesRaw } from './zip';
+import { zipFiles } from './zip';
+import { restoreSnapshot, runtimeKey, SnapshotCapture, SnapshotStore } from './snapshot';
+import { PackageCache, PackageCacheMissError } from './pkg-cache';
+import { CopyInputMounter, InputMounter } from './input-mount';
+import { PhaseTimer } from './phase-timer';
+import { canFanOut, fanOut } from './fan-out';
+import { sha256Hex } from './hash';
+import { RingBuffer } from './ring-buffer';
+import { clearInterrupt, interrupt, interruptReason, mkInterruptBuffer, TimerWatchdog, Watchdog } from './interrupt';
+
+// Directories that start out empty for every run.
+const SCRATCH_DIRS = ['/output', '/tmp'];
+
+// Default for PyodideRunnerOptions.maxLogEntries.
+export const DEFAULT_MAX_LOG_ENTRIES = 10000;
 
 export interface IConsole {
   debug(s: string): void;
@@ -22,6 +36,57 @@ export interface PyodideRunnerOptions {
   indexUrl?: string;
   loaders?: Record<string, FiolinWasmLoader>;
   validators?: OutputValidator[];
+  // If present, the installed python packages for each runtime are captured
+  // here and restored on later loads with the same runtime.
+  snapshots?: SnapshotStore;
+  // If present, micropip downloads are read through this cache.
+  pkgCache?: PackageCache;
+  // Never download python packages; only use what's in pkgCache.
+  offline?: boolean;
+  // Node only: where pyodide caches the builtin packages it downloads.
+  packageCacheDir?: string;
+  // How inputs are made available under /input (default: copied into MEMFS).
+  inputMounter?: InputMounter;
+  // The most log entries kept for a run's response; older ones are dropped
+  // (but still passed to console as they happen).
+  maxLogEntries?: number;
+  // Interrupt scripts still running after this long (unless the request says
+  // otherwise). The deadline covers executing the script, not installing its
+  // packages.
+  timeoutMs?: number;
+  // What enforces timeoutMs (default: a TimerWatchdog).
+  watchdog?: Watchdog;
+  // The buffer to interrupt the script through (see ./interrupt.ts), e.g. so
+  // that other threads can cancel it. Several runners may share one, as long
+  // as they don't run at the same time: the interpreter only watches it during
+  // run(), so installing packages in the background doesn't.
+  interruptBuffer?: Int32Array;
+  // Fail runs once the WASM heap grows past this many bytes. The heap can't
+  // shrink, so the interpreter is reloaded before the next run.
+  maxHeapBytes?: number;
+  // Fail runs once the files in the scratch directories (/output and /tmp)
+  // add up to more than this.
+  maxFsBytes?: number;
+  // Use what scripts' builds resolved ahead of time (see FiolinScriptBuild)
+  // rather than working it out again. Only for scripts from a trusted source,
+  // since the compiled code can't be checked against the source.
+  trustBuilds?: boolean;
+}
+
+// How often resource use is checked while a script runs. The checks happen in
+// this thread, so they only get a chance while the script is awaiting
+// something; they're repeated once it's done.
+const QUOTA_CHECK_INTERVAL_MS = 250;
+
+// What a build's sourceHash covers: the code, and the runtime its packages
+// were resolved for (see FiolinScriptBuild).
+export async function buildSourceHash(script: FiolinScript): Promise<string> {
+  return await sha256Hex(JSON.stringify({ python: script.code.python, runtime: runtimeKey(script.runtime) }));
+}
+
+// Package names as PyPI compares them (PEP 503).
+function canonicalPkgName(name: string): string {
+  return name.toLowerCase().replace(/[-_.]+/g, '-');
 }
 
 function pyPkgKey(v: FiolinPyPackage): any[] {
@@ -52,11 +117,35 @@ export class PyodideRunner implements FiolinRunner {
   private _installed?: FiolinScriptRuntime;
   private readonly _indexUrl?: string;
   private readonly _console: IConsole;
-  private _log: [FiolinLogLevel, string][];
+  private readonly _log: RingBuffer<[FiolinLogLevel, string]>;
   private _formUpdates: FormUpdate[];
   private _formIds: FiolinFormComponentMap<FiolinFormComponent>;
   private _loaders: Record<string, FiolinWasmLoader>;
   private _validators: OutputValidator[];
+  private _snapshots?: SnapshotStore;
+  private _fetch: (input: RequestInfo | URL, init?: RequestInit) => Promise<Response>;
+  private readonly _packageCacheDir?: string;
+  private readonly _inputMounter: InputMounter;
+  private _unreportedLoadMs: number;
+  // What's been written to /home/pyodide in the current interpreter: fiolin.py
+  // never changes, and script.py only when a different script is run.
+  private _fiolinPyWritten: boolean;
+  private _scriptPyHash?: string;
+  private readonly _interrupt: Int32Array;
+  // What the interpreter watches outside of run(), which nothing else writes
+  // to.
+  private readonly _idleInterrupt: Int32Array;
+  private _running: boolean;
+  private readonly _watchdog: Watchdog;
+  private readonly _timeoutMs?: number;
+  private readonly _maxHeapBytes?: number;
+  private readonly _maxFsBytes?: number;
+  private readonly _trustBuilds: boolean;
+  // Set when a run blows through a quota, which aborts it.
+  private _quotaError?: QuotaExceededError;
+  // Set when the interpreter should be replaced before the next run.
+  private _needsReload: boolean;
+  private _memoryUsage?: FiolinMemoryUsage;
   public loaded: Promise<void>;
 
   constructor(options?: PyodideRunnerOptions) {
@@ -70,7 +159,7 @@ export class PyodideRunner implements FiolinRunner {
       error: (s) => { this._console.error(s) },
     };
     const innerConsole: IConsole = options?.console || console;
-    this._log = [];
+    this._log = new RingBuffer(options?.maxLogEntries || DEFAULT_MAX_LOG_ENTRIES);
     this._formUpdates = [];
     this._formIds = new FiolinFormComponentMapImpl();
     this._console = {
@@ -94,6 +183,34 @@ export class PyodideRunner implements FiolinRunner {
     this._indexUrl = options?.indexUrl;
     this._loaders = options?.loaders || {};
     this._validators = options?.validators || [];
+    this._snapshots = options?.snapshots;
+    this._packageCacheDir = options?.packageCacheDir;
+    this._inputMounter = options?.inputMounter || new CopyInputMounter();
+    this._unreportedLoadMs = 0;
+    this._fiolinPyWritten = false;
+    this._interrupt = options?.interruptBuffer || mkInterruptBuffer();
+    this._idleInterrupt = mkInterruptBuffer();
+    this._running = false;
+    this._watchdog = options?.watchdog || new TimerWatchdog();
+    this._timeoutMs = options?.timeoutMs;
+    this._maxHeapBytes = options?.maxHeapBytes;
+    this._maxFsBytes = options?.maxFsBytes;
+    this._trustBuilds = options?.trustBuilds || false;
+    this._needsReload = false;
+    const offline = options?.offline || false;
+    if (options?.pkgCache) {
+      this._fetch = options.pkgCache.fetcher({
+        offline, log: (s) => { this._console.debug(`micropip: ${s}`) },
+      });
+    } else {
+      this._fetch = async (input: RequestInfo | URL, init?: RequestInit): Promise<Response> => {
+        if (offline) {
+          throw new PackageCacheMissError(`Offline and no package cache to fetch ${input} from`);
+        }
+        this._console.debug(`micropip fetching ${input}`);
+        return fetch(input, init);
+      };
+    }
     this.loaded = this.load();
   }
 
@@ -110,22 +227,24 @@ export class PyodideRunner implements FiolinRunner {
     this._formUpdates.push(update);
   }
 
+  // Each run gets fresh MEMFS mounts for its scratch directories, which are
+  // unmounted (see unmountScratch) rather than emptied once it's over, so the
+  // cost doesn't depend on what the previous run left behind. /input is left
+  // to the InputMounter; it just has to exist with nothing mounted on it.
   private resetFs() {
     this._console.debug('Resetting FS');
     if (!this._pyodide) {
       throw new Error(`this._pyodide should be present before resetFs!`)
     }
-    rmRf(this._pyodide.FS, '/input', this._pyodide.ERRNO_CODES);
-    mkDir(this._pyodide.FS, '/input', this._pyodide.ERRNO_CODES);
-    rmRf(this._pyodide.FS, '/output', this._pyodide.ERRNO_CODES);
-    mkDir(this._pyodide.FS, '/output', this._pyodide.ERRNO_CODES);
-    rmRf(this._pyodide.FS, '/tmp', this._pyodide.ERRNO_CODES);
-    mkDir(this._pyodide.FS, '/tmp', this._pyodide.ERRNO_CODES);
-    rmRf(this._pyodide.FS, '/home/pyodide/fiolin.py', this._pyodide.ERRNO_CODES);
-    rmRf(this._pyodide.FS, '/home/pyodide/script.py', this._pyodide.ERRNO_CODES);
+    if (!unmountIfMounted(this._pyodide.FS, '/input', this._pyodide.ERRNO_CODES)) {
+      mkDir(this._pyodide.FS, '/input', this._pyodide.ERRNO_CODES);
+    }
+    for (const dir of SCRATCH_DIRS) {
+      mountMemfs(this._pyodide.FS, dir, this._pyodide.ERRNO_CODES);
+    }
   }
 
-  private async mountInputs(script: FiolinScript, inputs: File[]) {
+  private async mountInputs(script: FiolinScript, inputs: File[], build?: FiolinScriptBuild) {
     if (script.interface.inputFiles === 'NONE' && inputs.length > 0) {
       throw new Error(`Script expects no input files; got ${inputs.length}`);
     } else if (script.interface.inputFiles === 'SINGLE' && inputs.length !== 1) {
@@ -137,18 +256,49 @@ export class PyodideRunner implements FiolinRunner {
     if (!this._pyodide) {
       throw new Error(`this._pyodide should be present before resetFs!`);
     }
-    this._shared.inputs = [];
-    for (const input of inputs) {
-      const inBytes = new Uint8Array(await input.arrayBuffer());
-      this._shared.inputs.push(input.name);
-      writeFile(this._pyodide.FS, `/input/${input.name}`, inBytes, this._pyodide.ERRNO_CODES);
-    }
+    this._shared.inputs = inputs.map((input) => input.name);
+    await this._inputMounter.mount(this._pyodide, inputs);
     this._console.debug('Setting up python files');
-    writeFile(this._pyodide.FS, `/home/pyodide/fiolin.py`, getFiolinPy(this._pyodide), this._pyodide.ERRNO_CODES);
-    writeFile(this._pyodide.FS, `/home/pyodide/script.py`, script.code.python, this._pyodide.ERRNO_CODES);
+    // The fiolin module is only imported once per interpreter anyway, and the
+    // script is only recompiled when its hash changes (see _load_script).
+    this.writeFiolinPy();
+    const hash = await sha256Hex(script.code.python);
+    if (hash !== this._scriptPyHash) {
+      writeFile(this._pyodide.FS, `/home/pyodide/script.py`, script.code.python, this._pyodide.ERRNO_CODES);
+      this._scriptPyHash = hash;
+    }
+    this._shared.scriptHash = hash;
+    this._shared.scriptBytecode = build?.bytecode;
+  }
+
+  private writeFiolinPy() {
+    if (!this._fiolinPyWritten) {
+      writeFile(this._pyodide!.FS, `/home/pyodide/fiolin.py`, getFiolinPy(this._pyodide!), this._pyodide!.ERRNO_CODES);
+      this._fiolinPyWritten = true;
+    }
+  }
+
+  private unmountInputs() {
+    if (!this._pyodide) return;
+    try {
+      this._inputMounter.unmount(this._pyodide);
+    } catch (e) {
+      this._console.warn(`Failed to unmount inputs: ${toErrWithErrno(e, { errCodes: this._pyodide.ERRNO_CODES }).message}`);
+    }
   }
 
-  private async extractOutputs(script: FiolinScript): Promise<File[]> {
+  private unmountScratch() {
+    if (!this._pyodide) return;
+    for (const dir of SCRATCH_DIRS) {
+      try {
+        unmountIfMounted(this._pyodide.FS, dir, this._pyodide.ERRNO_CODES);
+      } catch (e) {
+        this._console.warn(`Failed to unmount ${dir}: ${toErrWithErrno(e, { errCodes: this._pyodide.ERRNO_CODES }).message}`);
+      }
+    }
+  }
+
+  private async extractOutputs(script: FiolinScript, request: FiolinRunRequest, timer: PhaseTimer): Promise<File[]> {
     if (this._shared.partial) {
       return [];
     }
@@ -170,22 +320,43 @@ export class PyodideRunner implements FiolinRunner {
     if (!this._pyodide) {
       throw new Error(`this._pyodide should be present before resetFs!`)
     }
-    const outFiles: [string, ArrayBuffer][] = [];
-    for (const output of this._shared.outputs) {
-      const outBytes = readFile(this._pyodide.FS, `/output/${output}`, this._pyodide.ERRNO_CODES);
-      outFiles.push([output, outBytes]);
-    }
-    const outputs = outFiles.map(([relPath, outBytes]) => {
-      return new File([new Blob([outBytes])], relPath);
+    // Each output is moved out of MEMFS as soon as it's read, so that at most
+    // one of them is ever held twice.
+    const pyodide = this._pyodide;
+    const outputs = await timer.time('EXTRACT_OUTPUTS', () => {
+      const blobs = new Map<string, Blob>();
+      const outputs: File[] = [];
+      for (const output of this._shared.outputs) {
+        let blob = blobs.get(output);
+        if (!blob) {
+          const path = `/output/${output}`;
+          blob = readBlob(pyodide.FS, path, pyodide.ERRNO_CODES);
+          rmRf(pyodide.FS, path, pyodide.ERRNO_CODES);
+          blobs.set(output, blob);
+        }
+        outputs.push(new File([blob], output));
+      }
+      return outputs;
     });
-    for (const v of this._validators) { v.validate(outputs); }
-    if (this._shared.zipOutputs) {
-      return [await zipFilesRaw(outFiles)];
+    await timer.time('VALIDATE', () => {
+      for (const v of this._validators) { v.validate(outputs); }
+    });
+    if (this._shared.zipOutputs && !request.skipZip) {
+      return [await timer.time('ZIP', () => zipFiles(outputs))];
     } else {
       return outputs;
     }
   }
 
+  // The run's log, noting how much of it (if any) was dropped.
+  private takeLog(): [FiolinLogLevel, string][] {
+    const log = this._log.toArray();
+    if (this._log.dropped > 0) {
+      log.unshift(['WARN', `${this._log.dropped} earlier log entries were dropped`]);
+    }
+    return log;
+  }
+
   private resetShared() {
     this._shared.inputs = [];
     this._shared.outputs = [];
@@ -198,13 +369,86 @@ export class PyodideRunner implements FiolinRunner {
   }
 
   private async load() {
+    const start = performance.now();
+    // A fresh interpreter has nothing installed (relevant for forceReload).
+    this._installed = undefined;
+    this._fiolinPyWritten = false;
+    this._scriptPyHash = undefined;
     this._pyodide = await loadPyodide({
       indexURL: this._indexUrl,
       jsglobals: this._shared,
+      packageCacheDir: this._packageCacheDir,
     });
     this._pyodide.setStdout({ batched: (s) => { this._console.info(s) } });
     this._pyodide.setStderr({ batched: (s) => { this._console.error(s) } });
+    // Reloads can happen partway through a run (see installPkgs).
+    this._pyodide.setInterruptBuffer(this._running ? this._interrupt : this._idleInterrupt);
+    this._needsReload = false;
     this._console.debug('Pyodide Loaded');
+    this._unreportedLoadMs += performance.now() - start;
+  }
+
+  private async installPyPkgs(pkgs: FiolinPyPackage[], key: string, build?: FiolinScriptBuild) {
+    if (!this._pyodide) {
+      throw new Error(`this._pyodide should be present after loading!`)
+    }
+    await this._pyodide.loadPackage('micropip');
+    const micropip = this._pyodide.pyimport('micropip');
+    const capture = (
+      this._snapshots && pkgs.length > 0 ?
+      new SnapshotCapture(this._pyodide) :
+      undefined);
+    for (const pkg of pkgs) {
+      this._console.debug(`Installing package ${pkg.name}`);
+    }
+    try {
+      if (build) {
+        // Everything was already resolved, so there's nothing left for
+        // micropip to do but download the wheels. The builtin packages are
+        // loaded first, as some of them are dependencies of the wheels.
+        await this._pyodide.loadPackage(build.builtins.map((pkg) => pkg.name));
+        await micropip.install(build.pythonPkgs.map((pkg) => `${pkg.name}==${pkg.version}`), { deps: false });
+      } else {
+        // A single call, so that micropip resolves the dependencies of all of
+        // them together and downloads them all concurrently.
+        await micropip.install(pkgs.map((pkg) => pkg.name), { deps: true });
+      }
+    } catch (cause) {
+      throw await this.pyPkgsError(micropip, pkgs, cause);
+    }
+    if (capture && this._snapshots) {
+      this._console.debug('Saving snapshot of installed python packages');
+      await this._snapshots.put(key, capture.finish());
+    }
+  }
+
+  // A failed micropip.install doesn't reliably say which of the packages was
+  // at fault, so find out by installing them one at a time.
+  private async pyPkgsError(micropip: any, pkgs: FiolinPyPackage[], cause: unknown): Promise<InstallPkgsError> {
+    if (pkgs.length > 1) {
+      for (const pkg of pkgs) {
+        try {
+          await micropip.install(pkg.name, { deps: true });
+        } catch (e) {
+          return new InstallPkgsError(`Failed to install package ${pkg.name}`, { cause: e });
+        }
+      }
+    }
+    return new InstallPkgsError(`Failed to install package ${pkgs.map((pkg) => pkg.name).join(', ')}`, { cause });
+  }
+
+  private async installWasmMod(mod: FiolinWasmModule) {
+    if (!this._pyodide) {
+      throw new Error(`this._pyodide should be present after loading!`)
+    }
+    this._console.debug(`Installing module ${mod.name}`);
+    const pystub = this._loaders[mod.name].pyWrapper(mod.name);
+    writeFile(this._pyodide.FS, `/home/pyodide/${mod.name}.py`, pystub, this._pyodide.ERRNO_CODES);
+    try {
+      this._shared[mod.name] = await this._loaders[mod.name].loadModule(this._pyodide);
+    } catch (cause) {
+      throw new InstallPkgsError(`Failed to install module ${mod.name}`, { cause });
+    }
   }
 
   async installPkgs(script: FiolinScript) {
@@ -229,40 +473,47 @@ export class PyodideRunner implements FiolinRunner {
         return;
       }
     }
-    try {
-      this._console.debug(`${pkgs.length} python packages to be installed`);
-      this._shared['fetch'] = (input: RequestInfo | URL, init?: RequestInit): Promise<Response> => {
-        this._console.debug(`micropip fetching ${input}`);
-        return fetch(input, init);
+    // Check the whole plan before starting any of it.
+    for (const pkg of pkgs) {
+      if (pkg.type !== 'PYPI') {
+        throw new InstallPkgsError(`Unknown package type: ${pkg.type}`);
       }
-      await this._pyodide.loadPackage('micropip');
-      const micropip = this._pyodide.pyimport('micropip');
-      for (const pkg of pkgs) {
-        if (pkg.type === 'PYPI') {
-          this._console.debug(`Installing package ${pkg.name}`);
-          try {
-            await micropip.install(pkg.name, { deps: true });
-          } catch (cause) {
-            throw new InstallPkgsError('Failed to install package', { cause });
-          }
-        } else {
-          throw new InstallPkgsError(`Unknown package type: ${pkg.type}`);
-        }
+    }
+    for (const mod of mods) {
+      if (!(mod.name in this._loaders)) {
+        throw new InstallPkgsError(`Unknown module: ${mod.name}`);
       }
+    }
+    this._shared['fetch'] = this._fetch;
+    try {
+      this._console.debug(`${pkgs.length} python packages to be installed`);
       this._console.debug(`${mods.length} wasm modules to be installed`);
-      for (const mod of mods) {
-        if (mod.name in this._loaders) {
-          this._console.debug(`Installing module ${mod.name}`);
-          const pystub = this._loaders[mod.name].pyWrapper(mod.name);
-          writeFile(this._pyodide.FS, `/home/pyodide/${mod.name}.py`, pystub, this._pyodide.ERRNO_CODES);
+      const key = runtimeKey(script.runtime);
+      const build = await this.trustedBuild(script);
+      const snapshot = pkgs.length > 0 ? await this._snapshots?.get(key) : undefined;
+      const pyodide = this._pyodide;
+      // The python packages, the wasm modules and the builtin packages the
+      // script imports are all fetched (and compiled) at the same time. The
+      // builtin packages wait if a snapshot is being captured, though, as they
+      // aren't part of the runtime. (Any failure loading those is left for
+      // run() to report, as it loads them again anyway.)
+      const pyPkgs = snapshot ?
+        (async () => {
+          this._console.debug(`Restoring python packages from snapshot`);
           try {
-            this._shared[mod.name] = await this._loaders[mod.name].loadModule(this._pyodide);
+            await restoreSnapshot(pyodide, snapshot);
           } catch (cause) {
-            throw new InstallPkgsError('Failed to install module', { cause });
+            throw new InstallPkgsError('Failed to restore packages from snapshot', { cause });
           }
-        } else {
-          throw new InstallPkgsError(`Unknown module: ${mod.name}`);
-        }
+        })() :
+        pkgs.length > 0 ? this.installPyPkgs(pkgs, key, build) : Promise.resolve();
+      const capturing = !snapshot && pkgs.length > 0 && !!this._snapshots;
+      const builtins = (capturing ? pyPkgs.catch(() => {}) : Promise.resolve())
+        .then(() => this.loadImports(script, build))
+        .catch(() => {});
+      const results = await Promise.allSettled([pyPkgs, ...mods.map((mod) => this.installWasmMod(mod)), builtins]);
+      for (const r of results) {
+        if (r.status === 'rejected') throw r.reason;
       }
       this._console.debug(`Finished installing packages/modules`);
       this._installed = structuredClone(script.runtime);
@@ -271,18 +522,202 @@ export class PyodideRunner implements FiolinRunner {
     }
   }
 
+  // The script's build, if it's trusted and still matches the script and the
+  // interpreter (see FiolinScriptBuild).
+  private async trustedBuild(script: FiolinScript): Promise<FiolinScriptBuild | undefined> {
+    const build = script.build;
+    if (!build || !this._trustBuilds || build.pyodide !== this._pyodide?.version) {
+      return undefined;
+    }
+    return build.sourceHash === await buildSourceHash(script) ? build : undefined;
+  }
+
+  // Loads the builtin packages that the script imports: those listed by its
+  // build, if there is one, and otherwise those found by scanning its code.
+  private async loadImports(script: FiolinScript, build?: FiolinScriptBuild) {
+    const pyodide = this._pyodide!;
+    if (!build) {
+      await pyodide.loadPackagesFromImports(script.code.python);
+      return;
+    }
+    const missing = build.builtins.map((pkg) => pkg.name).filter((name) => !(name in pyodide.loadedPackages));
+    if (missing.length > 0) {
+      await pyodide.loadPackage(missing);
+    }
+  }
+
+  // Works out what the script's build should say (see scripts/bundle.ts), by
+  // installing its packages and loading its imports just as a run would. It
+  // starts from a fresh interpreter, so that only what the script needs is
+  // loaded.
+  async resolveBuild(script: FiolinScript): Promise<FiolinScriptBuild> {
+    await this.loaded;
+    this.loaded = this.load();
+    await this.installPkgs({ ...script, build: undefined });
+    const pyodide = this._pyodide!;
+    await pyodide.loadPackagesFromImports(script.code.python);
+    // Taken before loading micropip (to list the packages), which the script
+    // itself may not need.
+    const loaded = new Set(Object.keys(pyodide.loadedPackages).map(canonicalPkgName));
+    await pyodide.loadPackage('micropip');
+    this.writeFiolinPy();
+    const buildInfo = pyodide.runPython('import fiolin; fiolin._build_info');
+    let info: { packages: { name: string, version: string, source: string }[], bytecode: string };
+    try {
+      info = JSON.parse(buildInfo(script.code.python));
+    } finally {
+      buildInfo.destroy();
+    }
+    const pin = ({ name, version }: { name: string, version: string }) => ({ name, version });
+    const byName = (a: { name: string }, b: { name: string }) => a.name < b.name ? -1 : a.name > b.name ? 1 : 0;
+    return {
+      sourceHash: await buildSourceHash(script),
+      pyodide: pyodide.version,
+      builtins: info.packages
+        .filter((p) => p.source === 'pyodide' && loaded.has(canonicalPkgName(p.name)))
+        .map(pin).sort(byName),
+      pythonPkgs: info.packages.filter((p) => p.source !== 'pyodide').map(pin).sort(byName),
+      bytecode: info.bytecode,
+    };
+  }
+
+  private activateModules() {
+    if (!this._pyodide) {
+      throw new Error(`this._pyodide should be present before activateModules!`)
+    }
+    for (const mod of this._installed?.wasmModules || []) {
+      this._loaders[mod.name]?.activate(this._pyodide);
+    }
+  }
+
+  // Interrupts the script that's running, which sees a KeyboardInterrupt (as
+  // soon as it's running python in this thread; see ./interrupt.ts). The
+  // runner stays usable afterwards. Other threads can do the same by writing
+  // to the interruptBuffer directly.
+  cancel() {
+    interrupt(this._interrupt, 'CANCELLED');
+  }
+
+  // Releases what the runner holds outside its interpreter (i.e., the
+  // watchdog's thread), once nothing will be run on it again.
+  async close(): Promise<void> {
+    await this._watchdog.close();
+  }
+
+  private heapBytes(): number {
+    return (this._pyodide as any)._module.HEAPU8.byteLength;
+  }
+
+  private scratchBytes(): number {
+    const fs = this._pyodide!.FS;
+    let total = 0;
+    for (const dir of SCRATCH_DIRS) {
+      for (const f of listDir(fs, dir, true, this._pyodide!.ERRNO_CODES)) {
+        const stat = fs.stat(f);
+        if (!fs.isDir(stat.mode)) total += stat.size;
+      }
+    }
+    return total;
+  }
+
+  // The memory used as of the end of the last run, if there's been one (see
+  // FiolinRunDebug.memory).
+  get memoryUsage(): FiolinMemoryUsage | undefined {
+    return this._memoryUsage;
+  }
+
+  private measureMemory(fsBytes?: number): FiolinMemoryUsage {
+    this._memoryUsage = { heapBytes: this.heapBytes(), fsBytes };
+    return this._memoryUsage;
+  }
+
+  // Records (and returns) the first quota the run has exceeded.
+  private checkQuotas(): QuotaExceededError | undefined {
+    if (!this._quotaError && this._maxHeapBytes !== undefined) {
+      const used = this.heapBytes();
+      if (used > this._maxHeapBytes) {
+        this._quotaError = new QuotaExceededError('HEAP', this._maxHeapBytes, used);
+        this._needsReload = true;
+      }
+    }
+    if (!this._quotaError && this._maxFsBytes !== undefined) {
+      const used = this.scratchBytes();
+      if (used > this._maxFsBytes) {
+        this._quotaError = new QuotaExceededError('FS', this._maxFsBytes, used);
+      }
+    }
+    return this._quotaError;
+  }
+
+  // Runs the script, interrupting it if it runs past its deadline or over its
+  // quotas.
+  private async execute(request: FiolinRunRequest) {
+    const timeoutMs = request.timeoutMs ?? this._timeoutMs;
+    const enforceQuotas = this._maxHeapBytes !== undefined || this._maxFsBytes !== undefined;
+    const quotaCheck = enforceQuotas ? setInterval(() => {
+      if (this.checkQuotas()) interrupt(this._interrupt, 'CANCELLED');
+    }, QUOTA_CHECK_INTERVAL_MS) : undefined;
+    if (timeoutMs !== undefined) {
+      this._watchdog.arm(this._interrupt, timeoutMs);
+    }
+    try {
+      await this._pyodide!.runPythonAsync(getWrapperPy());
+    } finally {
+      this._watchdog.disarm();
+      clearInterval(quotaCheck);
+    }
+    if (enforceQuotas) {
+      this.checkQuotas();
+    }
+  }
+
+  // What to report in place of the script's own error (a KeyboardInterrupt,
+  // or whatever the script turned it into) when it was stopped.
+  private stoppedError(cause?: unknown): Error | undefined {
+    if (this._quotaError) return this._quotaError;
+    const reason = interruptReason(this._interrupt);
+    return reason && new RunInterruptedError(reason, { cause });
+  }
+
+  // Switches the interpreter between the (possibly shared) interruptBuffer,
+  // while running, and a private one otherwise.
+  private watchInterrupt(running: boolean) {
+    this._running = running;
+    this._pyodide?.setInterruptBuffer(running ? this._interrupt : this._idleInterrupt);
+  }
+
+  // Interpreter load time not yet attributed to a run.
+  private takeLoadMs(): number {
+    const ms = this._unreportedLoadMs;
+    this._unreportedLoadMs = 0;
+    return ms;
+  }
+
   async run(script: FiolinScript, request: FiolinRunRequest, forceReload?: boolean): Promise<FiolinRunResponse> {
+    if (canFanOut(script, request)) {
+      // With just the one interpreter, the inputs are run one at a time.
+      return fanOut([this], script, request, forceReload);
+    }
+    const timer = new PhaseTimer();
+    const bytesIn = request.inputs.reduce((n, f) => n + f.size, 0);
+    let fsBytes: number | undefined;
     await this.loaded;
     if (!this._pyodide) {
       throw new Error(`this._pyodide should be present after loading!`)
     }
-    if (forceReload) {
+    if (forceReload || this._needsReload) {
       this._console.debug('Reloading interpreter');
       this.loaded = this.load();
       await this.loaded;
     }
-    this._log = [];
+    const loadMs = this.takeLoadMs();
+    if (loadMs > 0) timer.add('LOAD', loadMs);
+    this._log.clear();
     this.resetShared();
+    // Interrupts meant for an earlier run don't carry over.
+    clearInterrupt(this._interrupt);
+    this.watchInterrupt(true);
+    this._quotaError = undefined;
     Object.assign(this._shared.args!, request.args || {});
     this._shared.event = request.event;
     this._shared.canvases = request.canvases;
@@ -293,32 +728,55 @@ export class PyodideRunner implements FiolinRunner {
       } else {
         this._formIds = new FiolinFormComponentMapImpl();
       }
-      await this.installPkgs(script);
-      await this._pyodide.loadPackagesFromImports(script.code.python);
-      this.resetFs();
-      await this.mountInputs(script, request.inputs);
+      await timer.time('INSTALL_PKGS', () => this.installPkgs(script));
+      // Installing may have reloaded the interpreter; count that as loading.
+      const reloadMs = this.takeLoadMs();
+      if (reloadMs > 0) {
+        timer.add('LOAD', reloadMs);
+        timer.add('INSTALL_PKGS', -reloadMs);
+      }
+      this.activateModules();
+      const build = await this.trustedBuild(script);
+      await timer.time('LOAD_IMPORTS', () => this.loadImports(script, build));
+      await timer.time('RESET_FS', () => this.resetFs());
+      await timer.time('MOUNT_INPUTS', () => this.mountInputs(script, request.inputs, build));
       this._console.debug('Executing script.py');
-      await this._pyodide.runPythonAsync(getWrapperPy());
-      if (this._shared.errorMsg) {
+      await timer.time('EXECUTE', () => this.execute(request));
+      // Walking the scratch directories isn't free, so only when it matters.
+      if (request.measureFs || this._maxFsBytes !== undefined) {
+        fsBytes = this.scratchBytes();
+      }
+      const stopped = this.stoppedError();
+      if (this._shared.errorMsg || stopped) {
         return {
-          outputs: [], log: this._log,
-          error: new Error(this._shared.errorMsg), lineno: this._shared.errorLine,
+          outputs: [], log: this.takeLog(),
+          error: stopped || new Error(this._shared.errorMsg), lineno: stopped ? undefined : this._shared.errorLine,
           partial: this._shared.partial, formUpdates: this._formUpdates,
+          debug: timer.debug(bytesIn, 0, this.measureMemory(fsBytes)),
         };
       }
-      const outputs = await this.extractOutputs(script);
-      // TODO
+      const outputs = await this.extractOutputs(script, request, timer);
       const response: FiolinRunResponse = {
-        outputs, log: this._log,
+        outputs, log: this.takeLog(),
         partial: this._shared.partial, formUpdates: this._formUpdates,
+        debug: timer.debug(bytesIn, outputs.reduce((n, f) => n + f.size, 0), this.measureMemory(fsBytes)),
       };
+      if (this._shared.zipOutputs && request.skipZip) {
+        response.zipRequested = true;
+      }
       return response;
     } catch (e) {
-      const error = toErrWithErrno(e, this._pyodide.ERRNO_CODES);
+      const error = this.stoppedError(e) || toErrWithErrno(e, this._pyodide.ERRNO_CODES);
       return {
-        outputs: [], log: this._log, error,
+        outputs: [], log: this.takeLog(), error,
         partial: this._shared.partial, formUpdates: this._formUpdates,
+        debug: timer.debug(bytesIn, 0, this.measureMemory(fsBytes)),
       };
+    } finally {
+      clearInterrupt(this._interrupt);
+      this.watchInterrupt(false);
+      this.unmountInputs();
+      this.unmountScratch();
     }
   }
 }
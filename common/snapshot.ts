@@ -0,0 +1,121 @@
+import { PyodideInterface } from 'pyodide';
+import { FiolinScriptRuntime } from './types';
+import { isNotFound, listDir, mkDir, readFile, toErrWithErrno, writeFile } from './emscripten-fs';
+
+// A canonical string for a runtime; runtimes with the same set of packages and
+// modules (regardless of order) have the same key.
+export function runtimeKey(runtime: FiolinScriptRuntime): string {
+  const pkgs = (runtime.pythonPkgs || []).map((p) => `${p.type}:${p.name}`).sort();
+  const mods = (runtime.wasmModules || []).map((m) => m.name).sort();
+  return JSON.stringify({ pkgs, mods });
+}
+
+// The interpreter state produced by installing a runtime's python packages.
+// Note that this is not a snapshot of the wasm heap: pyodide's experimental
+// memory snapshots can't capture MEMFS (where installed packages live), so we
+// capture what micropip left behind instead. Restoring it skips dependency
+// resolution and downloads entirely.
+export interface RuntimeSnapshot {
+  // Pyodide builtin packages pulled in as dependencies. These are reloaded
+  // with loadPackage, which takes care of their shared libraries.
+  builtinPkgs: string[];
+  // Files micropip added to site-packages (absolute paths).
+  files: [string, Uint8Array][];
+}
+
+export abstract class SnapshotStore {
+  abstract get(key: string): Promise<RuntimeSnapshot | undefined>;
+  abstract put(key: string, snapshot: RuntimeSnapshot): Promise<void>;
+}
+
+// Keeps snapshots for the lifetime of the process (or web worker).
+export class MemorySnapshotStore extends SnapshotStore {
+  private readonly _snapshots: Map<string, RuntimeSnapshot>;
+
+  constructor() {
+    super();
+    this._snapshots = new Map();
+  }
+
+  async get(key: string): Promise<RuntimeSnapshot | undefined> {
+    return this._snapshots.get(key);
+  }
+
+  async put(key: string, snapshot: RuntimeSnapshot): Promise<void> {
+    this._snapshots.set(key, snapshot);
+  }
+}
+
+function sitePackages(pyodide: PyodideInterface): string {
+  return pyodide.runPython('import sysconfig; sysconfig.get_path("purelib")');
+}
+
+function listFiles(pyodide: PyodideInterface, dir: string): string[] {
+  const fs = pyodide.FS;
+  return listDir(fs, dir, true, pyodide.ERRNO_CODES).filter((f) => {
+    return !fs.isDir(fs.stat(f).mode);
+  });
+}
+
+function mkDirs(pyodide: PyodideInterface, path: string) {
+  let current = '';
+  for (const part of path.split('/').slice(1)) {
+    current += '/' + part;
+    try {
+      pyodide.FS.stat(current);
+    } catch (e) {
+      if (!isNotFound(e)) {
+        throw toErrWithErrno(e, { prefix: `stat("${current}") failed`, errCodes: pyodide.ERRNO_CODES });
+      }
+      mkDir(pyodide.FS, current, pyodide.ERRNO_CODES);
+    }
+  }
+}
+
+// Records the state before packages are installed; call finish() afterwards to
+// get the snapshot of what changed.
+export class SnapshotCapture {
+  private readonly _pyodide: PyodideInterface;
+  private readonly _dir: string;
+  private readonly _builtinBefore: Set<string>;
+  private readonly _filesBefore: Set<string>;
+
+  constructor(pyodide: PyodideInterface) {
+    this._pyodide = pyodide;
+    this._dir = sitePackages(pyodide);
+    this._builtinBefore = new Set(Object.keys(pyodide.loadedPackages));
+    this._filesBefore = new Set(listFiles(pyodide, this._dir));
+  }
+
+  finish(): RuntimeSnapshot {
+    const builtinPkgs = Object.keys(this._pyodide.loadedPackages).filter((p) => {
+      return !this._builtinBefore.has(p);
+    });
+    const files: [string, Uint8Array][] = [];
+    for (const f of listFiles(this._pyodide, this._dir)) {
+      if (this._filesBefore.has(f)) continue;
+      files.push([f, new Uint8Array(readFile(this._pyodide.FS, f, this._pyodide.ERRNO_CODES))]);
+    }
+    return { builtinPkgs, files };
+  }
+}
+
+export async function restoreSnapshot(pyodide: PyodideInterface, snapshot: RuntimeSnapshot) {
+  if (snapshot.builtinPkgs.length > 0) {
+    await pyodide.loadPackage(snapshot.builtinPkgs);
+  }
+  for (const [path, contents] of snapshot.files) {
+    // Builtin packages may have already put some of the same files in place.
+    try {
+      pyodide.FS.stat(path);
+      continue;
+    } catch (e) {
+      if (!isNotFound(e)) {
+        throw toErrWithErrno(e, { prefix: `stat("${path}") failed`, errCodes: pyodide.ERRNO_CODES });
+      }
+    }
+    mkDirs(pyodide, path.substring(0, path.lastIndexOf('/')));
+    writeFile(pyodide.FS, path, contents, pyodide.ERRNO_CODES);
+  }
+  pyodide.runPython('import importlib; importlib.invalidate_caches()');
+}
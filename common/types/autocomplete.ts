@@ -4,4 +4,19 @@ export interface AutocompleteSuggestion {
   id: string;
   link: string;
   meta: FiolinScriptMeta;
-}
\ No newline at end of file
+}
+
+// A search index over AutocompleteSuggestions (see common/autocomplete-index),
+// in a compact form that can be built ahead of time and shipped as JSON.
+export interface AutocompleteIndex {
+  // [link, title] of each suggestion, in catalog order.
+  docs: [string, string][];
+  // The distinct terms in the suggestions' metadata.
+  terms: string[];
+  // For each term, the suggestions it appears in, flattened into
+  // [doc, weight, doc, weight, ...] with doc ascending.
+  postings: number[][];
+  // Every trigram of every term to the ascending ids of the terms containing
+  // it. Shorter queries are matched by scanning the terms.
+  grams: Record<string, number[]>;
+}
@@ -11,6 +11,9 @@ export interface FiolinScript {
   runtime: FiolinScriptRuntime;
   // The actual script to run.
   code: FiolinScriptCode;
+  // Generated by fiolin's build for the scripts bundled with it; don't set it
+  // yourself (it's ignored for third-party scripts).
+  build?: FiolinScriptBuild;
 }
 
 // Metadata about your fiolin script.
@@ -61,6 +64,23 @@ export interface FiolinScriptInterface {
   form?: FiolinForm;
   // The default behavior of the terminal. Defaults to TEXT.
   terminal?: TerminalMode;
+  // Does the script handle each input file independently of the others? If so,
+  // it may be given any number of inputs, which are split into one run per
+  // input (in parallel where possible) whose outputs and logs are merged.
+  // inputFiles and outputFiles then describe each of those runs. Not
+  // supported for scripts whose form has a canvas, since only one runner can
+  // draw on it. Defaults to false.
+  perFile?: boolean;
+  // Does the script always produce the same outputs given the same inputs and
+  // args? If so, the results of its runs may be cached and reused. Runs of
+  // scripts with canvases and runs handling form events are never cached.
+  // Defaults to false.
+  deterministic?: boolean;
+  // Does only the latest of a burst of form events matter? If so, a run
+  // handling an event is dropped if another event of the same kind (and from
+  // the same component) arrives before it starts, in which case the newer one
+  // takes its place in line. Defaults to false.
+  coalesceEvents?: boolean;
 }
 
 // How the fiolin runner is meant to setup the environment for the script.
@@ -93,3 +113,31 @@ export interface FiolinScriptCode {
   // Python script contents.
   python: string;
 }
+
+// What the build resolved ahead of time for a script bundled with fiolin (see
+// scripts/bundle.ts), so that runs can skip scanning the code for imports,
+// resolving dependencies, and compiling. It's only used if the code, the
+// runtime and the pyodide version still match.
+export interface FiolinScriptBuild {
+  // The sha256 (in hex) of the python code and runtime it was built from.
+  sourceHash: string;
+  // The version of pyodide it was built with.
+  pyodide: string;
+  // The pyodide builtin packages the script needs, whether imported by it or
+  // required by its python packages.
+  builtins: FiolinPinnedPackage[];
+  // The python packages to install: pythonPkgs along with everything they
+  // depend on (besides builtins).
+  pythonPkgs: FiolinPinnedPackage[];
+  // The compiled script: the python magic number followed by the marshalled
+  // code, in base64.
+  bytecode?: string;
+}
+
+// A python package pinned to a specific version.
+export interface FiolinPinnedPackage {
+  // The name of the python package.
+  name: string;
+  // The exact version of it.
+  version: string;
+}
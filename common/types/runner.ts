@@ -5,6 +5,7 @@ import { Result } from './result';
 import { TypedPartial } from '../tagged-unions';
 import { ICanvasRenderingContext2D } from './canvas';
 import { FiolinFormEvent } from './events';
+import type { InterruptReason } from '../interrupt';
 
 // Used for encapsulating running a script.
 export interface FiolinRunRequest {
@@ -12,12 +13,50 @@ export interface FiolinRunRequest {
   args?: Record<string, string>;
   canvases?: Record<string, ICanvasRenderingContext2D>;
   event?: FiolinFormEvent;
-  // TODO: Add a debug section
+  // Leave the outputs unzipped even if the script calls zip_outputs(), setting
+  // zipRequested on the response instead. Used when merging several runs, so
+  // that their outputs can be zipped together.
+  skipZip?: boolean;
+  // Interrupt the script if it's still running after this long (overriding
+  // the runner's default; see PyodideRunnerOptions.timeoutMs).
+  timeoutMs?: number;
+  // Report FiolinMemoryUsage.fsBytes, which means walking the scratch
+  // directories once the script finishes.
+  measureFs?: boolean;
 }
 
 export const LOG_LEVELS = ['DEBUG', 'INFO', 'WARN', 'ERROR'] as const;
 export type FiolinLogLevel = (typeof LOG_LEVELS)[number];
 
+export const RUN_PHASES = [
+  'LOAD', 'INSTALL_PKGS', 'LOAD_IMPORTS', 'RESET_FS', 'MOUNT_INPUTS',
+  'EXECUTE', 'EXTRACT_OUTPUTS', 'VALIDATE', 'ZIP',
+] as const;
+export type FiolinRunPhase = (typeof RUN_PHASES)[number];
+
+// Machine-readable details about how a run went.
+export interface FiolinRunDebug {
+  // Milliseconds spent in each phase, in the order they happened. Phases that
+  // didn't happen (e.g., LOAD on a warm interpreter) are left out.
+  timings: [FiolinRunPhase, number][];
+  // Milliseconds for the whole run.
+  totalMs: number;
+  // Total size of the inputs and outputs.
+  bytesIn: number;
+  bytesOut: number;
+  // How much memory the interpreter was using once the script finished.
+  memory?: FiolinMemoryUsage;
+}
+
+export interface FiolinMemoryUsage {
+  // The size of the WASM heap, which only ever grows.
+  heapBytes: number;
+  // The total size of the files left in the scratch directories (/output and
+  // /tmp) by the script. Only measured if the request asked for it (see
+  // FiolinRunRequest.measureFs) or the runner has a maxFsBytes.
+  fsBytes?: number;
+}
+
 export interface FiolinRunResponse {
   outputs: File[];
   log: [FiolinLogLevel, string][];
@@ -25,6 +64,10 @@ export interface FiolinRunResponse {
   lineno?: number;
   partial?: boolean;
   formUpdates?: FormUpdate[];
+  debug?: FiolinRunDebug;
+  // Set when the script asked for its outputs to be zipped but the request
+  // had skipZip set.
+  zipRequested?: boolean;
 }
 
 export type FormUpdate = (
@@ -44,6 +87,11 @@ export type FiolinJsGlobal = Omit<FiolinRunRequest, 'inputs'> & {
   // Should the runner zip the outputs up into a single file?
   zipOutputs?: boolean;
 
+  // Hash of the script's source, used to cache its compiled code.
+  scriptHash?: string;
+  // The script's compiled code, if it has a build that can be used.
+  scriptBytecode?: string;
+
   // Used to pass exceptions back to the host
   errorMsg?: string;
   errorLine?: number;
@@ -77,6 +125,10 @@ export abstract class FiolinWasmLoader {
     return `import js\nfor k, v in js.${moduleName}.object_entries():\n  globals()[k] = v\n`;
   }
   abstract loadModule(pyodide: PyodideInterface): Promise<any>;
+  // Called before each run. Modules that are global to the JS realm (rather
+  // than per-interpreter) should re-point themselves at the given interpreter
+  // here, since there may be several interpreters alive at once.
+  activate(pyodide: PyodideInterface): void {}
 }
 
 export class InstallPkgsError extends Error {
@@ -86,6 +138,37 @@ export class InstallPkgsError extends Error {
   }
 }
 
+// The script was stopped before it finished, either at the host's request or
+// because it ran past its deadline.
+export class RunInterruptedError extends Error {
+  public readonly reason: InterruptReason;
+
+  constructor(reason: InterruptReason, options?: ErrorOptions) {
+    super(reason === 'TIMEOUT' ? 'Script ran past its deadline' : 'Script was cancelled', options);
+    this.name = 'RunInterruptedError';
+    this.reason = reason;
+  }
+}
+
+export type QuotaResource = 'HEAP' | 'FS';
+
+// The run used more of a resource than the runner allows (see
+// PyodideRunnerOptions.maxHeapBytes and maxFsBytes).
+export class QuotaExceededError extends Error {
+  public readonly resource: QuotaResource;
+  public readonly limit: number;
+  public readonly used: number;
+
+  constructor(resource: QuotaResource, limit: number, used: number, options?: ErrorOptions) {
+    const what = resource === 'HEAP' ? 'WASM heap' : 'Scratch files';
+    super(`${what} reached ${used} bytes; the limit is ${limit}`, options);
+    this.name = 'QuotaExceededError';
+    this.resource = resource;
+    this.limit = limit;
+    this.used = used;
+  }
+}
+
 export abstract class OutputValidator {
   abstract validate(outputs: File[]): void;
 }
@@ -1,46 +1,54 @@
-import { zip, AsyncZipOptions, AsyncZippable }  from 'fflate';
+import { Zip, ZipDeflate } from 'fflate';
 
-async function toZippable(pathAndContents: [string, ArrayBuffer | Promise<ArrayBuffer>][]): Promise<AsyncZippable> {
-  const root: AsyncZippable = {};
-  for (const [path, content] of pathAndContents) {
-    let bytes: Uint8Array;
-    if (content instanceof Promise) {
-      bytes = new Uint8Array(await content);
-    } else {
-      bytes = new Uint8Array(content);
+// Compressed data is gathered into a Blob part whenever this much of it has
+// accumulated, so that the finished archive is never one big Uint8Array.
+const FLUSH_SIZE = 4 * 1024 * 1024;
+
+// Zips the given files (whose names may include directories) into a single
+// Blob, streaming each input through the compressor a chunk at a time.
+export async function zipBlobs(pathAndContents: [string, Blob][]): Promise<Blob> {
+  const parts: Blob[] = [];
+  let pending: Uint8Array[] = [];
+  let pendingSize = 0;
+  const flush = () => {
+    if (pending.length === 0) return;
+    parts.push(new Blob(pending));
+    pending = [];
+    pendingSize = 0;
+  };
+  let zipErr: Error | null = null;
+  let finished = false;
+  const zip = new Zip((err, data, final) => {
+    if (err) {
+      zipErr = err;
+      return;
     }
-    const parts = path.split('/');
-    let currentDir = root;
-    for (let i = 0; i < parts.length - 1; i++) {
-      const part = parts[i];
-      if (!(part in currentDir)) {
-        currentDir[part] = {};
-      }
-      currentDir = currentDir[part] as AsyncZippable;
+    pending.push(data);
+    pendingSize += data.length;
+    if (pendingSize >= FLUSH_SIZE) flush();
+    finished = final;
+  });
+  for (const [path, content] of pathAndContents) {
+    const entry = new ZipDeflate(path);
+    zip.add(entry);
+    const reader = content.stream().getReader();
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      entry.push(value);
+      if (zipErr) throw zipErr;
     }
-    const fileName = parts[parts.length - 1];
-    currentDir[fileName] = bytes;
+    entry.push(new Uint8Array(0), true);
+    if (zipErr) throw zipErr;
   }
-  return root;
-}
-
-function zipAsync(data: AsyncZippable, opts: AsyncZipOptions): Promise<Uint8Array> {
-  return new Promise((resolve, reject) => {
-    zip(data, opts, (err, data) => {
-      if (err !== null) {
-        reject(err);
-      } else {
-        resolve(data);
-      }
-    });
-  });
-}
-
-export async function zipFilesRaw(pathAndContents: [string, ArrayBuffer | Promise<ArrayBuffer>][]): Promise<File> {
-  const bytes = await zipAsync(await toZippable(pathAndContents), {});
-  return new File([bytes], 'output.zip');
+  zip.end();
+  if (zipErr) throw zipErr;
+  if (!finished) throw new Error('zip did not finish');
+  flush();
+  return new Blob(parts);
 }
 
 export async function zipFiles(files: File[]): Promise<File> {
-  return zipFilesRaw(files.map((f) => [f.name, f.arrayBuffer()]));
+  const zipped = await zipBlobs(files.map((f) => [f.name, f]));
+  return new File([zipped], 'output.zip');
 }
@@ -1,5 +1,6 @@
 import { redent } from '../../common/indent';
-import { AutocompleteSuggestion, FiolinScript } from '../../common/types';
+import { AutocompleteIndex, AutocompleteSuggestion, FiolinScript } from '../../common/types';
+import { buildAutocompleteIndex } from '../../common/autocomplete-index';
 
 export function generateSuggestions(scripts: Record<string, FiolinScript>): AutocompleteSuggestion[] {
   const suggestions: AutocompleteSuggestion[] = [];
@@ -9,6 +10,11 @@ export function generateSuggestions(scripts: Record<string, FiolinScript>): Auto
   return suggestions;
 }
 
+// Indexes the suggestions up front, so that the client doesn't have to.
+export function generateAutocompleteIndex(scripts: Record<string, FiolinScript>): AutocompleteIndex {
+  return buildAutocompleteIndex(generateSuggestions(scripts));
+}
+
 export function renderAutocomplete(numSpaces: number): string {
   return redent(`
     <div id="autocomplete" class="autocomplete">
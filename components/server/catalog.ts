@@ -1,4 +1,3 @@
-import { loadAll } from '../../utils/config';
 import { redent } from '../../common/indent';
 import { FiolinScript } from '../../common/types';
 
@@ -15,8 +14,7 @@ function renderEntries(scripts: Record<string, FiolinScript>, numSpaces: number)
   return Object.entries(scripts).map(([id, script]) => renderEntry(id, script, numSpaces)).join('\n');
 }
 
-export async function renderCatalog(numSpaces?: number) {
-  const scripts = await loadAll();
+export function renderCatalog(scripts: Record<string, FiolinScript>, numSpaces?: number) {
   return redent(`
     <div class="container">
       <a href="/" class="plain-link"><h1>ƒ<span class="home-io">ɪᴏ</span>ʟɪɴ</h1></a>
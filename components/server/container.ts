@@ -42,6 +42,9 @@ export function renderContainer(opts?: FiolinContainerOptions): string {
           <div class="deploy-button circle-button button ${depHidden}" data-rel-id="deploy-button" title="Deploy To Github">
             ${loadSvg('deploy')}
           </div>
+          <div class="stop-button circle-button button" data-rel-id="stop-button" title="Stop Script">
+            ${loadSvg('stop')}
+          </div>
         </div>
         ${renderDeployDialog(ns + 4)}
       </div>
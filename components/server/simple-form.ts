@@ -8,7 +8,7 @@ export function renderSimpleForm(opts?: { script?: FiolinScript, numSpaces?: num
   // Should be kept in sync or shared with web/simple-form
   const txt: string = typeSwitch({ type: opts?.script?.interface?.inputFiles || 'NONE' }, {
     'NONE': (_) => '',
-    'SINGLE': (_) => 'Choose File',
+    'SINGLE': (_) => opts?.script?.interface?.perFile ? 'Choose File(s)' : 'Choose File',
     'MULTI': (_) => 'Choose Files',
     'ANY': (_) => 'Choose File(s)',
   });
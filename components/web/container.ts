@@ -1,4 +1,4 @@
-import { WorkerMessage } from '../../web-utils/types';
+import { mkErrorMessage, WorkerMessage } from '../../web-utils/types';
 import { Deferred } from '../../common/deferred';
 import { getErrMsg, toErr } from '../../common/errors';
 import { FiolinFormEvent, FiolinRunRequest, FiolinScript } from '../../common/types';
@@ -18,20 +18,32 @@ import { UrlLoader } from './url-loader';
 import { LoaderComponent } from './loader-component';
 import { ThirdParty } from './third-party';
 import { sendEvent } from '../../web-utils/analytics';
+import { WorkerRunner } from '../../web-utils/worker-runner';
+import { canFanOut, fanOut } from '../../common/fan-out';
 
+// Upper bound on the workers (each with its own interpreter) used to split up
+// per-file runs, regardless of the number of cores.
+const MAX_FAN_OUT_WORKERS = 8;
+
+// The download streams straight from the Blob; the object URL is released
+// afterwards so that large outputs don't stay pinned in memory.
 function downloadFile(f: File) {
   const elem = document.createElement('a');
-  elem.href = window.URL.createObjectURL(f);
+  const url = window.URL.createObjectURL(f);
+  elem.href = url;
   elem.download = f.name;
   document.body.appendChild(elem);
   elem.click();        
   document.body.removeChild(elem);
+  setTimeout(() => window.URL.revokeObjectURL(url), 60000);
 }
 
 export type ContainerOpts = CommonContainerOpts & (FirstPartyContainerOpts | ThirdPartyContainerOpts | PlaygroundContainerOpts);
 
 export interface CommonContainerOpts {
   workerEndpoint?: string;
+  // Stop runs of the script that take longer than this.
+  timeoutMs?: number;
   storage?: StorageLike;
   test?: {
     worker: ITypedWorker;
@@ -87,6 +99,10 @@ function mkWorker(opts: ContainerOpts): ITypedWorker {
   if (opts.test?.worker) {
     return opts.test.worker;
   }
+  return mkRealWorker(opts);
+}
+
+function mkRealWorker(opts: ContainerOpts): TypedWorker {
   let endpoint = opts.workerEndpoint || '/bundle/worker.js';
   const joiner = endpoint.includes('?') ? '&' : '?';
   endpoint += joiner + 'type=' + opts.type;
@@ -98,6 +114,7 @@ export class Container {
   private readonly scriptTitle: HTMLDivElement;
   private readonly modeButton: HTMLDivElement;
   private readonly deployButton: HTMLDivElement;
+  private readonly stopButton: HTMLDivElement;
   private readonly thirdParty: ThirdParty;
   private readonly scriptDesc: HTMLPreElement;
   private readonly loader: LoaderComponent;
@@ -106,6 +123,9 @@ export class Container {
   private readonly editor: Editor;
   private readonly terminal: Terminal;
   private readonly worker: ITypedWorker;
+  private readonly runner: WorkerRunner;
+  // Extra workers for splitting up per-file runs, started on first use.
+  private readonly fanOutRunners: WorkerRunner[];
   private readonly opts: ContainerOpts;
   private loadedScript?: FiolinScript;
   private yml: string;
@@ -118,6 +138,7 @@ export class Container {
     this.scriptTitle = getByRelIdAs(container, 'script-title', HTMLDivElement);
     this.modeButton = getByRelIdAs(container, 'dev-mode-button', HTMLDivElement);
     this.deployButton = getByRelIdAs(container, 'deploy-button', HTMLDivElement);
+    this.stopButton = getByRelIdAs(container, 'stop-button', HTMLDivElement);
     const storage: StorageLike = opts.storage || window.localStorage;
     const thirdPartyOpts = (
       opts.type === '3P' ?
@@ -148,12 +169,17 @@ export class Container {
     }, opts?.test?.editor);
     this.terminal = new Terminal(container);
     this.worker = mkWorker(opts);
+    this.runner = new WorkerRunner(this.worker);
+    this.fanOutRunners = [];
     this.worker.onerror = (e) => {
       console.error(getErrMsg(e));
       this.terminal.fatal(getErrMsg(e));
+      this.runner.fail(new Error(getErrMsg(e)));
     };
     this.worker.onmessage = (msg) => {
-      this.handleMessage(msg);
+      if (!this.runner.consume(msg)) {
+        this.handleMessage(msg);
+      }
     }
     this.yml = '';
     this.script = this.loadScript();
@@ -223,11 +249,18 @@ export class Container {
       const script = await this.script;
       this.deployDialog.showModal(script, this.yml);
     };
+    this.stopButton.onclick = () => {
+      if (!this.cancel()) {
+        this.terminal.log([['WARN', 'Runs can\'t be stopped on this page (it isn\'t cross-origin isolated)']]);
+      }
+    };
   }
 
   private async scriptUpdated(script: FiolinScript, raw: string, model: FiolinScriptEditorModel) {
     const currentScript = await this.script;
     Object.assign(currentScript, script);
+    // What the build resolved may no longer hold for the edited script.
+    delete currentScript.build;
     if (model === 'script.yml') {
       this.yml = raw;
       await this.updateUiForScript(script);
@@ -246,7 +279,7 @@ export class Container {
     if (!this.form.reportValidity()) {
       return;
     }
-    const request: FiolinRunRequest = { inputs: files, args, event };
+    const request: FiolinRunRequest = { inputs: files, args, event, timeoutMs: this.opts.timeoutMs };
     const opts: { setCanvases?: Record<string, OffscreenCanvas> } = {};
     this.form.onRun(request, opts);
     const script = await this.script;
@@ -255,12 +288,64 @@ export class Container {
     this.terminal.clear();
     await this.editor.clearErrors();
     this.container.classList.add('running');
-    this.worker.postMessage({
-      type: 'RUN',
-      script,
-      request,
-      setCanvases: opts.setCanvases,
-    }, opts.setCanvases ? Object.values(opts.setCanvases) : undefined);
+    if (canFanOut(script, request)) {
+      await this.runFanOut(script, request, opts.setCanvases);
+      return;
+    }
+    await this.runner.postRun(script, request, opts.setCanvases);
+  }
+
+  // Splits a per-file run across the main worker and as many others as there
+  // are cores for (each handling one input at a time), then reports the merged
+  // response just as if the main worker had sent it. Only the main worker has
+  // the canvases.
+  private async runFanOut(script: FiolinScript, request: FiolinRunRequest, setCanvases?: Record<string, OffscreenCanvas>) {
+    if (setCanvases) {
+      this.runner.setCanvases(setCanvases);
+    }
+    const n = this.opts.test ? 1 : Math.min(
+      request.inputs.length, navigator.hardwareConcurrency || 1, MAX_FAN_OUT_WORKERS);
+    while (this.fanOutRunners.length < n - 1) {
+      this.fanOutRunners.push(this.mkFanOutRunner());
+    }
+    let msg: WorkerMessage;
+    try {
+      const response = await fanOut([this.runner, ...this.fanOutRunners.slice(0, n - 1)], script, request);
+      msg = response.error ?
+        mkErrorMessage(response.error, response.lineno, response) :
+        { type: 'SUCCESS', response };
+    } catch (e) {
+      msg = mkErrorMessage(e);
+    }
+    await this.handleMessage(msg);
+  }
+
+  // Stops the script that's running, leaving the workers ready for the next
+  // run. Returns false if they can't be interrupted (see WorkerRunner.cancel).
+  cancel(): boolean {
+    let cancelled = this.runner.cancel();
+    for (const r of this.fanOutRunners) {
+      cancelled = r.cancel() && cancelled;
+    }
+    return cancelled;
+  }
+
+  private mkFanOutRunner(): WorkerRunner {
+    const worker = mkRealWorker(this.opts);
+    const runner = new WorkerRunner(worker);
+    worker.onerror = (e) => {
+      console.error(getErrMsg(e));
+      runner.fail(new Error(getErrMsg(e)));
+    };
+    worker.onmessage = (msg) => {
+      if (runner.consume(msg)) return;
+      if (msg.type === 'LOG') {
+        this.terminal.log(msg.entries);
+      } else if (msg.type === 'ERROR') {
+        console.error(msg.error);
+      }
+    };
+    return runner;
   }
 
   private async handleMessage(msg: WorkerMessage): Promise<void> {
@@ -270,7 +355,13 @@ export class Container {
       await this.script;
       this.readyToRun.resolve();
     } else if (msg.type === 'LOG') {
-      this.terminal.log(msg.level, msg.value);
+      this.terminal.log(msg.entries);
+    } else if (msg.type === 'QUEUE') {
+      // Lets the page show that input is still being caught up on.
+      this.container.dataset.queueDepth = `${msg.depth}`;
+      this.container.classList.toggle('queued', msg.depth > 0);
+    } else if (msg.type === 'SUPERSEDED') {
+      // A later run of the same kind took its place, and will report instead.
     } else if (msg.type === 'SUCCESS') {
       this.form.onSuccess(msg.response);
       this.container.classList.remove('running');
@@ -31,7 +31,7 @@ export class SimpleForm extends FormComponent {
   
   onLoad(script: FiolinScript) {
     this.ui = script.interface;
-    if (this.ui.inputFiles === 'NONE' || this.ui.inputFiles === 'SINGLE') {
+    if (this.ui.inputFiles === 'NONE' || (this.ui.inputFiles === 'SINGLE' && !this.ui.perFile)) {
       this.fileChooser.multiple = false;
     } else {
       this.fileChooser.multiple = true;
@@ -98,7 +98,7 @@ export class SimpleForm extends FormComponent {
     if ((files === null || files.length === 0) && this.ui) {
       const txt: string = typeSwitch({ type: this.ui.inputFiles }, {
         'NONE': (_) => '',
-        'SINGLE': (_) => 'Choose File',
+        'SINGLE': (_) => this.ui?.perFile ? 'Choose File(s)' : 'Choose File',
         'MULTI': (_) => 'Choose Files',
         'ANY': (_) => 'Choose File(s)',
       });
@@ -1,6 +1,8 @@
-import { FiolinLogLevel, FiolinScript, TerminalMode } from '../../common/types';
+import { FiolinLogLevel, FiolinScript, LOG_LEVELS, TerminalMode } from '../../common/types';
 import { getByRelIdAs, selectAllAs, selectAs } from '../../web-utils/select-as';
 import { setSelected } from '../../web-utils/set-selected';
+import { RingBuffer } from '../../common/ring-buffer';
+import { VirtualRows } from '../../web-utils/virtual-rows';
 
 interface RenderedMode {
   select: HTMLSelectElement;
@@ -12,41 +14,53 @@ interface RenderedLogFilter {
   active: Record<FiolinLogLevel, boolean>;
 }
 
+// The most lines the terminal keeps; older ones are dropped.
+const MAX_TERMINAL_LINES = 10000;
+
 interface RenderedText {
   fatal?: string;
   div: HTMLDivElement;
-  entries: RenderedTextSpan[];
+  lines: RingBuffer<TextLine>;
+  rows: VirtualRows<TextLine>;
 }
 
-interface RenderedTextSpan {
+interface TextLine {
   text: string;
   err: boolean;
-  span: HTMLSpanElement;
 }
 
 interface RenderedLog {
   div: HTMLDivElement;
-  entries: RenderedLogDiv[];
+  lines: RingBuffer<LogLine>;
+  rows: VirtualRows<LogLine>;
+  // Number of entries ever logged (for alternating the row colors).
+  count: number;
 }
 
-interface RenderedLogDiv {
+interface LogLine {
   level: FiolinLogLevel;
-  msg: string;
-  div: HTMLDivElement;
+  // Entries with multiple lines are split into rows; only the first of them
+  // shows the level.
+  first: boolean;
+  text: string;
+  entry: number;
 }
 
 export class Terminal {
   private readonly terminal: HTMLDivElement;
   private readonly controls: HTMLDivElement;
+  private readonly contents: HTMLDivElement;
   private mode: RenderedMode;
   private readonly logFilter: RenderedLogFilter;
   private readonly text: RenderedText;
   private readonly logs: RenderedLog;
+  private pendingUpdate?: number;
 
   constructor(container: HTMLElement) {
     this.terminal = getByRelIdAs(container, 'terminal', HTMLDivElement);
     this.controls = getByRelIdAs(this.terminal, 'terminal-controls', HTMLDivElement);
     const contents = getByRelIdAs(this.terminal, 'terminal-contents', HTMLDivElement);
+    this.contents = contents;
     this.mode = {
       select: getByRelIdAs(this.controls, 'terminal-mode', HTMLSelectElement),
       mode: 'TEXT',
@@ -55,13 +69,18 @@ export class Terminal {
       div: getByRelIdAs(this.controls, 'terminal-log-filter', HTMLDivElement),
       active: { DEBUG: true, INFO: true, WARN: true, ERROR: true },
     };
+    const textDiv = getByRelIdAs(contents, 'terminal-text', HTMLDivElement);
     this.text = {
-      div: getByRelIdAs(contents, 'terminal-text', HTMLDivElement),
-      entries: [],
+      div: textDiv,
+      lines: new RingBuffer(MAX_TERMINAL_LINES),
+      rows: new VirtualRows(contents, textDiv, (line) => this.renderTextLine(line)),
     };
+    const logsDiv = getByRelIdAs(contents, 'terminal-logs', HTMLDivElement);
     this.logs = {
-      div: getByRelIdAs(contents, 'terminal-logs', HTMLDivElement),
-      entries: [],
+      div: logsDiv,
+      lines: new RingBuffer(MAX_TERMINAL_LINES),
+      rows: new VirtualRows(contents, logsDiv, (line) => this.renderLogLine(line)),
+      count: 0,
     };
     this.setUpHandlers();
   }
@@ -91,34 +110,30 @@ export class Terminal {
   }
 
   clear() {
-    this.logs.entries.length = 0;
+    this.logs.lines.clear();
+    this.logs.count = 0;
     this.text.fatal = undefined;
-    this.text.entries.length = 0;
+    this.text.lines.clear();
     this.updateUi({ scroll: true });
   }
 
-  log(level: FiolinLogLevel, msg: string) {
-    // Update logs
-    const div = document.createElement('div');
-    const levelDiv = document.createElement('div');
-    levelDiv.textContent = level;
-    levelDiv.classList.add('log-level');
-    const msgDiv = document.createElement('div');
-    msgDiv.textContent = msg;
-    div.replaceChildren(levelDiv, msgDiv);
-    this.logs.entries.push({level, msg, div});
-    // Update terminalText
-    if (level === 'INFO' || level === 'ERROR') {
-      const span = document.createElement('span');
-      span.textContent = msg + '\n';
-      let err = false;
-      if (level === 'ERROR') {
-        span.classList.add('terminal-stderr');
-        err = true;
-      }
-      this.text.entries.push({ text: msg, err, span });
+  // Appends a batch of log entries. Rendering waits for the next frame, so
+  // that however many batches arrive before then cost one update.
+  log(entries: [FiolinLogLevel, string][]) {
+    for (const [level, msg] of entries) {
+      const entry = this.logs.count++;
+      msg.split('\n').forEach((text, i) => {
+        this.logs.lines.push({ level, first: i === 0, text, entry });
+        if (level === 'INFO' || level === 'ERROR') {
+          this.text.lines.push({ text, err: level === 'ERROR' });
+        }
+      });
     }
-    this.updateUi({ scroll: true });
+    if (this.pendingUpdate !== undefined) return;
+    this.pendingUpdate = requestAnimationFrame(() => {
+      this.pendingUpdate = undefined;
+      this.updateUi({ scroll: true });
+    });
   }
 
   fatal(msg: string) {
@@ -143,31 +158,56 @@ export class Terminal {
     }
   }
 
+  private renderTextLine(line: TextLine): HTMLElement {
+    const div = document.createElement('div');
+    div.classList.add('terminal-row');
+    div.textContent = line.text;
+    if (line.err) {
+      div.classList.add('terminal-stderr');
+    }
+    return div;
+  }
+
+  private renderLogLine(line: LogLine): HTMLElement {
+    const div = document.createElement('div');
+    const levelDiv = document.createElement('div');
+    levelDiv.textContent = line.first ? line.level : '';
+    levelDiv.classList.add('log-level');
+    const msgDiv = document.createElement('div');
+    msgDiv.textContent = line.text;
+    div.replaceChildren(levelDiv, msgDiv);
+    div.classList.add('terminal-row', line.entry % 2 == 1 ? 'log-even' : 'log-odd');
+    return div;
+  }
+
   private updateUi(opts: { scroll?: boolean, forceFatal?: boolean }) {
+    // This supersedes any update log() has scheduled.
+    if (this.pendingUpdate !== undefined) {
+      cancelAnimationFrame(this.pendingUpdate);
+      this.pendingUpdate = undefined;
+    }
+    // Visibility first, so that the rows can be measured.
+    this.setVisibility(opts);
     if (opts.forceFatal || this.mode.mode === 'FATAL_ONLY') {
       this.text.div.replaceChildren();
       this.text.div.textContent = this.text.fatal || '';
+      if (opts.scroll) {
+        this.contents.scrollTop = this.contents.scrollHeight;
+      }
     } else if (this.mode.mode === 'TEXT') {
-      const spans: Node[] = this.text.entries.map((rt) => rt.span);
-      this.text.div.textContent = '';
-      this.text.div.replaceChildren(...spans);
+      const lines = this.text.lines;
+      this.text.rows.setRows(lines.length, (i) => lines.at(i)!);
+      this.text.rows.render({ toBottom: opts.scroll });
     } else if (this.mode.mode === 'LOG') {
-      const divs: Node[] = [];
-      for (let i = 0; i < this.logs.entries.length; i++) {
-        const rl = this.logs.entries[i];
-        if (this.logFilter.active[rl.level]) {
-          rl.div.classList.remove('log-even');
-          rl.div.classList.remove('log-odd');
-          rl.div.classList.add(i % 2 == 1 ? 'log-even' : 'log-odd');
-          rl.div.style.width = `${this.terminal.scrollWidth}px`;
-          divs.push(rl.div);
-        }
+      const lines = this.logs.lines;
+      const active = this.logFilter.active;
+      if (LOG_LEVELS.every((l) => active[l])) {
+        this.logs.rows.setRows(lines.length, (i) => lines.at(i)!);
+      } else {
+        const shown = lines.toArray().filter((l) => active[l.level]);
+        this.logs.rows.setRows(shown.length, (i) => shown[i]);
       }
-      this.logs.div.replaceChildren(...divs);
-    }
-    this.setVisibility(opts);
-    if (opts.scroll) {
-      this.terminal.scroll({ top: this.terminal.scrollHeight, behavior: 'smooth' });
+      this.logs.rows.render({ toBottom: opts.scroll });
     }
   }
-}
\ No newline at end of file
+}
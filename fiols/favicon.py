@@ -1,7 +1,6 @@
 """Transform a square image into favicon files."""
 import fiolin
 import sys
-from pyodide import ffi
 import imagemagick as im
 
 SIZES = [256, 128, 64, 32, 16]
@@ -12,20 +11,25 @@ async def main():
   ctx = fiolin.get_canvas('preview')
   if not state:
     fiolin.clear_canvas(ctx)
-    with open(fiolin.get_input_path(), 'rb') as f:
-      orig = f.read()
-    collection = im.MagickImageCollection.new()
-    for i, n in enumerate(SIZES):
-      img = im.MagickImage.create(ffi.to_js(orig))
-      if img.baseWidth != img.baseHeight:
+    # Decode once and shrink one working image from size to size, so that only
+    # the first resize touches the full-size image and only small ones are
+    # copied into the collection.
+    work = im.read_image(fiolin.get_input_path())
+    try:
+      if work.baseWidth != work.baseHeight:
         # TODO: Add cropping
-        sys.exit(f'Input image not square! ({img.baseWidth}x{img.baseHeight})')
-      img.resize(n, n)
-      if ctx:
-        x = sum(SIZES[:i])
-        y = 256 - n
-        await im.draw_to_canvas(ctx, img, x, y, width=n, height=n)
-      collection.push(img)
+        sys.exit(f'Input image not square! ({work.baseWidth}x{work.baseHeight})')
+      collection = im.MagickImageCollection.new()
+      for i, n in enumerate(SIZES):
+        work.resize(n, n)
+        img = im.clone_image(work)
+        if ctx:
+          x = sum(SIZES[:i])
+          y = 256 - n
+          await im.draw_to_canvas(ctx, img, x, y, width=n, height=n)
+        collection.push(img)
+    finally:
+      work.dispose()
     state = {
       'collection': collection,
       'basename': fiolin.get_input_basename(ext=''),
@@ -44,13 +48,9 @@ async def main():
     single_ico = args.get('output_format', 'ico') == 'ico'
     if single_ico:
       output_path = f'/output/{state["basename"]}.ico'
-      async with fiolin.callback_to_ctx(state['collection'].write, im.MagickFormat.Ico) as final:
-        with open(output_path, 'wb') as f:
-          f.write(bytes(final))
+      im.write_image(state['collection'], output_path, im.MagickFormat.Ico)
     else:
       for i, n in enumerate(SIZES):
         img = state['collection'][i]
         output_path = f'/output/{state["basename"]}-{n}.png'
-        async with fiolin.callback_to_ctx(img.write, im.MagickFormat.Png) as final:
-          with open(output_path, 'wb') as f:
-            f.write(bytes(final))
+        im.write_image(img, output_path, im.MagickFormat.Png)
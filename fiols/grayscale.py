@@ -15,20 +15,16 @@ FMTS = {
 }
 
 async def main():
-  input_path = '/py' + fiolin.get_input_path()
+  input_path = fiolin.get_input_path()
   output_path = f'/output/{fiolin.get_input_basename(suffix='-gray')}'
   _, ext = os.path.splitext(input_path.lower())
   if ext not in FMTS:
     sys.exit(f'Invalid format: {ext}; expected one of {FMTS.keys()}')
   ctx = fiolin.get_canvas('output')
-  async with fiolin.callback_to_ctx(im.ImageMagick.read, input_path) as img:
+  img = im.read_image(input_path)
+  try:
     img.grayscale()
-    async with fiolin.callback_to_ctx(img.write, FMTS[ext]) as final:
-      with open(output_path, 'wb') as f:
-        f.write(bytes(final))
-    if ctx:
-      img.resize(CANVAS_DIM, CANVAS_DIM)
-      w, h = img.width, img.height
-      x, y = (CANVAS_DIM - w) // 2, (CANVAS_DIM - h) // 2
-      fiolin.clear_canvas(ctx)
-      await im.draw_to_canvas(ctx, img, x, y, w, h)
+    im.write_image(img, output_path, FMTS[ext])
+    await im.draw_preview(ctx, img, CANVAS_DIM, CANVAS_DIM)
+  finally:
+    img.dispose()
@@ -24,14 +24,6 @@ def gen_output_name(state):
     suffix += '-flopped'
   return '/output/' + fiolin.get_input_basename(suffix=suffix)
 
-async def blit(ctx, img):
-  async with fiolin.callback_to_ctx(img.clone) as copy:
-    copy.resize(CANVAS_DIM, CANVAS_DIM)
-    w, h = copy.width, copy.height
-    x, y = (CANVAS_DIM - w) // 2, (CANVAS_DIM - h) // 2
-    fiolin.clear_canvas(ctx)
-    await im.draw_to_canvas(ctx, copy, x, y, w, h)
-
 async def main():
   args = fiolin.args()
   state = fiolin.state()
@@ -74,13 +66,11 @@ async def main():
     img.flip()
     state['flipped'] = not state['flipped']
     fiolin.continue_with(state)
-  await blit(ctx, img)
+  await im.draw_preview(ctx, img, CANVAS_DIM, CANVAS_DIM)
   if args.get('download', False):
     ext = state['ext']
     output_path = gen_output_name(state)
     fiolin.form_set_hidden('page-1', hidden=False)
     fiolin.form_set_hidden('page-2', hidden=True)
     fiolin.finish()
-    async with fiolin.callback_to_ctx(img.write, FMTS[ext]) as final:
-      with open(output_path, 'wb') as f:
-        f.write(bytes(final))
+    im.write_image(img, output_path, FMTS[ext])
@@ -0,0 +1,117 @@
+// Generators for the synthetic inputs used by scripts/bench.ts. Everything is
+// deterministic so that runs are comparable with one another.
+
+// A cheap deterministic PRNG (mulberry32).
+function prng(seed: number): () => number {
+  return () => {
+    seed = (seed + 0x6D2B79F5) | 0;
+    let t = seed;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+// A square 24-bit BMP with a gradient and some noise (so it doesn't compress
+// to nothing).
+export function mkBmp(name: string, size: number): File {
+  const rowBytes = Math.ceil((size * 3) / 4) * 4;
+  const dataSize = rowBytes * size;
+  const buf = new Uint8Array(54 + dataSize);
+  const view = new DataView(buf.buffer);
+  buf[0] = 0x42; buf[1] = 0x4D; // 'BM'
+  view.setUint32(2, buf.length, true);
+  view.setUint32(10, 54, true);
+  view.setUint32(14, 40, true);
+  view.setInt32(18, size, true);
+  view.setInt32(22, size, true);
+  view.setUint16(26, 1, true);
+  view.setUint16(28, 24, true);
+  view.setUint32(34, dataSize, true);
+  const rand = prng(size);
+  for (let y = 0; y < size; y++) {
+    for (let x = 0; x < size; x++) {
+      const i = 54 + y * rowBytes + x * 3;
+      const noise = Math.floor(rand() * 32);
+      buf[i] = (x * 255 / size + noise) & 0xFF;
+      buf[i + 1] = (y * 255 / size + noise) & 0xFF;
+      buf[i + 2] = ((x + y) * 127 / size + noise) & 0xFF;
+    }
+  }
+  return new File([buf], name);
+}
+
+// A PDF with the given number of pages, each with a line of text.
+export function mkPdf(name: string, pages: number): File {
+  const objs: string[] = [];
+  const pageIds: number[] = [];
+  // 1: catalog, 2: pages, 3: font, then a page and a content stream per page.
+  objs.push('<< /Type /Catalog /Pages 2 0 R >>');
+  objs.push('');
+  objs.push('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>');
+  for (let p = 0; p < pages; p++) {
+    const pageId = objs.length + 1;
+    pageIds.push(pageId);
+    objs.push(`<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents ${pageId + 1} 0 R >>`);
+    const content = `BT /F1 24 Tf 72 720 Td (${name} page ${p + 1}) Tj ET`;
+    objs.push(`<< /Length ${content.length} >>\nstream\n${content}\nendstream`);
+  }
+  objs[1] = `<< /Type /Pages /Kids [${pageIds.map((id) => `${id} 0 R`).join(' ')}] /Count ${pages} >>`;
+  let out = '%PDF-1.4\n';
+  const offsets: number[] = [];
+  objs.forEach((obj, i) => {
+    offsets.push(out.length);
+    out += `${i + 1} 0 obj\n${obj}\nendobj\n`;
+  });
+  const xref = out.length;
+  out += `xref\n0 ${objs.length + 1}\n0000000000 65535 f \n`;
+  for (const off of offsets) {
+    out += `${String(off).padStart(10, '0')} 00000 n \n`;
+  }
+  out += `trailer\n<< /Size ${objs.length + 1} /Root 1 0 R >>\nstartxref\n${xref}\n%%EOF\n`;
+  return new File([new TextEncoder().encode(out)], name);
+}
+
+function tarHeader(name: string, size: number): Uint8Array {
+  const header = new Uint8Array(512);
+  const enc = new TextEncoder();
+  const put = (s: string, offset: number) => header.set(enc.encode(s), offset);
+  put(name, 0);
+  put('0000644\0', 100);
+  put('0000000\0', 108);
+  put('0000000\0', 116);
+  put(size.toString(8).padStart(11, '0') + '\0', 124);
+  put('00000000000\0', 136);
+  put('        ', 148);
+  put('0', 156);
+  put('ustar\0', 257);
+  put('00', 263);
+  let sum = 0;
+  for (const b of header) sum += b;
+  put(sum.toString(8).padStart(6, '0') + '\0 ', 148);
+  return header;
+}
+
+// An uncompressed tar of nFiles text files (at the top level) of fileSize
+// bytes each.
+export function mkTar(name: string, nFiles: number, fileSize: number): File {
+  const parts: Uint8Array[] = [];
+  const rand = prng(nFiles * fileSize);
+  const words = ['fiolin', 'bench', 'tar', 'lorem', 'ipsum', 'dolor', 'sit', 'amet'];
+  for (let i = 0; i < nFiles; i++) {
+    const contents = new Uint8Array(fileSize);
+    let pos = 0;
+    while (pos < fileSize) {
+      const word = words[Math.floor(rand() * words.length)] + ' ';
+      for (let j = 0; j < word.length && pos < fileSize; j++, pos++) {
+        contents[pos] = word.charCodeAt(j);
+      }
+    }
+    parts.push(tarHeader(`file-${i}.txt`, fileSize));
+    parts.push(contents);
+    const pad = (512 - (fileSize % 512)) % 512;
+    if (pad > 0) parts.push(new Uint8Array(pad));
+  }
+  parts.push(new Uint8Array(1024));
+  return new File(parts, name);
+}
@@ -0,0 +1,250 @@
+// Benchmarks every fiol in fiols/ against synthetic inputs of increasing size
+// and compares the results with a stored baseline.
+//
+// Example usages:
+// # Run everything and compare against scripts/bench-baseline.json
+// $ npm run bench
+// # Only the image cases, and record the results as the new baseline
+// $ npm run bench -- --filter 'image|grayscale' --updateBaseline
+//
+// Each case runs in its own process so that cold starts are really cold and
+// peak memory (max RSS) is attributable to the case.
+import { defineCommand, runMain } from 'citty';
+import { spawnSync } from 'node:child_process';
+import { existsSync, readFileSync, readdirSync, writeFileSync } from 'node:fs';
+import path from 'node:path';
+import { FiolinRunRequest } from '../common/types';
+import { loadScript } from '../utils/config';
+import { pkgPath } from '../utils/pkg-path';
+import { mkNodePyodideRunner } from '../utils/runner';
+import { mkBmp, mkPdf, mkTar } from './bench-inputs';
+
+interface BenchCase {
+  name: string;
+  fiol: string;
+  mkRequest: () => Promise<FiolinRunRequest>;
+}
+
+// The measurements for one case. Lower is better except for outMBps.
+interface BenchResult {
+  coldMs: number;
+  warmMs: number;
+  peakRssMb: number;
+  outMBps: number;
+}
+
+type Baseline = Record<string, BenchResult>;
+
+const RESULT_PREFIX = 'BENCH_RESULT ';
+
+async function fixture(name: string): Promise<File> {
+  return new File([readFileSync(pkgPath(`fiols/testdata/${name}`))], name);
+}
+
+function imageCases(fiol: string, args: Record<string, string>): BenchCase[] {
+  return [256, 1024, 2048].map((size) => ({
+    name: `${fiol}/${size}px`, fiol,
+    mkRequest: async () => ({ inputs: [mkBmp(`bench-${size}.bmp`, size)], args }),
+  }));
+}
+
+const CASES: BenchCase[] = [
+  ...imageCases('convert-image', { format: '.png' }),
+  ...imageCases('favicon', { download: 'true', output_format: 'ico' }),
+  ...imageCases('grayscale', {}),
+  ...imageCases('rotate-flip', { rotate: '90', download: 'true' }),
+  ...imageCases('strip-exif', {}),
+  ...[10, 100, 1000].map((pages) => ({
+    name: `merge-pdf/2x${pages}pages`, fiol: 'merge-pdf',
+    mkRequest: async () => ({ inputs: [mkPdf('a.pdf', pages), mkPdf('b.pdf', pages)] }),
+  })),
+  ...[[16, 64 * 1024], [64, 256 * 1024], [64, 1024 * 1024]].map(([n, size]) => ({
+    name: `extract-tar/${n}x${size / 1024}KiB`, fiol: 'extract-tar',
+    mkRequest: async () => ({ inputs: [mkTar('bench.tar', n, size)] }),
+  })),
+  // There's no generator for these formats, so they only use the fixtures.
+  {
+    name: 'extract-winmail/fixture', fiol: 'extract-winmail',
+    mkRequest: async () => ({ inputs: [await fixture('winmail.dat')] }),
+  },
+  {
+    name: 'unlock-ppt/fixture', fiol: 'unlock-ppt',
+    mkRequest: async () => ({ inputs: [await fixture('locked.pptx')] }),
+  },
+];
+
+function median(xs: number[]): number {
+  const sorted = [...xs].sort((a, b) => a - b);
+  const mid = Math.floor(sorted.length / 2);
+  return sorted.length % 2 ? sorted[mid] : (sorted[mid - 1] + sorted[mid]) / 2;
+}
+
+// Runs a single case in this process and prints its result.
+async function runCase(c: BenchCase, warmRuns: number, cacheDir: string) {
+  const script = loadScript(c.fiol);
+  const quiet = { debug() {}, info() {}, warn() {}, error: (s: string) => console.error(s) };
+  const coldStart = performance.now();
+  const runner = mkNodePyodideRunner(quiet, { cacheDir });
+  const cold = await runner.run(script, await c.mkRequest());
+  const coldMs = performance.now() - coldStart;
+  if (cold.error) throw cold.error;
+  const warmMs: number[] = [];
+  let bytesOut = 0;
+  for (let i = 0; i < warmRuns; i++) {
+    const warm = await runner.run(script, await c.mkRequest());
+    if (warm.error) throw warm.error;
+    warmMs.push(warm.debug!.totalMs);
+    bytesOut = warm.debug!.bytesOut;
+  }
+  const warm = median(warmMs);
+  const result: BenchResult = {
+    coldMs, warmMs: warm,
+    // maxRSS is in KiB.
+    peakRssMb: process.resourceUsage().maxRSS / 1024,
+    outMBps: bytesOut / (1024 * 1024) / (warm / 1000),
+  };
+  console.log(RESULT_PREFIX + JSON.stringify(result));
+}
+
+// Runs a case in a child process (this same script, via the same jiti).
+function spawnCase(c: BenchCase, warmRuns: number, cacheDir: string): BenchResult | string {
+  const [node, jiti, self] = process.argv;
+  const child = spawnSync(node, [
+    jiti, self, '--child', c.name, '--warmRuns', `${warmRuns}`, '--cacheDir', cacheDir,
+  ], { encoding: 'utf-8', maxBuffer: 64 * 1024 * 1024 });
+  const line = child.stdout.split('\n').find((l) => l.startsWith(RESULT_PREFIX));
+  if (child.status !== 0 || !line) {
+    return (child.stderr || child.stdout || `exited with ${child.status}`).trim();
+  }
+  return JSON.parse(line.substring(RESULT_PREFIX.length));
+}
+
+// Returns a description of each way in which result is worse than base.
+function regressions(result: BenchResult, base: BenchResult, threshold: number, minDeltaMs: number): string[] {
+  const out: string[] = [];
+  const slower = (k: 'coldMs' | 'warmMs') => {
+    if (result[k] > base[k] * (1 + threshold) && result[k] - base[k] > minDeltaMs) {
+      out.push(`${k} ${base[k].toFixed(0)} -> ${result[k].toFixed(0)}`);
+    }
+  };
+  slower('coldMs');
+  slower('warmMs');
+  if (result.peakRssMb > base.peakRssMb * (1 + threshold)) {
+    out.push(`peakRssMb ${base.peakRssMb.toFixed(0)} -> ${result.peakRssMb.toFixed(0)}`);
+  }
+  if (result.outMBps * (1 + threshold) < base.outMBps && base.warmMs > minDeltaMs) {
+    out.push(`outMBps ${base.outMBps.toFixed(2)} -> ${result.outMBps.toFixed(2)}`);
+  }
+  return out;
+}
+
+function fmtResult(r: BenchResult): string {
+  return (
+    `cold ${r.coldMs.toFixed(0).padStart(6)}ms  warm ${r.warmMs.toFixed(0).padStart(6)}ms  ` +
+    `rss ${r.peakRssMb.toFixed(0).padStart(5)}MB  out ${r.outMBps.toFixed(2).padStart(8)}MB/s`);
+}
+
+const main = defineCommand({
+  meta: {
+    name: 'bench',
+    description: 'Benchmark the fiols and compare against a baseline',
+  },
+  args: {
+    filter: {
+      type: 'string',
+      description: 'Only run cases whose names match this regex',
+    },
+    warmRuns: {
+      type: 'string',
+      description: 'Number of warm runs per case (the median is reported)',
+      default: '3',
+    },
+    baseline: {
+      type: 'string',
+      description: 'Baseline JSON file',
+      default: pkgPath('scripts/bench-baseline.json'),
+    },
+    updateBaseline: {
+      type: 'boolean',
+      description: 'Record the results as the new baseline instead of comparing',
+    },
+    threshold: {
+      type: 'string',
+      description: 'Fractional regression allowed before failing (e.g. 0.25 = 25% worse)',
+      default: '0.25',
+    },
+    minDeltaMs: {
+      type: 'string',
+      description: 'Timing regressions smaller than this many ms are ignored as noise',
+      default: '50',
+    },
+    cacheDir: {
+      type: 'string',
+      description: 'Package cache shared by all cases, so downloads are not measured',
+      default: pkgPath('node_modules/.cache/fiolin-bench'),
+    },
+    json: {
+      type: 'string',
+      description: 'Write the results to this file as JSON',
+    },
+    child: {
+      type: 'string',
+      description: '(Internal) run the named case in this process',
+    },
+  },
+  async run({ args }) {
+    const warmRuns = Number(args.warmRuns);
+    if (args.child) {
+      const c = CASES.find((c) => c.name === args.child);
+      if (!c) throw new Error(`Unknown case: ${args.child}`);
+      await runCase(c, warmRuns, args.cacheDir);
+      return;
+    }
+    const fiols = readdirSync(pkgPath('fiols'))
+      .filter((f) => f.endsWith('.yml'))
+      .map((f) => f.substring(0, f.length - 4));
+    const uncovered = fiols.filter((f) => !CASES.some((c) => c.fiol === f));
+    if (uncovered.length > 0) {
+      throw new Error(`No benchmark cases for: ${uncovered.join(', ')}`);
+    }
+    const filter = args.filter ? new RegExp(args.filter) : undefined;
+    const cases = CASES.filter((c) => !filter || filter.test(c.name));
+    const baseline: Baseline = existsSync(args.baseline) ?
+      JSON.parse(readFileSync(args.baseline, 'utf-8')) : {};
+    const threshold = Number(args.threshold);
+    const minDeltaMs = Number(args.minDeltaMs);
+    const results: Record<string, BenchResult> = {};
+    let failures = 0;
+    for (const c of cases) {
+      const result = spawnCase(c, warmRuns, args.cacheDir);
+      if (typeof result === 'string') {
+        failures++;
+        console.log(`FAIL ${c.name}\n${result}`);
+        continue;
+      }
+      results[c.name] = result;
+      const base = baseline[c.name];
+      const regressed = base && !args.updateBaseline ?
+        regressions(result, base, threshold, minDeltaMs) : [];
+      const status = !base ? 'NEW ' : regressed.length > 0 ? 'SLOW' : 'OK  ';
+      console.log(`${status} ${c.name.padEnd(28)} ${fmtResult(result)}`);
+      for (const r of regressed) {
+        console.log(`       regressed: ${r}`);
+      }
+      if (regressed.length > 0) failures++;
+    }
+    if (args.json) {
+      writeFileSync(args.json, JSON.stringify(results, null, 2) + '\n');
+    }
+    if (args.updateBaseline) {
+      writeFileSync(args.baseline, JSON.stringify({ ...baseline, ...results }, null, 2) + '\n');
+      console.log(`Updated ${path.relative(process.cwd(), args.baseline)}`);
+    }
+    if (failures > 0) {
+      console.log(`${failures} of ${cases.length} cases failed or regressed`);
+      process.exitCode = 1;
+    }
+  },
+});
+
+runMain(main);
@@ -0,0 +1,33 @@
+// Writes a bundle for every fiol into bundles/ (see utils/config.ts), which is
+// then loaded in place of its yml and py: the validated script along with its
+// build (see FiolinScriptBuild), i.e. the builtin and python packages it needs
+// (pinned to the versions resolved now) and its compiled code.
+import { mkdirSync, writeFileSync } from 'node:fs';
+import path from 'node:path';
+import { PyodideRunner } from '../common/runner';
+import { FiolinScript } from '../common/types';
+import { parseAs } from '../common/parse';
+import { pFiolinScript } from '../common/parse-script';
+import { bundlePath, loadAllFromSource } from '../utils/config';
+import { offlineWasmLoaders } from '../utils/loaders';
+import { pkgPath } from '../utils/pkg-path';
+
+// Only the problems are worth printing.
+const runner = new PyodideRunner({
+  indexUrl: pkgPath('node_modules/pyodide'),
+  loaders: offlineWasmLoaders(),
+  console: { debug: () => {}, info: () => {}, warn: console.warn, error: console.error },
+});
+const scripts = await loadAllFromSource();
+for (const [name, script] of Object.entries(scripts).sort(([a], [b]) => a < b ? -1 : a > b ? 1 : 0)) {
+  const p = bundlePath(name);
+  console.log(`Generating ${path.relative(pkgPath('.'), p)}`);
+  try {
+    const bundled: FiolinScript = parseAs(pFiolinScript, { ...script, build: await runner.resolveBuild(script) });
+    mkdirSync(path.dirname(p), { recursive: true });
+    writeFileSync(p, JSON.stringify(bundled));
+  } catch (e) {
+    console.error(`Failed to bundle ${name}:`, e);
+    process.exit(1);
+  }
+}
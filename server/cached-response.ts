@@ -0,0 +1,30 @@
+import { CachedBody } from '../utils/catalog-cache';
+
+function acceptsEncoding(accept: string, encoding: string): boolean {
+  return accept.split(',').some((e) => {
+    const [name, ...params] = e.trim().split(';');
+    return name.trim() === encoding && !params.some((p) => /^\s*q=0(\.0*)?\s*$/.test(p));
+  });
+}
+
+// Responds with a CachedBody: 304 if the client already has it, and otherwise
+// the precompressed version the client prefers.
+export function cachedResponse(headers: Headers, cached: CachedBody): Response {
+  const common = {
+    'content-type': cached.contentType,
+    'etag': cached.etag,
+    'vary': 'accept-encoding',
+  };
+  const ifNoneMatch = headers.get('if-none-match');
+  if (ifNoneMatch && ifNoneMatch.split(',').some((t) => t.trim() === cached.etag || t.trim() === '*')) {
+    return new Response(null, { status: 304, headers: common });
+  }
+  // Pages written out by the prerenderer have to be left uncompressed.
+  const accept = headers.has('x-nitro-prerender') ? '' : headers.get('accept-encoding') || '';
+  if (acceptsEncoding(accept, 'br')) {
+    return new Response(cached.br, { headers: { ...common, 'content-encoding': 'br' } });
+  } else if (acceptsEncoding(accept, 'gzip')) {
+    return new Response(cached.gzip, { headers: { ...common, 'content-encoding': 'gzip' } });
+  }
+  return new Response(cached.body, { headers: common });
+}
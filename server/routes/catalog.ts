@@ -2,9 +2,14 @@ import { fiolinSharedHeaders } from '../html';
 import { versionedLink } from '../../utils/versioned-link';
 import { dedent } from '../../common/indent';
 import { renderCatalog } from '../../components/server/catalog';
+import { catalogCache } from '../../utils/catalog-cache';
+import { cachedResponse } from '../cached-response';
 
 export default defineEventHandler(async (event) => {
-  return dedent(`
+  const cache = catalogCache();
+  const cached = await cache.body('catalog', async () => {
+    const scripts = await cache.scripts();
+    return [dedent(`
     <!DOCTYPE html>
     <html>
       <head>
@@ -13,8 +18,10 @@ export default defineEventHandler(async (event) => {
         <script src="${versionedLink('/index.js')}" type="module" defer></script>
       </head>
       <body>
-        ${await renderCatalog(4)}
+        ${renderCatalog(scripts, 4)}
       </body>
     </html>
-  `);
+  `), 'text/html; charset=utf-8'];
+  });
+  return cachedResponse(event.headers, cached);
 });
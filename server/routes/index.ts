@@ -1,18 +1,21 @@
-import { loadAll } from '../../utils/config';
 import { fiolinSharedHeaders } from '../html';
 import { versionedLink } from '../../utils/versioned-link';
 import { dedent } from '../../common/indent';
-import { generateSuggestions, renderAutocomplete } from '../../components/server/autocomplete';
+import { generateAutocompleteIndex, renderAutocomplete } from '../../components/server/autocomplete';
+import { catalogCache } from '../../utils/catalog-cache';
+import { cachedResponse } from '../cached-response';
 
 export default defineEventHandler(async (event) => {
-  const scripts = await loadAll();
-  return dedent(`
+  const cache = catalogCache();
+  const cached = await cache.body('index', async () => {
+    const scripts = await cache.scripts();
+    return [dedent(`
     <!DOCTYPE html>
     <html>
       <head>
         ${fiolinSharedHeaders()}
         <title>ƒɪᴏʟɪɴ</title>
-        <script src="${versionedLink('/load-suggestions', JSON.stringify(generateSuggestions(scripts)))}" type="module" defer></script>
+        <script src="${versionedLink('/load-suggestions', JSON.stringify(generateAutocompleteIndex(scripts)))}" type="module" defer></script>
         <script src="${versionedLink('/index.js')}&suggestionsVar=suggestions" type="module" defer></script>
       </head>
       <body>
@@ -35,5 +38,7 @@ export default defineEventHandler(async (event) => {
         </div>
       </body>
     </html>
-  `);
+  `), 'text/html; charset=utf-8'];
+  });
+  return cachedResponse(event.headers, cached);
 });
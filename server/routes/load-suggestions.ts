@@ -1,14 +1,15 @@
-import { generateSuggestions } from '../../components/server/autocomplete';
-import { loadAll } from '../../utils/config';
+import { generateAutocompleteIndex } from '../../components/server/autocomplete';
 import { dedent, indent } from '../../common/indent';
+import { catalogCache } from '../../utils/catalog-cache';
+import { cachedResponse } from '../cached-response';
 
-export default defineEventHandler(async (request) => {
-  const scripts = await loadAll();
-  const suggestions = generateSuggestions(scripts);
-  return new Response(
-    dedent(`
-      window.suggestions = ${indent(JSON.stringify(suggestions, null, 2), '      ')};
-    `),
-    { headers: { 'content-type': 'text/javascript' } }
-  );
-});
\ No newline at end of file
+export default defineEventHandler(async (event) => {
+  const cache = catalogCache();
+  const cached = await cache.body('load-suggestions', async () => {
+    const index = generateAutocompleteIndex(await cache.scripts());
+    return [dedent(`
+      window.suggestions = ${indent(JSON.stringify(index), '      ')};
+    `), 'text/javascript'];
+  });
+  return cachedResponse(event.headers, cached);
+});
@@ -1,13 +1,16 @@
-import { loadScript } from '../../../../utils/config';
 import { dedent } from '../../../../common/indent';
 import { fiolinSharedHeaders } from '../../../html';
 import { versionedLink } from '../../../../utils/versioned-link';
 import { renderContainer } from '../../../../components/server/container';
+import { catalogCache } from '../../../../utils/catalog-cache';
+import { cachedResponse } from '../../../cached-response';
 
-export default defineEventHandler((event) => {
-  const name = getRouterParam(event, 'id')
-  const script = loadScript(name);
-  return dedent(`
+export default defineEventHandler(async (event) => {
+  const name = getRouterParam(event, 'id')!;
+  const cache = catalogCache();
+  const cached = await cache.body(`fiol:${name}`, async () => {
+    const script = await cache.script(name);
+    return [dedent(`
     <!DOCTYPE html>
     <html>
       <head>
@@ -20,5 +23,7 @@ export default defineEventHandler((event) => {
         <a href="/s/${name}/script.json" class="hidden">fiolin script source</a>
       </body>
     </html>
-  `);
+  `), 'text/html; charset=utf-8'];
+  });
+  return cachedResponse(event.headers, cached);
 });
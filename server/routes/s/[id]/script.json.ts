@@ -1,7 +1,12 @@
-import { loadScript } from '../../../../utils/config';
+import { catalogCache } from '../../../../utils/catalog-cache';
+import { cachedResponse } from '../../../cached-response';
 
-export default defineEventHandler((event) => {
-  const name = getRouterParam(event, 'id')
-  const script = loadScript(name);
-  return JSON.stringify(script, null, 2);
+export default defineEventHandler(async (event) => {
+  const name = getRouterParam(event, 'id')!;
+  const cache = catalogCache();
+  const cached = await cache.body(`script.json:${name}`, async () => {
+    const script = await cache.script(name);
+    return [JSON.stringify(script, null, 2), 'application/json'];
+  });
+  return cachedResponse(event.headers, cached);
 });
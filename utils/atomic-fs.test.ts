@@ -0,0 +1,37 @@
+import { afterEach, beforeEach, describe, expect, it } from 'vitest';
+import { mkdtemp, readFile, rm, utimes, writeFile } from 'node:fs/promises';
+import { tmpdir } from 'node:os';
+import path from 'node:path';
+import { atomicWrite, withFileLock } from './atomic-fs';
+
+describe('withFileLock', () => {
+  let dir: string;
+
+  beforeEach(async () => {
+    dir = await mkdtemp(path.join(tmpdir(), 'atomic-fs-'));
+  });
+
+  afterEach(async () => {
+    await rm(dir, { recursive: true, force: true });
+  });
+
+  it('serializes read-modify-writes', async () => {
+    const counter = path.join(dir, 'counter');
+    await atomicWrite(counter, '0');
+    const increment = () => withFileLock(path.join(dir, 'counter.lock'), async () => {
+      const n = Number(await readFile(counter, 'utf-8'));
+      await new Promise((resolve) => setTimeout(resolve, 1));
+      await atomicWrite(counter, `${n + 1}`);
+    });
+    await Promise.all(Array.from({ length: 20 }, increment));
+    expect(await readFile(counter, 'utf-8')).toEqual('20');
+  });
+
+  it('takes over stale locks', async () => {
+    const lock = path.join(dir, 'stale.lock');
+    await writeFile(lock, '');
+    const longAgo = new Date(Date.now() - 60000);
+    await utimes(lock, longAgo, longAgo);
+    expect(await withFileLock(lock, async () => 'done')).toEqual('done');
+  });
+});
@@ -0,0 +1,49 @@
+import { mkdir, open, rename, rm, stat, writeFile } from 'node:fs/promises';
+import path from 'node:path';
+import { isNodeExists, isNodeNotFound } from './node-errors';
+
+// A lock older than this is assumed to have been left behind by a process
+// that died while holding it (the critical sections guarded by these locks
+// take milliseconds).
+const STALE_LOCK_MS = 10000;
+
+// Write to a temporary file and rename it into place so that concurrent
+// readers never see a partial file.
+export async function atomicWrite(dest: string, contents: string | Uint8Array) {
+  await mkdir(path.dirname(dest), { recursive: true });
+  const tmp = `${dest}.tmp-${process.pid}-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+  await writeFile(tmp, contents);
+  await rename(tmp, dest);
+}
+
+// Runs f while holding an exclusive lock on lockPath, which is shared by every
+// thread and process that uses the same path (unlike a lock in memory). The
+// lock is a file created with O_EXCL; waiters poll until it's gone.
+export async function withFileLock<T>(lockPath: string, f: () => Promise<T>): Promise<T> {
+  await mkdir(path.dirname(lockPath), { recursive: true });
+  for (;;) {
+    try {
+      const handle = await open(lockPath, 'wx');
+      await handle.close();
+      break;
+    } catch (e) {
+      if (!isNodeExists(e)) throw e;
+    }
+    try {
+      if (Date.now() - (await stat(lockPath)).mtimeMs > STALE_LOCK_MS) {
+        await rm(lockPath, { force: true });
+        continue;
+      }
+    } catch (e) {
+      // Released between the open and the stat.
+      if (isNodeNotFound(e)) continue;
+      throw e;
+    }
+    await new Promise((resolve) => setTimeout(resolve, 5 + Math.random() * 20));
+  }
+  try {
+    return await f();
+  } finally {
+    await rm(lockPath, { force: true });
+  }
+}
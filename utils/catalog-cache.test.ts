@@ -0,0 +1,46 @@
+import { describe, expect, it } from 'vitest';
+import { brotliDecompressSync, gunzipSync } from 'node:zlib';
+import { CatalogCache, mkCachedBody } from './catalog-cache';
+
+describe('mkCachedBody', () => {
+  it('precompresses and tags the body', () => {
+    const cached = mkCachedBody('hello '.repeat(100), 'text/plain');
+    expect(gunzipSync(cached.gzip).toString()).toEqual('hello '.repeat(100));
+    expect(brotliDecompressSync(cached.br).toString()).toEqual('hello '.repeat(100));
+    expect(cached.etag).toMatch(/^"[-_A-Za-z0-9]+"$/);
+    expect(mkCachedBody('hello '.repeat(100), 'text/plain').etag).toEqual(cached.etag);
+    expect(mkCachedBody('goodbye', 'text/plain').etag).not.toEqual(cached.etag);
+  });
+});
+
+describe('CatalogCache', () => {
+  it('makes each body once', async () => {
+    const cache = new CatalogCache();
+    let made = 0;
+    const make = async (): Promise<[string, string]> => {
+      made++;
+      return ['body', 'text/plain'];
+    };
+    const a = await cache.body('key', make);
+    const b = await cache.body('key', make);
+    expect(a).toBe(b);
+    expect(made).toEqual(1);
+    cache.invalidate();
+    await cache.body('key', make);
+    expect(made).toEqual(2);
+  });
+
+  it('does not cache failures', async () => {
+    const cache = new CatalogCache();
+    await expect(cache.body('key', () => cache.script('no-such-fiol').then((): [string, string] => ['', '']))).rejects.toThrow(/No such fiol/);
+    const cached = await cache.body('key', async () => ['ok', 'text/plain']);
+    expect(cached.body.toString()).toEqual('ok');
+  });
+
+  it('loads the fiols once', async () => {
+    const cache = new CatalogCache();
+    const scripts = await cache.scripts();
+    expect(Object.keys(scripts)).toContain('extract-winmail');
+    expect(await cache.script('extract-winmail')).toBe(scripts['extract-winmail']);
+  });
+});
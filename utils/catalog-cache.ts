@@ -0,0 +1,135 @@
+import { createHash } from 'node:crypto';
+import { FSWatcher, readdirSync, readFileSync, watch } from 'node:fs';
+import { brotliCompressSync, constants as zlibConstants, gzipSync } from 'node:zlib';
+import { FiolinScript } from '../common/types';
+import { loadAll } from './config';
+import { pkgPath } from './pkg-path';
+
+// A response body, ready to be sent as-is (or compressed) with a strong ETag.
+export interface CachedBody {
+  contentType: string;
+  etag: string;
+  body: Buffer;
+  gzip: Buffer;
+  br: Buffer;
+}
+
+export function mkCachedBody(body: string, contentType: string): CachedBody {
+  const buf = Buffer.from(body, 'utf-8');
+  const hash = createHash('sha256').update(buf).digest('base64url');
+  return {
+    contentType,
+    etag: `"${hash.substring(0, 22)}"`,
+    body: buf,
+    gzip: gzipSync(buf, { level: 9 }),
+    br: brotliCompressSync(buf, {
+      params: { [zlibConstants.BROTLI_PARAM_QUALITY]: zlibConstants.BROTLI_MAX_QUALITY },
+    }),
+  };
+}
+
+// Hash of everything in the fiols directory, identifying the catalog that a
+// build (or a dev server at a given moment) is serving.
+function hashFiols(): string {
+  const hash = createHash('shake256', { outputLength: 6 });
+  for (const f of readdirSync(pkgPath('fiols')).sort()) {
+    if (f.endsWith('.yml') || f.endsWith('.py')) {
+      hash.update(f);
+      hash.update(readFileSync(pkgPath(`fiols/${f}`)));
+    }
+  }
+  return hash.digest('base64url');
+}
+
+// Process-wide cache of the parsed fiols and of the response bodies derived
+// from them, so that serving them doesn't reread, reparse and revalidate every
+// script on every request. Everything is tied to the build hash (see
+// hashFiols); in production that is computed once, while in development the
+// fiols directory is watched and the hash is rechecked after any change to it.
+// (The static files are watched too, since the pages embed versioned links to
+// them.)
+export class CatalogCache {
+  private _buildHash: string;
+  private _maybeStale: boolean;
+  private _scripts?: Record<string, FiolinScript>;
+  private readonly _bodies: Map<string, CachedBody>;
+  private readonly _watchers: FSWatcher[];
+
+  constructor(opts?: { watch?: boolean }) {
+    this._buildHash = hashFiols();
+    this._maybeStale = false;
+    this._bodies = new Map();
+    this._watchers = [];
+    if (opts?.watch) {
+      // Files may be mid-write when this fires, so they're only reread on the
+      // next request.
+      this._watchers.push(watch(pkgPath('fiols'), () => { this._maybeStale = true }));
+      this._watchers.push(watch(pkgPath('server/public'), { recursive: true }, () => this._bodies.clear()));
+      // Don't keep the process alive just for these.
+      this._watchers.forEach((w) => w.unref());
+    }
+  }
+
+  get buildHash(): string {
+    this.checkStale();
+    return this._buildHash;
+  }
+
+  async scripts(): Promise<Record<string, FiolinScript>> {
+    this.checkStale();
+    if (!this._scripts) {
+      this._scripts = await loadAll();
+    }
+    return this._scripts;
+  }
+
+  async script(name: string): Promise<FiolinScript> {
+    const scripts = await this.scripts();
+    if (!Object.hasOwn(scripts, name)) {
+      throw new Error(`No such fiol: ${name}`);
+    }
+    return scripts[name];
+  }
+
+  // Returns the cached body for key, making it if need be. Failures aren't
+  // cached.
+  async body(key: string, make: () => Promise<[string, string]>): Promise<CachedBody> {
+    this.checkStale();
+    let cached = this._bodies.get(key);
+    if (!cached) {
+      const [body, contentType] = await make();
+      cached = mkCachedBody(body, contentType);
+      this._bodies.set(key, cached);
+    }
+    return cached;
+  }
+
+  invalidate() {
+    this._scripts = undefined;
+    this._bodies.clear();
+  }
+
+  private checkStale() {
+    if (!this._maybeStale) return;
+    this._maybeStale = false;
+    const buildHash = hashFiols();
+    if (buildHash !== this._buildHash) {
+      this._buildHash = buildHash;
+      this.invalidate();
+    }
+  }
+
+  close() {
+    this._watchers.forEach((w) => w.close());
+  }
+}
+
+let processCache: CatalogCache | undefined;
+
+// The process-wide CatalogCache (watching for changes when in development).
+export function catalogCache(): CatalogCache {
+  if (!processCache) {
+    processCache = new CatalogCache({ watch: process.env.NODE_ENV === 'development' });
+  }
+  return processCache;
+}
@@ -1,5 +1,5 @@
 import { FiolinScript } from '../common/types';
-import { readdirSync, readFileSync } from 'node:fs';
+import { readdirSync, readFileSync, statSync } from 'node:fs';
 import { pkgPath } from './pkg-path';
 import { scriptFromYml } from '../common/script-from-yml';
 
@@ -9,24 +9,55 @@ function load(dir: string, name: string): FiolinScript {
   return scriptFromYml(yml, py);
 }
 
-async function loadDir(dir: string): Promise<Record<string, FiolinScript>> {
+// Where scripts/bundle.ts writes each fiol's bundle: the validated script,
+// including its build (see FiolinScriptBuild), as JSON.
+export function bundlePath(name: string): string {
+  return pkgPath(`bundles/${name}.json`);
+}
+
+function mtimeMs(p: string): number | undefined {
+  try {
+    return statSync(p).mtimeMs;
+  } catch (e) {
+    return undefined;
+  }
+}
+
+// Loads a fiol from its bundle, skipping the parsing and validation, as long
+// as the bundle is newer than the yml and py it was built from.
+function loadBundle(name: string): FiolinScript | undefined {
+  const built = mtimeMs(bundlePath(name));
+  if (built === undefined) return undefined;
+  for (const ext of ['yml', 'py']) {
+    const modified = mtimeMs(pkgPath(`fiols/${name}.${ext}`));
+    if (modified === undefined || modified > built) return undefined;
+  }
+  return JSON.parse(readFileSync(bundlePath(name), 'utf-8'));
+}
+
+async function loadDir(dir: string, loader: (name: string) => FiolinScript): Promise<Record<string, FiolinScript>> {
   const files = readdirSync(pkgPath(dir));
   const scripts: Record<string, FiolinScript> = {};
   for (const f of files) {
     if (f.endsWith('.yml')) {
       const name = f.substring(0, f.length - 4);
-      scripts[name] = load(dir, name);
+      scripts[name] = loader(name);
     }
   }
   return scripts;
 }
 
 export function loadScript(name: string): FiolinScript {
-  return load('fiols', name);
+  return loadBundle(name) || load('fiols', name);
 }
 
 export async function loadAll(): Promise<Record<string, FiolinScript>> {
-  return loadDir('fiols');
+  return loadDir('fiols', loadScript);
+}
+
+// Ignores the bundles (e.g. for building them).
+export async function loadAllFromSource(): Promise<Record<string, FiolinScript>> {
+  return loadDir('fiols', (name) => load('fiols', name));
 }
 
 export function loadTutorial(name: string): FiolinScript {
@@ -34,5 +65,5 @@ export function loadTutorial(name: string): FiolinScript {
 }
 
 export async function loadAllTutorials(): Promise<Record<string, FiolinScript>> {
-  return loadDir('tutorial');
+  return loadDir('tutorial', loadTutorial);
 }
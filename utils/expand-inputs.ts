@@ -0,0 +1,55 @@
+import { readdirSync, statSync } from 'node:fs';
+import path from 'node:path';
+
+function isGlob(s: string): boolean {
+  return /[*?]/.test(s);
+}
+
+function globToRegExp(glob: string): RegExp {
+  let re = '';
+  for (const c of glob) {
+    if (c === '*') {
+      re += '[^/]*';
+    } else if (c === '?') {
+      re += '[^/]';
+    } else {
+      re += c.replace(/[.+^${}()|[\]\\]/g, '\\$&');
+    }
+  }
+  return new RegExp(`^${re}$`);
+}
+
+function filesIn(dir: string, filter?: RegExp): string[] {
+  const files: string[] = [];
+  for (const f of readdirSync(dir)) {
+    if (filter && !filter.test(f)) continue;
+    const p = path.join(dir, f);
+    if (statSync(p).isFile()) {
+      files.push(p);
+    }
+  }
+  return files.sort();
+}
+
+// Expands a directory (all the regular files directly inside of it), a glob
+// (wildcards are only supported in the final path component, e.g.
+// photos/*.jpg), or a plain file path into a sorted list of file paths.
+export function expandInputs(spec: string): string[] {
+  const base = path.basename(spec);
+  let files: string[];
+  if (isGlob(base)) {
+    const dir = path.dirname(spec);
+    if (isGlob(dir)) {
+      throw new Error(`Wildcards are only supported in the last path component; got ${spec}`);
+    }
+    files = filesIn(dir, globToRegExp(base));
+  } else if (statSync(spec).isDirectory()) {
+    files = filesIn(spec);
+  } else {
+    files = [spec];
+  }
+  if (files.length === 0) {
+    throw new Error(`No input files matched ${spec}`);
+  }
+  return files;
+}
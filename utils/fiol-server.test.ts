@@ -0,0 +1,86 @@
+import { afterEach, beforeEach, describe, expect, it } from 'vitest';
+import { AddressInfo } from 'node:net';
+import { readFileSync } from 'node:fs';
+import { FiolServer } from './fiol-server';
+import { NodeWorkerPool } from './worker-pool';
+import { pkgPath } from './pkg-path';
+
+function exifForm(): FormData {
+  const form = new FormData();
+  const jpg = readFileSync(pkgPath('fiols/testdata/exif.jpg'));
+  form.append('input', new File([jpg], 'exif.jpg', { type: 'image/jpeg' }));
+  return form;
+}
+
+describe('FiolServer', () => {
+  let server: FiolServer;
+  let base: string;
+
+  beforeEach(async () => {
+    server = new FiolServer(new NodeWorkerPool({ size: 1 }), { fiols: ['strip-exif'] });
+    await server.listen({ port: 0, host: '127.0.0.1' });
+    base = `http://127.0.0.1:${(server.address as AddressInfo).port}`;
+  });
+
+  afterEach(async () => {
+    await server.close();
+  });
+
+  it('reports health and metrics', async () => {
+    const health = await fetch(`${base}/healthz`);
+    expect(health.status).toEqual(200);
+    expect(await health.json()).toEqual({ ok: true });
+    const metrics = await (await fetch(`${base}/metrics`)).text();
+    expect(metrics).toContain('fiolin_http_responses_total{code="200"} 1');
+    expect(metrics).toContain('fiolin_workers{state="idle"} 1');
+  });
+
+  it('rejects unknown fiols and other methods', async () => {
+    expect((await fetch(`${base}/run/nonexistent`, { method: 'POST', body: exifForm() })).status).toEqual(404);
+    expect((await fetch(`${base}/run/strip-exif`)).status).toEqual(405);
+  });
+
+  it('runs the fiol and sends back the output', async () => {
+    const resp = await fetch(`${base}/run/strip-exif`, { method: 'POST', body: exifForm() });
+    expect(resp.status).toEqual(200);
+    expect(resp.headers.get('content-disposition')).toEqual(`attachment; filename*=UTF-8''exif-no-exif.jpg`);
+    expect((await resp.arrayBuffer()).byteLength).toBeGreaterThan(0);
+    const zipped = await fetch(`${base}/run/strip-exif?zip`, { method: 'POST', body: exifForm() });
+    expect(zipped.headers.get('content-type')).toEqual('application/zip');
+    const metrics = await (await fetch(`${base}/metrics`)).text();
+    expect(metrics).toContain('fiolin_runs_total{result="ok"} 2');
+  }, 120000);
+
+  it('turns runs away once the queue is full', async () => {
+    const first = fetch(`${base}/run/strip-exif`, { method: 'POST', body: exifForm() });
+    // Give the first request time to be accepted.
+    await new Promise((resolve) => setTimeout(resolve, 100));
+    const second = await fetch(`${base}/run/strip-exif`, { method: 'POST', body: exifForm() });
+    expect(second.status).toEqual(503);
+    expect(second.headers.get('retry-after')).toEqual('1');
+    expect((await first).status).toEqual(200);
+  }, 120000);
+
+  it('rejects bodies that are too large and bad file names', async () => {
+    const small = new FiolServer(new NodeWorkerPool({ size: 1 }), { fiols: ['strip-exif'], maxBodyBytes: 1024 });
+    await small.listen({ port: 0, host: '127.0.0.1' });
+    try {
+      const smallBase = `http://127.0.0.1:${(small.address as AddressInfo).port}`;
+      const resp = await fetch(`${smallBase}/run/strip-exif`, { method: 'POST', body: exifForm() });
+      expect(resp.status).toEqual(413);
+    } finally {
+      await small.close();
+    }
+    const form = new FormData();
+    form.append('input', new File(['x'], '..'));
+    expect((await fetch(`${base}/run/strip-exif`, { method: 'POST', body: form })).status).toEqual(400);
+  });
+
+  it('reports script failures', async () => {
+    const form = new FormData();
+    form.append('input', new File(['not a jpeg'], 'bad.jpg'));
+    const resp = await fetch(`${base}/run/strip-exif`, { method: 'POST', body: form });
+    expect(resp.status).toEqual(422);
+    expect((await resp.json()).error).toBeTruthy();
+  }, 120000);
+});
@@ -0,0 +1,303 @@
+import { createServer, IncomingMessage, Server, ServerResponse } from 'node:http';
+import { AddressInfo } from 'node:net';
+import { createReadStream, createWriteStream } from 'node:fs';
+import { mkdir, mkdtemp, rm, stat } from 'node:fs/promises';
+import { tmpdir } from 'node:os';
+import path from 'node:path';
+import { Readable, Transform } from 'node:stream';
+import { pipeline } from 'node:stream/promises';
+import { getErrMsg } from '../common/errors';
+import { zipBlobs } from '../common/zip';
+import { openLocalFile } from './input-mount';
+import { NodeWorkerPool } from './worker-pool';
+
+export interface FiolServerOptions {
+  // The fiols that can be run (anything else is a 404).
+  fiols: string[];
+  // Runs beyond those the pool's workers are busy with wait for a free worker,
+  // up to this many; any more are turned away with a 503. Defaults to 0.
+  maxQueue?: number;
+  // Where uploads and outputs are kept while a run is handled (defaults to the
+  // system's temp directory).
+  tmpDir?: string;
+  // Requests with bigger bodies are turned away with a 413 (defaults to 100
+  // MiB). The form is parsed in memory, so this (times the runs that may be
+  // in flight) is what bounds the memory used for uploads.
+  maxBodyBytes?: number;
+}
+
+const DEFAULT_MAX_BODY_BYTES = 100 * 1024 * 1024;
+
+export type ListenTarget = { port: number, host?: string } | { socket: string };
+
+// Tallies for the /metrics endpoint.
+interface ServerMetrics {
+  responses: Map<number, number>;
+  runsOk: number;
+  runsFailed: number;
+  runSeconds: number;
+}
+
+class BodyTooLargeError extends Error {
+  constructor(maxBytes: number) {
+    super(`Request body is larger than ${maxBytes} bytes`);
+    this.name = 'BodyTooLargeError';
+  }
+}
+
+// Parses a multipart (or urlencoded) body, using the fetch API's own parser.
+// Bodies over maxBytes are rejected up front if their Content-Length says so,
+// and otherwise as soon as that many bytes have arrived.
+async function readForm(req: IncomingMessage, maxBytes: number): Promise<FormData> {
+  if (Number(req.headers['content-length']) > maxBytes) {
+    throw new BodyTooLargeError(maxBytes);
+  }
+  let received = 0;
+  let tooLarge = false;
+  const limited = new Transform({
+    transform(chunk: Buffer, _, callback) {
+      received += chunk.byteLength;
+      if (received > maxBytes) {
+        tooLarge = true;
+        callback(new BodyTooLargeError(maxBytes));
+      } else {
+        callback(null, chunk);
+      }
+    },
+  });
+  req.on('error', (e) => limited.destroy(e));
+  const headers = new Headers();
+  for (const [k, v] of Object.entries(req.headers)) {
+    if (v !== undefined) headers.set(k, Array.isArray(v) ? v.join(', ') : v);
+  }
+  const request = new Request('http://localhost/', {
+    method: 'POST', headers, body: Readable.toWeb(req.pipe(limited)) as ReadableStream, duplex: 'half',
+  } as RequestInit);
+  try {
+    return await request.formData();
+  } catch (e) {
+    // The parser reports the stream failing with an error of its own.
+    if (tooLarge) throw new BodyTooLargeError(maxBytes);
+    throw e;
+  }
+}
+
+function attachment(name: string): string {
+  return `attachment; filename*=UTF-8''${encodeURIComponent(name)}`;
+}
+
+// Serves runs of fiols over HTTP, using a NodeWorkerPool (whose workers keep
+// their interpreters warm between runs). The API:
+//   POST /run/<fiol>  multipart form; every file is an input, and every other
+//                     field an arg. Answers with the output itself (or a zip,
+//                     if there's more than one or ?zip is given), 204 if there
+//                     are none, 413 if the body is larger than maxBodyBytes,
+//                     or 422 with the error if the script fails.
+//   GET /healthz      200 once the server is up.
+//   GET /metrics      Prometheus-style counters and gauges.
+export class FiolServer {
+  private readonly _pool: NodeWorkerPool;
+  private readonly _fiols: Set<string>;
+  private readonly _maxQueue: number;
+  private readonly _tmpDir: string;
+  private readonly _maxBodyBytes: number;
+  private readonly _server: Server;
+  private readonly _metrics: ServerMetrics;
+  // Accepted runs that haven't been answered yet.
+  private _inFlight: number;
+
+  // Takes ownership of the pool, which is closed along with the server.
+  constructor(pool: NodeWorkerPool, opts: FiolServerOptions) {
+    this._pool = pool;
+    this._fiols = new Set(opts.fiols);
+    this._maxQueue = opts.maxQueue ?? 0;
+    this._tmpDir = opts.tmpDir || tmpdir();
+    this._maxBodyBytes = opts.maxBodyBytes ?? DEFAULT_MAX_BODY_BYTES;
+    this._metrics = { responses: new Map(), runsOk: 0, runsFailed: 0, runSeconds: 0 };
+    this._inFlight = 0;
+    this._server = createServer((req, res) => {
+      res.on('finish', () => {
+        this._metrics.responses.set(res.statusCode, (this._metrics.responses.get(res.statusCode) || 0) + 1);
+      });
+      this.handle(req, res).catch((e) => {
+        if (res.headersSent) {
+          res.destroy(e);
+        } else {
+          this.sendJson(res, 500, { error: getErrMsg(e) });
+        }
+      });
+    });
+  }
+
+  get address(): AddressInfo | string | null {
+    return this._server.address();
+  }
+
+  listen(target: ListenTarget): Promise<void> {
+    return new Promise((resolve, reject) => {
+      this._server.once('error', reject);
+      const onListening = () => {
+        this._server.off('error', reject);
+        resolve();
+      };
+      if ('socket' in target) {
+        this._server.listen(target.socket, onListening);
+      } else {
+        this._server.listen(target.port, target.host, onListening);
+      }
+    });
+  }
+
+  // Stops accepting connections, lets the runs in progress finish, and then
+  // shuts down the pool.
+  async close(): Promise<void> {
+    await new Promise<void>((resolve, reject) => {
+      this._server.close((e) => e ? reject(e) : resolve());
+      this._server.closeIdleConnections();
+    });
+    await this._pool.close();
+  }
+
+  private async handle(req: IncomingMessage, res: ServerResponse) {
+    const url = new URL(req.url || '/', 'http://localhost');
+    if (req.method === 'GET' && url.pathname === '/healthz') {
+      this.sendJson(res, 200, { ok: true });
+      return;
+    } else if (req.method === 'GET' && url.pathname === '/metrics') {
+      res.writeHead(200, { 'Content-Type': 'text/plain; version=0.0.4' });
+      res.end(this.metricsText());
+      return;
+    }
+    const match = url.pathname.match(/^\/run\/([^/]+)$/);
+    const fiol = match && decodeURIComponent(match[1]);
+    if (!fiol || !this._fiols.has(fiol)) {
+      this.sendJson(res, 404, { error: `Not found: ${url.pathname}` });
+      return;
+    } else if (req.method !== 'POST') {
+      res.setHeader('Allow', 'POST');
+      this.sendJson(res, 405, { error: `Runs must be POSTed` });
+      return;
+    }
+    // Checked before reading the body, so that turning a run away is cheap.
+    if (this._inFlight >= this._pool.size + this._maxQueue) {
+      res.setHeader('Retry-After', '1');
+      this.sendJson(res, 503, { error: 'Too many runs in progress' });
+      req.resume();
+      return;
+    }
+    this._inFlight++;
+    try {
+      await this.run(fiol, req, res, url.searchParams.has('zip'));
+    } finally {
+      this._inFlight--;
+    }
+  }
+
+  private async run(fiol: string, req: IncomingMessage, res: ServerResponse, zip: boolean) {
+    const dir = await mkdtemp(path.join(this._tmpDir, 'fiol-serve-'));
+    try {
+      let form: FormData;
+      try {
+        form = await readForm(req, this._maxBodyBytes);
+      } catch (e) {
+        if (e instanceof BodyTooLargeError) {
+          // Rather than reading the rest of the body.
+          res.setHeader('Connection', 'close');
+          this.sendJson(res, 413, { error: e.message });
+        } else {
+          this.sendJson(res, 400, { error: `Failed to read form: ${getErrMsg(e)}` });
+        }
+        return;
+      }
+      // Each input gets its own directory, so that clashing names are fine.
+      const inputPaths: string[] = [];
+      const args: Record<string, string> = {};
+      for (const [k, v] of form) {
+        if (typeof v === 'string') {
+          args[k] = v;
+          continue;
+        }
+        const name = path.basename(v.name) || 'input';
+        if (name === '.' || name === '..') {
+          this.sendJson(res, 400, { error: `Invalid file name: ${v.name}` });
+          return;
+        }
+        const inputDir = path.join(dir, 'inputs', `${inputPaths.length}`);
+        await mkdir(inputDir, { recursive: true });
+        const inputPath = path.join(inputDir, name);
+        await pipeline(Readable.fromWeb(v.stream() as any), createWriteStream(inputPath));
+        inputPaths.push(inputPath);
+      }
+      const outputDir = path.join(dir, 'outputs');
+      await mkdir(outputDir);
+      const start = performance.now();
+      const result = await this._pool.run({ fiol, inputPaths, outputDir, args });
+      this._metrics.runSeconds += (performance.now() - start) / 1000;
+      if (!result.ok) {
+        this._metrics.runsFailed++;
+        this.sendJson(res, 422, { error: result.error });
+        return;
+      }
+      this._metrics.runsOk++;
+      await this.sendOutputs(res, outputDir, result.outputs, zip);
+    } finally {
+      await rm(dir, { recursive: true, force: true });
+    }
+  }
+
+  private async sendOutputs(res: ServerResponse, outputDir: string, outputs: string[], zip: boolean) {
+    if (outputs.length === 0) {
+      res.writeHead(204);
+      res.end();
+    } else if (outputs.length === 1 && !zip) {
+      const p = path.join(outputDir, outputs[0]);
+      res.writeHead(200, {
+        'Content-Type': 'application/octet-stream',
+        'Content-Disposition': attachment(outputs[0]),
+        'Content-Length': (await stat(p)).size,
+      });
+      await pipeline(createReadStream(p), res);
+    } else {
+      const files = await Promise.all(outputs.map((o) => openLocalFile(path.join(outputDir, o))));
+      const zipped = await zipBlobs(files.map((f) => [f.name, f]));
+      res.writeHead(200, {
+        'Content-Type': 'application/zip',
+        'Content-Disposition': attachment('output.zip'),
+        'Content-Length': zipped.size,
+      });
+      await pipeline(Readable.fromWeb(zipped.stream() as any), res);
+    }
+  }
+
+  private sendJson(res: ServerResponse, status: number, body: object) {
+    res.writeHead(status, { 'Content-Type': 'application/json' });
+    res.end(JSON.stringify(body));
+  }
+
+  private metricsText(): string {
+    const m = this._metrics;
+    const lines = [
+      '# HELP fiolin_http_responses_total HTTP responses sent, by status code.',
+      '# TYPE fiolin_http_responses_total counter',
+      ...[...m.responses].sort(([a], [b]) => a - b).map(([code, n]) => `fiolin_http_responses_total{code="${code}"} ${n}`),
+      '# HELP fiolin_runs_total Runs completed, by result.',
+      '# TYPE fiolin_runs_total counter',
+      `fiolin_runs_total{result="ok"} ${m.runsOk}`,
+      `fiolin_runs_total{result="error"} ${m.runsFailed}`,
+      '# HELP fiolin_run_seconds_total Time spent on runs, including waiting for a worker.',
+      '# TYPE fiolin_run_seconds_total counter',
+      `fiolin_run_seconds_total ${m.runSeconds}`,
+      '# HELP fiolin_runs_in_flight Runs accepted but not yet answered.',
+      '# TYPE fiolin_runs_in_flight gauge',
+      `fiolin_runs_in_flight ${this._inFlight}`,
+      '# HELP fiolin_runs_queued Runs waiting for a free worker.',
+      '# TYPE fiolin_runs_queued gauge',
+      `fiolin_runs_queued ${this._pool.queued}`,
+      '# HELP fiolin_workers Worker threads, and how many of them are busy.',
+      '# TYPE fiolin_workers gauge',
+      `fiolin_workers{state="busy"} ${this._pool.running}`,
+      `fiolin_workers{state="idle"} ${this._pool.size - this._pool.running}`,
+    ];
+    return lines.join('\n') + '\n';
+  }
+}
@@ -0,0 +1,30 @@
+import { beforeEach, describe, expect, it, onTestFinished } from 'vitest';
+import { readFileSync, writeFileSync } from 'node:fs';
+import { getStdout, mkFile, mkRunner, mkScript } from '../common/runner-test-util';
+import { FiolinTmpDir } from '../common/test-util';
+import { NodeFsInputMounter, openLocalFile } from './input-mount';
+
+describe('NodeFsInputMounter', () => {
+  let tmp: FiolinTmpDir = new FiolinTmpDir();
+  beforeEach(() => { tmp = new FiolinTmpDir(onTestFinished); });
+
+  it('mounts local files without touching the originals', async () => {
+    const runner = mkRunner({ inputMounter: new NodeFsInputMounter() });
+    const script = mkScript(`
+      import fiolin
+      for p in fiolin.get_input_paths():
+        with open(p) as f:
+          print(f.read())
+        with open(p, 'w') as f:
+          f.write('clobbered')
+    `);
+    const local = `${tmp.path}/local.txt`;
+    writeFileSync(local, 'from disk');
+    const response = await runner.run(script, {
+      inputs: [await openLocalFile(local), mkFile('mem.txt', 'from memory')],
+    });
+    expect(response.error).toBeUndefined();
+    expect(getStdout(response).trim().split('\n').sort()).toEqual(['from disk', 'from memory']);
+    expect(readFileSync(local, 'utf-8')).toEqual('from disk');
+  });
+});
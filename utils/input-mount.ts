@@ -0,0 +1,70 @@
+import { constants, createWriteStream, mkdtempSync, openAsBlob, rmSync } from 'node:fs';
+import { copyFile } from 'node:fs/promises';
+import { tmpdir } from 'node:os';
+import path from 'node:path';
+import { Readable } from 'node:stream';
+import { pipeline } from 'node:stream/promises';
+import { PyodideInterface } from 'pyodide';
+import { InputMounter } from '../common/input-mount';
+import { toErrWithErrno } from '../common/emscripten-fs';
+
+// Files opened by openLocalFile, and the paths they came from.
+const localPaths = new WeakMap<Blob, string>();
+
+// Opens a local file as a File without reading it into memory. When passed to
+// a runner using NodeFsInputMounter, it's mounted without ever being read by
+// JS at all.
+export async function openLocalFile(p: string): Promise<File> {
+  const file = new File([await openAsBlob(p)], path.basename(p));
+  localPaths.set(file, p);
+  return file;
+}
+
+// Mounts the inputs with NODEFS, so python reads them from disk on demand
+// rather than from a copy in the wasm heap. The originals aren't mounted
+// directly (writes to /input would go through to them, and mounting their
+// directories would expose unrelated files); instead each run gets a private
+// directory of copies. Copies are copy-on-write clones (and so nearly free)
+// only on file systems with reflinks (e.g., btrfs, XFS, APFS); elsewhere
+// (e.g., ext4, tmpfs) each input is copied in full, though still without
+// passing through the JS or wasm heaps.
+export class NodeFsInputMounter extends InputMounter {
+  private readonly _dirs: WeakMap<PyodideInterface, string>;
+
+  constructor() {
+    super();
+    this._dirs = new WeakMap();
+  }
+
+  async mount(pyodide: PyodideInterface, inputs: File[]): Promise<void> {
+    const dir = mkdtempSync(path.join(tmpdir(), 'fiolin-input-'));
+    try {
+      for (const input of inputs) {
+        const dest = path.join(dir, input.name);
+        const src = localPaths.get(input);
+        if (src) {
+          // Falls back to a full copy without reflinks.
+          await copyFile(src, dest, constants.COPYFILE_FICLONE);
+        } else {
+          await pipeline(Readable.fromWeb(input.stream() as any), createWriteStream(dest));
+        }
+      }
+      pyodide.FS.mount(pyodide.FS.filesystems.NODEFS, { root: dir }, '/input');
+    } catch (e) {
+      rmSync(dir, { recursive: true, force: true });
+      throw toErrWithErrno(e, { prefix: 'mount("/input") failed', errCodes: pyodide.ERRNO_CODES });
+    }
+    this._dirs.set(pyodide, dir);
+  }
+
+  unmount(pyodide: PyodideInterface) {
+    const dir = this._dirs.get(pyodide);
+    if (!dir) return;
+    this._dirs.delete(pyodide);
+    try {
+      pyodide.FS.unmount('/input');
+    } finally {
+      rmSync(dir, { recursive: true, force: true });
+    }
+  }
+}
@@ -0,0 +1,18 @@
+import { describe, expect, it } from 'vitest';
+import { compiledWasmModules, useCompiledWasmModules } from './loaders';
+
+describe('compiledWasmModules', () => {
+  it('compiles each module once', async () => {
+    const first = await compiledWasmModules(['imagemagick', 'no-such-module']);
+    expect(Object.keys(first)).toEqual(['imagemagick']);
+    expect(first.imagemagick).toBeInstanceOf(WebAssembly.Module);
+    const second = await compiledWasmModules(['imagemagick']);
+    expect(second.imagemagick).toBe(first.imagemagick);
+  }, 60000);
+
+  it('uses modules compiled elsewhere', async () => {
+    const mod = new WebAssembly.Module(new Uint8Array([0, 97, 115, 109, 1, 0, 0, 0]));
+    useCompiledWasmModules({ imagemagick: mod });
+    expect((await compiledWasmModules(['imagemagick'])).imagemagick).toBe(mod);
+  });
+});
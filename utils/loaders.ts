@@ -1,9 +1,49 @@
 import { FiolinWasmLoader } from '../common/types';
 import { ImageMagickLoader } from '../common/image-magick';
 import { pkgPath } from './pkg-path';
-import { readFileSync } from 'node:fs';
+import { readFile } from 'node:fs/promises';
+
+// Where the binary for each wasm module lives, relative to the package root.
+const WASM_PATHS: Record<string, string> = {
+  'imagemagick': 'node_modules/@imagemagick/magick-wasm/dist/magick.wasm',
+};
+
+// Each module is compiled at most once per thread, and pool workers are handed
+// the parent's compiled modules (see useCompiledWasmModules), so new runners
+// and interpreter reloads only have to instantiate them.
+const compiled = new Map<string, Promise<WebAssembly.Module>>();
+
+function compiledWasm(name: string): Promise<WebAssembly.Module> {
+  let mod = compiled.get(name);
+  if (!mod) {
+    const compiling = readFile(pkgPath(WASM_PATHS[name])).then((buf) => WebAssembly.compile(buf));
+    // Don't hang on to failures; the next caller should try again.
+    compiling.catch(() => {
+      if (compiled.get(name) === compiling) compiled.delete(name);
+    });
+    compiled.set(name, compiling);
+    mod = compiling;
+  }
+  return mod;
+}
+
+// The compiled modules with the given names (ignoring ones that don't exist),
+// e.g. for passing to worker threads. WebAssembly.Modules can be sent to other
+// threads without recompiling them.
+export async function compiledWasmModules(names: string[]): Promise<Record<string, WebAssembly.Module>> {
+  const known = names.filter((name) => name in WASM_PATHS);
+  const mods = await Promise.all(known.map(compiledWasm));
+  return Object.fromEntries(known.map((name, i) => [name, mods[i]]));
+}
+
+// Uses modules compiled elsewhere (e.g. by the thread that started this one)
+// rather than compiling them again.
+export function useCompiledWasmModules(mods: Record<string, WebAssembly.Module>) {
+  for (const [name, mod] of Object.entries(mods)) {
+    compiled.set(name, Promise.resolve(mod));
+  }
+}
 
 export function offlineWasmLoaders(): Record<string, FiolinWasmLoader> {
-  const im = readFileSync(pkgPath('node_modules/@imagemagick/magick-wasm/dist/magick.wasm'));
-  return { 'imagemagick': new ImageMagickLoader(im) };
+  return { 'imagemagick': new ImageMagickLoader(() => compiledWasm('imagemagick')) };
 }
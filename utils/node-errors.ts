@@ -0,0 +1,7 @@
+export function isNodeNotFound(e: unknown): boolean {
+  return typeof e === 'object' && e !== null && 'code' in e && e.code === 'ENOENT';
+}
+
+export function isNodeExists(e: unknown): boolean {
+  return typeof e === 'object' && e !== null && 'code' in e && e.code === 'EEXIST';
+}
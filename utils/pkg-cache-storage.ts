@@ -0,0 +1,56 @@
+import { readFile, rm } from 'node:fs/promises';
+import path from 'node:path';
+import { atomicWrite, withFileLock } from './atomic-fs';
+import { isNodeNotFound } from './node-errors';
+import { emptyPackageCacheIndex, PackageCacheIndex, PackageCacheStorage } from '../common/pkg-cache';
+
+// Stores the package cache on disk: an index.json plus one file per blob
+// (named by its content hash) under blobs/. Updates to the index hold
+// index.lock, so that every process using the directory can share it.
+export class DiskPackageCacheStorage extends PackageCacheStorage {
+  private readonly _dir: string;
+
+  constructor(dir: string) {
+    super();
+    this._dir = dir;
+  }
+
+  private blobPath(hash: string): string {
+    return path.join(this._dir, 'blobs', hash);
+  }
+
+  async readIndex(): Promise<PackageCacheIndex | undefined> {
+    try {
+      return JSON.parse(await readFile(path.join(this._dir, 'index.json'), 'utf-8'));
+    } catch (e) {
+      if (isNodeNotFound(e)) return undefined;
+      throw e;
+    }
+  }
+
+  async updateIndex<T>(update: (index: PackageCacheIndex) => T): Promise<T> {
+    return await withFileLock(path.join(this._dir, 'index.lock'), async () => {
+      const index = (await this.readIndex()) || emptyPackageCacheIndex();
+      const result = update(index);
+      await atomicWrite(path.join(this._dir, 'index.json'), JSON.stringify(index));
+      return result;
+    });
+  }
+
+  async readBlob(hash: string): Promise<Uint8Array | undefined> {
+    try {
+      return new Uint8Array(await readFile(this.blobPath(hash)));
+    } catch (e) {
+      if (isNodeNotFound(e)) return undefined;
+      throw e;
+    }
+  }
+
+  async writeBlob(hash: string, contents: Uint8Array): Promise<void> {
+    await atomicWrite(this.blobPath(hash), contents);
+  }
+
+  async deleteBlob(hash: string): Promise<void> {
+    await rm(this.blobPath(hash), { force: true });
+  }
+}
@@ -0,0 +1,56 @@
+import { readFile, rm } from 'node:fs/promises';
+import path from 'node:path';
+import { atomicWrite, withFileLock } from './atomic-fs';
+import { isNodeNotFound } from './node-errors';
+import { emptyRunCacheIndex, RunCacheIndex, RunCacheStorage } from '../common/run-cache';
+
+// Stores the run cache on disk: an index.json plus one file per run (named by
+// its key) under runs/. Updates to the index hold index.lock (see
+// DiskPackageCacheStorage).
+export class DiskRunCacheStorage extends RunCacheStorage {
+  private readonly _dir: string;
+
+  constructor(dir: string) {
+    super();
+    this._dir = dir;
+  }
+
+  private blobPath(key: string): string {
+    return path.join(this._dir, 'runs', key);
+  }
+
+  async readIndex(): Promise<RunCacheIndex | undefined> {
+    try {
+      return JSON.parse(await readFile(path.join(this._dir, 'index.json'), 'utf-8'));
+    } catch (e) {
+      if (isNodeNotFound(e)) return undefined;
+      throw e;
+    }
+  }
+
+  async updateIndex<T>(update: (index: RunCacheIndex) => T): Promise<T> {
+    return await withFileLock(path.join(this._dir, 'index.lock'), async () => {
+      const index = (await this.readIndex()) || emptyRunCacheIndex();
+      const result = update(index);
+      await atomicWrite(path.join(this._dir, 'index.json'), JSON.stringify(index));
+      return result;
+    });
+  }
+
+  async readBlob(key: string): Promise<Uint8Array | undefined> {
+    try {
+      return new Uint8Array(await readFile(this.blobPath(key)));
+    } catch (e) {
+      if (isNodeNotFound(e)) return undefined;
+      throw e;
+    }
+  }
+
+  async writeBlob(key: string, contents: Uint8Array): Promise<void> {
+    await atomicWrite(this.blobPath(key), contents);
+  }
+
+  async deleteBlob(key: string): Promise<void> {
+    await rm(this.blobPath(key), { force: true });
+  }
+}
@@ -0,0 +1,71 @@
+// Entry point for the worker threads in NodeWorkerPool (see worker-pool.ts).
+import { parentPort, workerData } from 'node:worker_threads';
+import { IConsole } from '../common/runner';
+import { getErrMsg } from '../common/errors';
+import { FiolinRunResponse, FiolinScript } from '../common/types';
+import { loadScript } from './config';
+import { useCompiledWasmModules } from './loaders';
+import { mkNodeRunnerPool, runWithLocalFs, withRunCache } from './runner';
+import { PoolJobMessage, PoolResultMessage, PoolWorkerData } from './worker-pool';
+
+if (!parentPort) {
+  throw new Error('runner-worker must be run as a worker thread');
+}
+const port = parentPort;
+const data = workerData as PoolWorkerData;
+
+const quietConsole: IConsole = {
+  debug: (s) => { if (data.verbose) console.debug(s) },
+  info: (s) => { if (data.verbose) console.info(s) },
+  warn: (s) => console.warn(s),
+  error: (s) => console.error(s),
+};
+
+if (data.wasmModules) {
+  useCompiledWasmModules(data.wasmModules);
+}
+
+// Jobs for different fiols may need different runtimes.
+const opts = {
+  cacheDir: data.cacheDir, offline: data.offline, cacheResults: data.cacheResults,
+  timeoutMs: data.timeoutMs, maxHeapBytes: data.maxHeapBytes, maxFsBytes: data.maxFsBytes,
+  recycleHeapBytes: data.recycleHeapBytes,
+};
+const runner = withRunCache(mkNodeRunnerPool(quietConsole, opts), quietConsole, opts);
+const scripts = new Map<string, FiolinScript>();
+
+function getScript(fiol: string): FiolinScript {
+  let script = scripts.get(fiol);
+  if (!script) {
+    script = loadScript(fiol);
+    scripts.set(fiol, script);
+  }
+  return script;
+}
+
+// Jobs wait for this, since installing packages and running can't overlap.
+const warmed = (async () => {
+  for (const fiol of data.warm || []) {
+    try {
+      await runner.installPkgs(getScript(fiol));
+    } catch (e) {
+      quietConsole.warn(`Failed to warm up ${fiol}: ${getErrMsg(e)}`);
+    }
+  }
+})();
+
+port.on('message', async ({ id, job }: PoolJobMessage) => {
+  await warmed;
+  let msg: PoolResultMessage;
+  // An array rather than a variable, since it's only set from a callback.
+  const responses: FiolinRunResponse[] = [];
+  try {
+    const outputs = await runWithLocalFs(
+      runner, getScript(job.fiol), job.inputPaths, job.outputDir,
+      { args: job.args || {}, skipZip: job.skipZip, measureFs: job.measureFs }, (r) => { responses.push(r) });
+    msg = { id, ok: true, outputs, debug: responses[0]?.debug, zipRequested: responses[0]?.zipRequested };
+  } catch (e) {
+    msg = { id, ok: false, error: getErrMsg(e), debug: responses[0]?.debug };
+  }
+  port.postMessage(msg);
+});
@@ -1,51 +1,192 @@
 import { IConsole, PyodideRunner } from '../common/runner';
-import { FiolinRunRequest, FiolinScript } from '../common/types';
-import { readFile, writeFile } from 'node:fs/promises';
+import { FiolinRunner, FiolinRunRequest, FiolinRunResponse, FiolinScript } from '../common/types';
+import { createWriteStream, mkdirSync, mkdtempSync, rmSync } from 'node:fs';
+import { Readable } from 'node:stream';
+import { pipeline } from 'node:stream/promises';
 import path from 'node:path';
 import { pkgPath } from './pkg-path';
 import { loadScript } from './config';
-import { offlineWasmLoaders } from './loaders';
+import { compiledWasmModules, offlineWasmLoaders } from './loaders';
+import { MemorySnapshotStore, SnapshotStore } from '../common/snapshot';
+import { DiskSnapshotStore } from './snapshot-store';
+import { PackageCache } from '../common/pkg-cache';
+import { PyodideRunnerPool } from '../common/runner-pool';
+import { DiskPackageCacheStorage } from './pkg-cache-storage';
+import { MemoizingRunner, RunCache } from '../common/run-cache';
+import { DiskRunCacheStorage } from './run-cache-storage';
+import { ThreadWatchdog } from './watchdog';
+import { NodeFsInputMounter, openLocalFile } from './input-mount';
+import { canFanOut, mergeResponses } from '../common/fan-out';
+import { NodeWorkerPool } from './worker-pool';
+
+export interface NodeRunnerOptions {
+  // Directory for caches that persist between processes. If unset, caches
+  // only live as long as the process.
+  cacheDir?: string;
+  // Only use python packages already in the cache (requires cacheDir).
+  offline?: boolean;
+  // Reuse the results of earlier runs of deterministic scripts on identical
+  // inputs (requires cacheDir; see MemoizingRunner).
+  cacheResults?: boolean;
+  // See PyodideRunnerOptions. Deadlines are enforced from another thread, so
+  // they also stop scripts that never yield.
+  timeoutMs?: number;
+  maxHeapBytes?: number;
+  maxFsBytes?: number;
+  // For runner pools, the maximum number of interpreters kept alive.
+  maxRunners?: number;
+  // For runner pools, the heap size past which an interpreter is replaced
+  // (see PyodideRunnerPoolOptions.recycleHeapBytes).
+  recycleHeapBytes?: number;
+  // For NodeFiolinRunner, the number of worker threads that the inputs of
+  // per-file scripts are split across (default 1, i.e. no threads).
+  fanOutThreads?: number;
+}
+
+const processSnapshots = new MemorySnapshotStore();
+
+function snapshotStore(opts?: NodeRunnerOptions): SnapshotStore {
+  if (opts?.cacheDir) {
+    return new DiskSnapshotStore(path.join(opts.cacheDir, 'snapshots'));
+  }
+  return processSnapshots;
+}
+
+// Creates a PyodideRunner set up to run offline under node.
+export function mkNodePyodideRunner(console?: IConsole, opts?: NodeRunnerOptions): PyodideRunner {
+  // For some mysterious reason the indexUrl is needed but only in tests. But
+  // it doesn't seem to break the run command, so whatever.
+  return new PyodideRunner({
+    console,
+    indexUrl: pkgPath('node_modules/pyodide'),
+    loaders: offlineWasmLoaders(),
+    snapshots: snapshotStore(opts),
+    pkgCache: opts?.cacheDir ?
+      new PackageCache(new DiskPackageCacheStorage(path.join(opts.cacheDir, 'packages'))) :
+      undefined,
+    offline: opts?.offline,
+    packageCacheDir: opts?.cacheDir && path.join(opts.cacheDir, 'pyodide'),
+    inputMounter: new NodeFsInputMounter(),
+    timeoutMs: opts?.timeoutMs,
+    watchdog: new ThreadWatchdog(),
+    maxHeapBytes: opts?.maxHeapBytes,
+    maxFsBytes: opts?.maxFsBytes,
+    // Only ever given the fiols bundled with fiolin (see loadScript).
+    trustBuilds: true,
+  });
+}
+
+// Creates a pool of node PyodideRunners, one per runtime (see
+// PyodideRunnerPool).
+export function mkNodeRunnerPool(console?: IConsole, opts?: NodeRunnerOptions): PyodideRunnerPool {
+  return new PyodideRunnerPool(
+    () => mkNodePyodideRunner(console, opts),
+    { console, maxRunners: opts?.maxRunners, recycleHeapBytes: opts?.recycleHeapBytes });
+}
+
+// Wraps the runner in a MemoizingRunner if the options ask for results to be
+// cached.
+export function withRunCache(runner: FiolinRunner, console?: IConsole, opts?: NodeRunnerOptions): FiolinRunner {
+  if (!opts?.cacheResults) return runner;
+  if (!opts.cacheDir) {
+    throw new Error('cacheResults requires cacheDir');
+  }
+  const cache = new RunCache(new DiskRunCacheStorage(path.join(opts.cacheDir, 'results')));
+  return new MemoizingRunner(runner, cache, console);
+}
+
+// Reads input paths to Files, runs the script, and writes the output Files
+// into outputDir. Returns the basenames of the outputs. If given, onResponse is
+// passed the run's response (even if the run fails).
+export async function runWithLocalFs(runner: FiolinRunner, script: FiolinScript, inputPaths: string[], outputDir: string, requestOther: Omit<FiolinRunRequest, 'inputs'>, onResponse?: (response: FiolinRunResponse) => void): Promise<string[]> {
+  const inputs: File[] = [];
+  for (const i of inputPaths) {
+    inputs.push(await openLocalFile(i));
+  }
+  const response = await runner.run(script, { inputs, ...requestOther });
+  return writeLocalOutputs(response, outputDir, onResponse);
+}
+
+async function writeLocalOutputs(response: FiolinRunResponse, outputDir: string, onResponse?: (response: FiolinRunResponse) => void): Promise<string[]> {
+  if (onResponse) {
+    onResponse(response);
+  }
+  if (response.error) {
+    throw response.error;
+  }
+  if (response.partial) {
+    throw new Error(`Script reached only partial completion; perhaps some required args were missing`);
+  }
+  if (response.formUpdates && response.formUpdates.length > 0) {
+    console.warn(`Ignoring ${response.formUpdates.length} form updates`);
+  }
+  const outputBasenames: string[] = [];
+  for (const f of response.outputs) {
+    outputBasenames.push(f.name);
+    await pipeline(Readable.fromWeb(f.stream() as any), createWriteStream(path.join(outputDir, f.name)));
+  }
+  return outputBasenames;
+}
 
 // Convenience wrapper around PyodideRunner that reads input paths to Files and
 // write the output Files into the given directory.
 export class NodeFiolinRunner {
   public readonly script: FiolinScript;
   public readonly outputDir: string;
-  private readonly _runner: PyodideRunner;
+  private readonly _fiolName: string;
+  private readonly _opts?: NodeRunnerOptions;
+  private readonly _runner: FiolinRunner;
 
-  constructor(fiolName: string, outputDir: string, console?: IConsole) {
+  constructor(fiolName: string, outputDir: string, console?: IConsole, opts?: NodeRunnerOptions) {
     this.script = loadScript(fiolName);
     this.outputDir = outputDir;
-    // For some mysterious reason the indexUrl is needed but only in tests. But
-    // it doesn't seem to break the run command, so whatever.
-    this._runner = new PyodideRunner({
-      console,
-      indexUrl: pkgPath('node_modules/pyodide'),
-      loaders: offlineWasmLoaders(),
-    });
+    this._fiolName = fiolName;
+    this._opts = opts;
+    this._runner = withRunCache(mkNodePyodideRunner(console, opts), console, opts);
   }
 
-  async runWithLocalFs(inputPaths: string[], requestOther: Omit<FiolinRunRequest, 'inputs'>): Promise<string[]> {
-    const inputs: File[] = [];
-    for (const i of inputPaths) {
-      const buf = await readFile(i);
-      inputs.push(new File([buf], path.basename(i)));
-    }
-    const response = await this._runner.run(this.script, { inputs, ...requestOther });
-    if (response.error) {
-      throw response.error;
-    }
-    if (response.partial) {
-      throw new Error(`Script reached only partial completion; perhaps some required args were missing`);
-    }
-    if (response.formUpdates && response.formUpdates.length > 0) {
-      console.warn(`Ignoring ${response.formUpdates.length} form updates`);
+  async runWithLocalFs(inputPaths: string[], requestOther: Omit<FiolinRunRequest, 'inputs'>, onResponse?: (response: FiolinRunResponse) => void): Promise<string[]> {
+    const threads = Math.min(this._opts?.fanOutThreads || 1, inputPaths.length);
+    if (threads > 1 && canFanOut(this.script, { inputs: inputPaths, ...requestOther })) {
+      return this.fanOutWithLocalFs(threads, inputPaths, requestOther, onResponse);
     }
-    const outputBasenames: string[] = [];
-    for (const f of response.outputs) {
-      outputBasenames.push(f.name);
-      await writeFile(path.join(this.outputDir, f.name), Buffer.from(await f.arrayBuffer()));
+    return runWithLocalFs(this._runner, this.script, inputPaths, this.outputDir, requestOther, onResponse);
+  }
+
+  // The worker thread equivalent of fanOut: each input is a job for a
+  // NodeWorkerPool, which writes its outputs into its own scratch directory
+  // (so that clashing names don't overwrite each other), and the results are
+  // merged just as fanOut would. The scripts' logs go straight to the console.
+  private async fanOutWithLocalFs(threads: number, inputPaths: string[], requestOther: Omit<FiolinRunRequest, 'inputs'>, onResponse?: (response: FiolinRunResponse) => void): Promise<string[]> {
+    const start = performance.now();
+    const pool = new NodeWorkerPool({
+      size: threads, verbose: true,
+      cacheDir: this._opts?.cacheDir, offline: this._opts?.offline,
+      cacheResults: this._opts?.cacheResults, timeoutMs: this._opts?.timeoutMs,
+      maxHeapBytes: this._opts?.maxHeapBytes, maxFsBytes: this._opts?.maxFsBytes,
+      recycleHeapBytes: this._opts?.recycleHeapBytes, wasmModules: await compiledWasmModules((this.script.runtime.wasmModules || []).map((m) => m.name)),
+    });
+    const scratch = mkdtempSync(path.join(this.outputDir, '.fiolin-'));
+    try {
+      const responses = await Promise.all(inputPaths.map(async (inputPath, i): Promise<FiolinRunResponse> => {
+        const outputDir = path.join(scratch, `${i}`);
+        mkdirSync(outputDir);
+        const result = await pool.run({
+          fiol: this._fiolName, inputPaths: [inputPath], outputDir,
+          args: requestOther.args, skipZip: true, measureFs: requestOther.measureFs,
+        });
+        if (!result.ok) {
+          return { outputs: [], log: [], error: new Error(result.error), debug: result.debug };
+        }
+        const outputs = await Promise.all(result.outputs.map((o) => openLocalFile(path.join(outputDir, o))));
+        return { outputs, log: [], debug: result.debug, zipRequested: result.zipRequested };
+      }));
+      const inputs = await Promise.all(inputPaths.map(openLocalFile));
+      const response = await mergeResponses({ inputs, ...requestOther }, responses, performance.now() - start);
+      return await writeLocalOutputs(response, this.outputDir, onResponse);
+    } finally {
+      await pool.close();
+      rmSync(scratch, { recursive: true, force: true });
     }
-    return outputBasenames;
   }
 }
@@ -0,0 +1,65 @@
+import { createHash } from 'node:crypto';
+import { mkdir, readFile, rename, rm, writeFile } from 'node:fs/promises';
+import path from 'node:path';
+import { isNodeNotFound } from './node-errors';
+import { RuntimeSnapshot, SnapshotStore } from '../common/snapshot';
+
+interface Manifest {
+  key: string;
+  builtinPkgs: string[];
+  files: string[];
+}
+
+// Persists snapshots on disk so that separate CLI invocations (and worker
+// threads) can share them. Each snapshot is a directory named by the hash of
+// its key, with a manifest and one blob per file.
+export class DiskSnapshotStore extends SnapshotStore {
+  private readonly _dir: string;
+
+  constructor(dir: string) {
+    super();
+    this._dir = dir;
+  }
+
+  private snapshotDir(key: string): string {
+    return path.join(this._dir, createHash('sha256').update(key).digest('hex'));
+  }
+
+  async get(key: string): Promise<RuntimeSnapshot | undefined> {
+    const dir = this.snapshotDir(key);
+    let manifest: Manifest;
+    try {
+      manifest = JSON.parse(await readFile(path.join(dir, 'manifest.json'), 'utf-8'));
+    } catch (e) {
+      if (isNodeNotFound(e)) return undefined;
+      throw e;
+    }
+    if (manifest.key !== key) return undefined;
+    const files: [string, Uint8Array][] = [];
+    for (let i = 0; i < manifest.files.length; i++) {
+      files.push([manifest.files[i], new Uint8Array(await readFile(path.join(dir, `${i}`)))]);
+    }
+    return { builtinPkgs: manifest.builtinPkgs, files };
+  }
+
+  async put(key: string, snapshot: RuntimeSnapshot): Promise<void> {
+    const dir = this.snapshotDir(key);
+    // Write everything to a temporary directory and rename it into place so
+    // that concurrent readers never see a partial snapshot.
+    const tmp = `${dir}.tmp-${process.pid}-${Date.now()}`;
+    await mkdir(tmp, { recursive: true });
+    const manifest: Manifest = { key, builtinPkgs: snapshot.builtinPkgs, files: [] };
+    for (let i = 0; i < snapshot.files.length; i++) {
+      const [f, contents] = snapshot.files[i];
+      manifest.files.push(f);
+      await writeFile(path.join(tmp, `${i}`), contents);
+    }
+    await writeFile(path.join(tmp, 'manifest.json'), JSON.stringify(manifest));
+    try {
+      await rename(tmp, dir);
+    } catch (e) {
+      // Somebody else already saved it.
+      await rm(tmp, { recursive: true, force: true });
+    }
+  }
+}
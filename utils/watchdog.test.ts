@@ -0,0 +1,35 @@
+import { describe, expect, it } from 'vitest';
+import { mkRunner, mkScript } from '../common/runner-test-util';
+import { RunInterruptedError } from '../common/types';
+import { ThreadWatchdog } from './watchdog';
+
+describe('ThreadWatchdog', () => {
+  it('interrupts scripts that never yield', async () => {
+    const watchdog = new ThreadWatchdog();
+    try {
+      const runner = mkRunner({ timeoutMs: 200, watchdog });
+      const response = await runner.run(mkScript(`
+        while True:
+          pass
+      `), { inputs: [] });
+      expect(response.error).toBeInstanceOf(RunInterruptedError);
+      expect((response.error as RunInterruptedError).reason).toEqual('TIMEOUT');
+    } finally {
+      await watchdog.close();
+    }
+  });
+
+  it('does nothing once disarmed', async () => {
+    const watchdog = new ThreadWatchdog();
+    try {
+      const runner = mkRunner({ timeoutMs: 200, watchdog });
+      const response = await runner.run(mkScript(`print('quick')`), { inputs: [] });
+      expect(response.error).toBeUndefined();
+      await new Promise((resolve) => setTimeout(resolve, 400));
+      const next = await runner.run(mkScript(`print('quick')`), { inputs: [] });
+      expect(next.error).toBeUndefined();
+    } finally {
+      await watchdog.close();
+    }
+  });
+});
@@ -0,0 +1,60 @@
+import { Worker } from 'node:worker_threads';
+import { reasonCode, SIGINT, Watchdog } from '../common/interrupt';
+
+// Runs in the watchdog's thread. Each arming waits (blocking only that thread)
+// for the generation counter to move on; if it doesn't in time, the run is
+// interrupted just as interrupt() would. Plain js, since it doesn't need
+// anything else from the package.
+const WATCHDOG_SOURCE = `
+  const { parentPort, workerData } = require('node:worker_threads');
+  const ctl = new Int32Array(workerData.ctl);
+  parentPort.on('message', ({ buffer, ms, gen }) => {
+    if (Atomics.wait(ctl, 0, gen, ms) === 'timed-out') {
+      const interrupts = new Int32Array(buffer);
+      Atomics.store(interrupts, 1, ${reasonCode('TIMEOUT')});
+      Atomics.store(interrupts, 0, ${SIGINT});
+    }
+  });
+`;
+
+// A Watchdog whose timer runs on a separate thread, so it can interrupt a
+// script that never yields. The interrupt buffer must be in shared memory.
+export class ThreadWatchdog extends Watchdog {
+  // Bumped on every arm and disarm, which ends any wait in progress.
+  private readonly _ctl: Int32Array;
+  private _worker?: Worker;
+
+  constructor() {
+    super();
+    this._ctl = new Int32Array(new SharedArrayBuffer(4));
+  }
+
+  // The thread is started on first use, and doesn't keep the process alive.
+  private worker(): Worker {
+    if (!this._worker) {
+      this._worker = new Worker(WATCHDOG_SOURCE, { eval: true, workerData: { ctl: this._ctl.buffer } });
+      this._worker.unref();
+    }
+    return this._worker;
+  }
+
+  arm(buffer: Int32Array, ms: number) {
+    if (!(buffer.buffer instanceof SharedArrayBuffer)) {
+      throw new Error('ThreadWatchdog needs an interrupt buffer in shared memory');
+    }
+    const gen = Atomics.add(this._ctl, 0, 1) + 1;
+    Atomics.notify(this._ctl, 0);
+    this.worker().postMessage({ buffer: buffer.buffer, ms, gen });
+  }
+
+  disarm() {
+    Atomics.add(this._ctl, 0, 1);
+    Atomics.notify(this._ctl, 0);
+  }
+
+  async close() {
+    this.disarm();
+    await this._worker?.terminate();
+    this._worker = undefined;
+  }
+}
@@ -0,0 +1,47 @@
+import { beforeEach, describe, expect, it, onTestFinished } from 'vitest';
+import { FiolinTmpDir } from '../common/test-util';
+import { NodeWorkerPool } from './worker-pool';
+import { expandInputs } from './expand-inputs';
+import { pkgPath } from './pkg-path';
+import path from 'node:path';
+
+describe('NodeWorkerPool', () => {
+  let output: FiolinTmpDir = new FiolinTmpDir();
+  beforeEach(() => { output = new FiolinTmpDir(onTestFinished); });
+
+  it('runs jobs across workers and reports failures individually', async () => {
+    const pool = new NodeWorkerPool({ size: 2 });
+    try {
+      const results = await Promise.all([
+        pkgPath('fiols/testdata/exif.jpg'),
+        pkgPath('fiols/testdata/nonexistent.jpg'),
+        pkgPath('fiols/testdata/phone.jpg'),
+      ].map((input) => pool.run({
+        fiol: 'strip-exif', inputPaths: [input], outputDir: output.path,
+      })));
+      expect(results[0]).toEqual({ ok: true, outputs: ['exif-no-exif.jpg'] });
+      expect(results[1].ok).toBe(false);
+      expect(results[2]).toEqual({ ok: true, outputs: ['phone-no-exif.jpg'] });
+    } finally {
+      await pool.close();
+    }
+  }, 120000);
+});
+
+describe('expandInputs', () => {
+  it('expands directories, globs, and plain files', () => {
+    const testdata = pkgPath('fiols/testdata');
+    expect(expandInputs(path.join(testdata, '*.jpg'))).toEqual([
+      path.join(testdata, 'exif.jpg'),
+      path.join(testdata, 'phone.jpg'),
+    ]);
+    expect(expandInputs(path.join(testdata, 'simple.t?r'))).toEqual([
+      path.join(testdata, 'simple.tar'),
+    ]);
+    expect(expandInputs(testdata)).toContain(path.join(testdata, 'winmail.dat'));
+    expect(expandInputs(path.join(testdata, 'loss.pdf'))).toEqual([
+      path.join(testdata, 'loss.pdf'),
+    ]);
+    expect(() => expandInputs(path.join(testdata, '*.nope'))).toThrow(/No input files matched/);
+  });
+});
@@ -0,0 +1,202 @@
+import { Worker } from 'node:worker_threads';
+import { Deferred } from '../common/deferred';
+import { getErrMsg } from '../common/errors';
+import { pkgPath } from './pkg-path';
+import { FiolinRunDebug } from '../common/types';
+
+// A unit of work for a pool worker: run the named fiol over the given inputs
+// and write the outputs into outputDir.
+export interface PoolJob {
+  fiol: string;
+  inputPaths: string[];
+  outputDir: string;
+  args?: Record<string, string>;
+  // See FiolinRunRequest.skipZip.
+  skipZip?: boolean;
+  // See FiolinRunRequest.measureFs.
+  measureFs?: boolean;
+}
+
+export type PoolJobResult = (
+  { ok: true, outputs: string[], debug?: FiolinRunDebug, zipRequested?: boolean } |
+  { ok: false, error: string, debug?: FiolinRunDebug }
+);
+
+// Messages exchanged with utils/runner-worker.ts.
+export interface PoolJobMessage { id: number; job: PoolJob }
+export type PoolResultMessage = { id: number } & PoolJobResult;
+
+export interface PoolWorkerData {
+  verbose: boolean;
+  cacheDir?: string;
+  offline?: boolean;
+  cacheResults?: boolean;
+  timeoutMs?: number;
+  maxHeapBytes?: number;
+  maxFsBytes?: number;
+  recycleHeapBytes?: number;
+  wasmModules?: Record<string, WebAssembly.Module>;
+  warm?: string[];
+}
+
+export interface NodeWorkerPoolOptions {
+  // The number of worker threads (each with its own warm interpreter).
+  size: number;
+  // Forward all the logs from the scripts rather than just warnings/errors.
+  verbose?: boolean;
+  // See NodeRunnerOptions.
+  cacheDir?: string;
+  offline?: boolean;
+  cacheResults?: boolean;
+  // See PyodideRunnerOptions. A job that runs out of time or memory fails on
+  // its own, and its worker moves on to the next one.
+  timeoutMs?: number;
+  maxHeapBytes?: number;
+  maxFsBytes?: number;
+  // See PyodideRunnerPoolOptions; keeps long batches from growing the
+  // workers' memory without bound.
+  recycleHeapBytes?: number;
+  // Already compiled wasm modules (see compiledWasmModules), which the workers
+  // use rather than each compiling their own.
+  wasmModules?: Record<string, WebAssembly.Module>;
+  // Fiols whose packages each worker installs as soon as it starts, so that
+  // the first jobs for them don't have to wait for it.
+  warm?: string[];
+}
+
+interface PoolSlot {
+  worker: Worker;
+  current?: { id: number, result: Deferred<PoolJobResult> };
+}
+
+// The workers are typescript, so they need to be bootstrapped through jiti
+// just like the CLI itself.
+function bootstrapSource(entry: string): string {
+  return `
+    const { createJiti } = require(${JSON.stringify(pkgPath('node_modules/jiti'))});
+    const jiti = createJiti(${JSON.stringify(entry)});
+    jiti.import(${JSON.stringify(entry)}).catch((e) => {
+      console.error(e);
+      process.exit(1);
+    });
+  `;
+}
+
+// A pool of worker threads, each keeping a PyodideRunner alive between jobs so
+// that interpreter startup is paid once per worker rather than once per job.
+// Jobs are queued and dispatched to whichever worker is free.
+export class NodeWorkerPool {
+  private readonly _opts: NodeWorkerPoolOptions;
+  private readonly _slots: PoolSlot[];
+  private readonly _queue: { id: number, job: PoolJob, result: Deferred<PoolJobResult> }[];
+  private _nextId: number;
+  private _closed: boolean;
+
+  constructor(opts: NodeWorkerPoolOptions) {
+    if (opts.size < 1) {
+      throw new Error(`Pool size must be at least 1; got ${opts.size}`);
+    }
+    this._opts = opts;
+    this._slots = [];
+    this._queue = [];
+    this._nextId = 0;
+    this._closed = false;
+    for (let i = 0; i < opts.size; i++) {
+      this._slots.push(this.spawn());
+    }
+  }
+
+  get size(): number {
+    return this._slots.length;
+  }
+
+  // Jobs waiting for a free worker.
+  get queued(): number {
+    return this._queue.length;
+  }
+
+  // Jobs that workers are in the middle of.
+  get running(): number {
+    return this._slots.filter((s) => s.current).length;
+  }
+
+  private spawn(): PoolSlot {
+    const workerData: PoolWorkerData = {
+      verbose: !!this._opts.verbose, cacheDir: this._opts.cacheDir,
+      offline: this._opts.offline, cacheResults: this._opts.cacheResults,
+      timeoutMs: this._opts.timeoutMs, maxHeapBytes: this._opts.maxHeapBytes,
+      maxFsBytes: this._opts.maxFsBytes, recycleHeapBytes: this._opts.recycleHeapBytes,
+      wasmModules: this._opts.wasmModules, warm: this._opts.warm,
+    };
+    const worker = new Worker(bootstrapSource(pkgPath('utils/runner-worker.ts')), {
+      eval: true, workerData,
+    });
+    const slot: PoolSlot = { worker };
+    worker.on('message', (msg: PoolResultMessage) => {
+      if (!slot.current || slot.current.id !== msg.id) {
+        console.error(`Pool worker returned result for unexpected job ${msg.id}`);
+        return;
+      }
+      const { result } = slot.current;
+      slot.current = undefined;
+      if (msg.ok) {
+        result.resolve({ ok: true, outputs: msg.outputs, debug: msg.debug, zipRequested: msg.zipRequested });
+      } else {
+        result.resolve({ ok: false, error: msg.error, debug: msg.debug });
+      }
+      this.dispatch();
+    });
+    worker.on('error', (e) => this.onWorkerDied(slot, getErrMsg(e)));
+    worker.on('exit', (code) => {
+      if (!this._closed) {
+        this.onWorkerDied(slot, `Pool worker exited with code ${code}`);
+      }
+    });
+    return slot;
+  }
+
+  // A crashed worker fails only the job it was running; it is replaced so that
+  // the rest of the queue keeps going.
+  private onWorkerDied(slot: PoolSlot, error: string) {
+    const i = this._slots.indexOf(slot);
+    if (i < 0) return;
+    if (slot.current) {
+      slot.current.result.resolve({ ok: false, error });
+      slot.current = undefined;
+    }
+    if (this._closed) return;
+    this._slots[i] = this.spawn();
+    this.dispatch();
+  }
+
+  private dispatch() {
+    for (const slot of this._slots) {
+      if (this._queue.length === 0) return;
+      if (slot.current) continue;
+      const { id, job, result } = this._queue.shift()!;
+      slot.current = { id, result };
+      const msg: PoolJobMessage = { id, job };
+      slot.worker.postMessage(msg);
+    }
+  }
+
+  // Queue a job. The promise resolves with a failure result rather than
+  // rejecting when the script fails, so one bad input doesn't stop a batch.
+  run(job: PoolJob): Promise<PoolJobResult> {
+    if (this._closed) {
+      return Promise.reject(new Error('NodeWorkerPool has already been closed'));
+    }
+    const result = new Deferred<PoolJobResult>();
+    this._queue.push({ id: this._nextId++, job, result });
+    this.dispatch();
+    return result.promise;
+  }
+
+  async close(): Promise<void> {
+    this._closed = true;
+    for (const { result } of this._queue.splice(0)) {
+      result.resolve({ ok: false, error: 'NodeWorkerPool closed before job ran' });
+    }
+    await Promise.all(this._slots.map((s) => s.worker.terminate()));
+  }
+}
@@ -1,8 +1,12 @@
-import { AutocompleteSuggestion } from '../common/types';
+import { AutocompleteIndex, AutocompleteSuggestion } from '../common/types';
 import { Container, ContainerOpts } from '../components/web/container';
 import { Autocomplete } from '../components/web/autocomplete';
 const monaco = import('../web-utils/monaco');
 
+// Runs still going after this long are stopped (they can also be stopped
+// sooner with the stop button).
+const DEFAULT_TIMEOUT_MS = 10 * 60 * 1000;
+
 export async function initFiolin(opts: ContainerOpts): Promise<Container> {
   let endpoints: Record<string, string> = {};
   try {
@@ -16,10 +20,11 @@ export async function initFiolin(opts: ContainerOpts): Promise<Container> {
   if (container === null) {
     die('#container not present; cannot initFiolin');
   }
-  return new Container(container, { workerEndpoint: endpoints.worker, ...opts });
+  return new Container(container, { workerEndpoint: endpoints.worker, timeoutMs: DEFAULT_TIMEOUT_MS, ...opts });
 }
 
-export function initAutocomplete(opts: { suggestions: AutocompleteSuggestion[] }): Autocomplete {
+// The suggestions are preferably already indexed (see generateAutocompleteIndex).
+export function initAutocomplete(opts: { suggestions: AutocompleteIndex | AutocompleteSuggestion[] }): Autocomplete {
   const container = document.getElementById('autocomplete');
   if (container === null) {
     die('#autocomplete not present; cannot initAutocomplete');
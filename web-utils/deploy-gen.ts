@@ -34,8 +34,10 @@ function genEof(s: string): string {
 }
 
 function bashScript(script: FiolinScript, yml: string, opts: DeployOptions): string {
-  const json = JSON.stringify(script, null, 2);
-  const { code, ...scriptNoCode } = script;
+  // Builds are only trusted from fiolin's own server, so there's no point
+  // deploying one.
+  const json = JSON.stringify({ ...script, build: undefined }, null, 2);
+  const { code, build, ...scriptNoCode } = script;
   return dedent(`
     #!/bin/bash
     set -euo pipefail
@@ -146,8 +148,9 @@ function escAt(s: string): string {
 }
 
 function ps1File(script: FiolinScript, yml: string, opts: DeployOptions): string {
-  const json = JSON.stringify(script, null, 2);
-  const { code, ...scriptNoCode } = script;
+  // See bashScript on the build.
+  const json = JSON.stringify({ ...script, build: undefined }, null, 2);
+  const { code, build, ...scriptNoCode } = script;
   return dedent(`
     Set-StrictMode -Version Latest
     $ErrorActionPreference = "Stop"
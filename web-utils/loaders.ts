@@ -1,7 +1,8 @@
 import { FiolinWasmLoader } from '../common/types';
 import { ImageMagickLoader } from '../common/image-magick';
+import { compileWasm } from './wasm-cache';
 
 export function onlineWasmLoaders(): Record<string, FiolinWasmLoader> {
   const im = new URL('/bundle/magick.wasm', self.location.href);
-  return { 'imagemagick': new ImageMagickLoader(im) };
+  return { 'imagemagick': new ImageMagickLoader(() => compileWasm(im)) };
 }
@@ -0,0 +1,67 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from 'vitest';
+import { LogBatcher } from './log-batcher';
+import { FiolinLogLevel } from '../common/types';
+
+describe('LogBatcher', () => {
+  beforeEach(() => {
+    vi.useFakeTimers();
+  });
+
+  afterEach(() => {
+    vi.useRealTimers();
+    vi.restoreAllMocks();
+  });
+
+  it('sends a batch after the delay', () => {
+    const batches: [FiolinLogLevel, string][][] = [];
+    const batcher = new LogBatcher((entries) => batches.push(entries), { maxDelayMs: 10 });
+    batcher.log('INFO', 'a');
+    batcher.log('DEBUG', 'b');
+    expect(batches).toEqual([]);
+    vi.advanceTimersByTime(10);
+    expect(batches).toEqual([[['INFO', 'a'], ['DEBUG', 'b']]]);
+    vi.advanceTimersByTime(100);
+    expect(batches.length).toEqual(1);
+  });
+
+  it('sends full batches immediately', () => {
+    const batches: [FiolinLogLevel, string][][] = [];
+    const batcher = new LogBatcher((entries) => batches.push(entries), { maxEntries: 2, maxChars: 5 });
+    batcher.log('INFO', 'a');
+    batcher.log('INFO', 'b');
+    expect(batches).toEqual([[['INFO', 'a'], ['INFO', 'b']]]);
+    batcher.log('ERROR', 'long line');
+    expect(batches).toEqual([[['INFO', 'a'], ['INFO', 'b']], [['ERROR', 'long line']]]);
+  });
+
+  it('sends batches that have waited long enough even if the timer cannot fire', () => {
+    const batches: [FiolinLogLevel, string][][] = [];
+    const batcher = new LogBatcher((entries) => batches.push(entries), { maxDelayMs: 10 });
+    // As if synchronous python held the thread, so the clock moves but timers
+    // don't run.
+    let now = 0;
+    vi.spyOn(performance, 'now').mockImplementation(() => now);
+    batcher.log('INFO', 'a');
+    now = 5;
+    batcher.log('INFO', 'b');
+    expect(batches).toEqual([]);
+    now = 10;
+    batcher.log('INFO', 'c');
+    expect(batches).toEqual([[['INFO', 'a'], ['INFO', 'b'], ['INFO', 'c']]]);
+    now = 15;
+    batcher.log('INFO', 'd');
+    expect(batches.length).toEqual(1);
+  });
+
+  it('flushes on demand', () => {
+    const batches: [FiolinLogLevel, string][][] = [];
+    const batcher = new LogBatcher((entries) => batches.push(entries));
+    batcher.flush();
+    expect(batches).toEqual([]);
+    batcher.log('WARN', 'a');
+    batcher.flush();
+    expect(batches).toEqual([[['WARN', 'a']]]);
+    vi.advanceTimersByTime(1000);
+    expect(batches.length).toEqual(1);
+  });
+});
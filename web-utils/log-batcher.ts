@@ -0,0 +1,64 @@
+import { FiolinLogLevel } from '../common/types';
+
+export interface LogBatcherOptions {
+  // How long an entry may wait for others to join its batch (default 50ms).
+  maxDelayMs?: number;
+  // Send as soon as a batch has this many entries (default 500)...
+  maxEntries?: number;
+  // ...or this many characters of log text (default 64k).
+  maxChars?: number;
+}
+
+// Coalesces log entries into batches, so that a script printing a line per
+// file costs one postMessage (and one terminal update) per batch rather than
+// one per line. Batches are sent in order; call flush() before sending
+// anything that has to arrive after the logs so far. Timers can't fire while
+// synchronous python holds the thread, so each new entry also checks whether
+// the batch has waited long enough; the timer only covers the last entries
+// before things go quiet.
+export class LogBatcher {
+  private readonly _send: (entries: [FiolinLogLevel, string][]) => void;
+  private readonly _maxDelayMs: number;
+  private readonly _maxEntries: number;
+  private readonly _maxChars: number;
+  private _entries: [FiolinLogLevel, string][];
+  private _chars: number;
+  // When the first entry of the pending batch was logged.
+  private _firstAt: number;
+  private _timer?: ReturnType<typeof setTimeout>;
+
+  constructor(send: (entries: [FiolinLogLevel, string][]) => void, opts?: LogBatcherOptions) {
+    this._send = send;
+    this._maxDelayMs = opts?.maxDelayMs ?? 50;
+    this._maxEntries = opts?.maxEntries ?? 500;
+    this._maxChars = opts?.maxChars ?? 64 * 1024;
+    this._entries = [];
+    this._chars = 0;
+    this._firstAt = 0;
+  }
+
+  log(level: FiolinLogLevel, value: string) {
+    const now = performance.now();
+    if (this._entries.length === 0) this._firstAt = now;
+    this._entries.push([level, value]);
+    this._chars += value.length;
+    if (this._entries.length >= this._maxEntries || this._chars >= this._maxChars ||
+        now - this._firstAt >= this._maxDelayMs) {
+      this.flush();
+    } else if (this._timer === undefined) {
+      this._timer = setTimeout(() => this.flush(), this._maxDelayMs);
+    }
+  }
+
+  flush() {
+    if (this._timer !== undefined) {
+      clearTimeout(this._timer);
+      this._timer = undefined;
+    }
+    if (this._entries.length === 0) return;
+    const entries = this._entries;
+    this._entries = [];
+    this._chars = 0;
+    this._send(entries);
+  }
+}
@@ -117,7 +117,8 @@ export class FiolinScriptEditor implements IFiolinScriptEditor {
 
   setScript(script: FiolinScript) {
     this.py.setValue(script.code.python);
-    const { code, ...scriptNoCode } = script;
+    // The build is an artifact of bundling the script, not part of its source.
+    const { code, build, ...scriptNoCode } = script;
     this.yml.setValue(YAML.stringify(scriptNoCode));
   }
 
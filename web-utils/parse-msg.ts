@@ -1,8 +1,7 @@
-import { ObjPath, pInst, pNum, pStr, pStrLit, pObjWithProps, pStrUnion, pOpt, pTaggedUnion, pRec } from '../common/parse';
+import { ObjPath, pArr, pInst, pNum, pStr, pStrLit, pObjWithProps, pStrUnion, pOpt, pTaggedUnion, pRec } from '../common/parse';
 import { pFiolinScript } from '../common/parse-script';
-import { pFiolinRunRequest, pFiolinRunResponse } from '../common/parse-run';
-import { ErrorMessage, InstallPackagesMessage, LoadedMessage, PackagesInstalledMessage, RunMessage, LogMessage, SuccessMessage, WorkerMessage, WorkerMessageType } from './types';
-import { FiolinLogLevel, LOG_LEVELS } from '../common/types';
+import { pFiolinRunRequest, pFiolinRunResponse, pLogEntry } from '../common/parse-run';
+import { DeadlineMessage, ErrorMessage, InstallPackagesMessage, LoadedMessage, PackagesInstalledMessage, QueueMessage, RunMessage, LogMessage, SuccessMessage, SupersededMessage, WorkerMessage, WorkerMessageType } from './types';
 
 function getWindow() {
   try {
@@ -25,6 +24,9 @@ export function pWorkerMessage(p: ObjPath, v: unknown): WorkerMessage {
     'RUN': pRunMessage,
     'SUCCESS': pSuccessMessage,
     'ERROR': pErrorMessage,
+    'DEADLINE': pDeadlineMessage,
+    'SUPERSEDED': pSupersededMessage,
+    'QUEUE': pQueueMessage,
   })(p, v);
 }
 
@@ -36,18 +38,19 @@ export const pWorkerMessageType = pStrUnion<WorkerMessageType[]>([
   'RUN',
   'SUCCESS',
   'ERROR',
+  'DEADLINE',
+  'SUPERSEDED',
+  'QUEUE',
 ]);
 
 export const pLoadedMessage = pObjWithProps<LoadedMessage>({
-  type: pStrLit('LOADED')
+  type: pStrLit('LOADED'),
+  interruptBuffer: pOpt(pInst(Int32Array)),
 });
 
-const pLevel = pStrUnion<typeof LOG_LEVELS>(LOG_LEVELS);
-
 export const pLogMessage = pObjWithProps<LogMessage>({
   type: pStrLit('LOG'),
-  level: pLevel,
-  value: pStr,
+  entries: pArr(pLogEntry),
 });
 
 export const pInstallPackagesMessage = pObjWithProps<InstallPackagesMessage>({
@@ -61,7 +64,8 @@ export const pPackagesInstalledMessage = pObjWithProps<PackagesInstalledMessage>
 
 export const pRunMessage = pObjWithProps<RunMessage>({
   type: pStrLit('RUN'),
-  script: pFiolinScript,
+  scriptHash: pStr,
+  script: pOpt(pFiolinScript),
   request: pFiolinRunRequest,
   setCanvases: pOpt(pRec<OffscreenCanvas>(pInst(getWindow().OffscreenCanvas))),
 });
@@ -71,6 +75,20 @@ export const pSuccessMessage = pObjWithProps<SuccessMessage>({
   response: pFiolinRunResponse,
 });
 
+export const pDeadlineMessage = pObjWithProps<DeadlineMessage>({
+  type: pStrLit('DEADLINE'),
+  ms: pOpt(pNum),
+});
+
+export const pSupersededMessage = pObjWithProps<SupersededMessage>({
+  type: pStrLit('SUPERSEDED'),
+});
+
+export const pQueueMessage = pObjWithProps<QueueMessage>({
+  type: pStrLit('QUEUE'),
+  depth: pNum,
+});
+
 export function pErrorMessage(p: ObjPath, v: unknown) {
   const em = pObjWithProps<ErrorMessage>({
     type: pStrLit('ERROR'),
@@ -0,0 +1,49 @@
+import { emptyPackageCacheIndex, PackageCacheIndex, PackageCacheStorage } from '../common/pkg-cache';
+
+// Entries in the Cache API are keyed by Request, so blobs and the index are
+// stored under made-up URLs.
+const INDEX_URL = 'https://fiolin-pkg-cache/index.json';
+function blobUrl(hash: string): string {
+  return `https://fiolin-pkg-cache/blobs/${hash}`;
+}
+
+// Stores the package cache with the Cache API, which (unlike the HTTP cache)
+// is under our control and available in web workers. It has no transactions,
+// so updates to the index hold a Web Lock (shared by every worker and tab).
+export class BrowserPackageCacheStorage extends PackageCacheStorage {
+  private readonly _cache: Promise<Cache>;
+  private readonly _lockName: string;
+
+  constructor(cacheName: string) {
+    super();
+    this._cache = caches.open(cacheName);
+    this._lockName = `${cacheName}-index`;
+  }
+
+  async readIndex(): Promise<PackageCacheIndex | undefined> {
+    const resp = await (await this._cache).match(INDEX_URL);
+    return resp ? await resp.json() : undefined;
+  }
+
+  async updateIndex<T>(update: (index: PackageCacheIndex) => T): Promise<T> {
+    return await navigator.locks.request(this._lockName, async () => {
+      const index = (await this.readIndex()) || emptyPackageCacheIndex();
+      const result = update(index);
+      await (await this._cache).put(INDEX_URL, new Response(JSON.stringify(index)));
+      return result;
+    });
+  }
+
+  async readBlob(hash: string): Promise<Uint8Array | undefined> {
+    const resp = await (await this._cache).match(blobUrl(hash));
+    return resp ? new Uint8Array(await resp.arrayBuffer()) : undefined;
+  }
+
+  async writeBlob(hash: string, contents: Uint8Array): Promise<void> {
+    await (await this._cache).put(blobUrl(hash), new Response(contents));
+  }
+
+  async deleteBlob(hash: string): Promise<void> {
+    await (await this._cache).delete(blobUrl(hash));
+  }
+}
@@ -0,0 +1,82 @@
+import { emptyRunCacheIndex, RunCacheIndex, RunCacheStorage } from '../common/run-cache';
+
+const STORE_NAME = 'runs';
+const INDEX_KEY = 'index';
+function blobKey(key: string): string {
+  return `blobs/${key}`;
+}
+
+function promisify<T>(req: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+  });
+}
+
+// Stores the run cache in IndexedDB, which (unlike the Cache API) can hold
+// plain objects as well as bytes; the index and blobs share one object store.
+// Each update to the index is a single readwrite transaction, so workers
+// sharing the database can't lose each other's changes.
+export class BrowserRunCacheStorage extends RunCacheStorage {
+  private readonly _db: Promise<IDBDatabase>;
+
+  constructor(dbName: string) {
+    super();
+    const req = indexedDB.open(dbName, 1);
+    req.onupgradeneeded = () => { req.result.createObjectStore(STORE_NAME) };
+    this._db = promisify(req);
+  }
+
+  private async get<T>(key: string): Promise<T | undefined> {
+    const db = await this._db;
+    return await promisify(db.transaction(STORE_NAME).objectStore(STORE_NAME).get(key));
+  }
+
+  private async put(key: string, value: unknown): Promise<void> {
+    const db = await this._db;
+    await promisify(db.transaction(STORE_NAME, 'readwrite').objectStore(STORE_NAME).put(value, key));
+  }
+
+  async readIndex(): Promise<RunCacheIndex | undefined> {
+    return await this.get(INDEX_KEY);
+  }
+
+  async updateIndex<T>(update: (index: RunCacheIndex) => T): Promise<T> {
+    const db = await this._db;
+    return await new Promise((resolve, reject) => {
+      const tx = db.transaction(STORE_NAME, 'readwrite');
+      const store = tx.objectStore(STORE_NAME);
+      let result: T;
+      const req = store.get(INDEX_KEY);
+      // The put has to be issued from the get's callback, before the
+      // transaction commits.
+      req.onsuccess = () => {
+        const index: RunCacheIndex = req.result || emptyRunCacheIndex();
+        try {
+          result = update(index);
+        } catch (e) {
+          tx.abort();
+          reject(e);
+          return;
+        }
+        store.put(index, INDEX_KEY);
+      };
+      tx.oncomplete = () => resolve(result);
+      tx.onerror = () => reject(tx.error);
+      tx.onabort = () => reject(tx.error);
+    });
+  }
+
+  async readBlob(key: string): Promise<Uint8Array | undefined> {
+    return await this.get(blobKey(key));
+  }
+
+  async writeBlob(key: string, contents: Uint8Array): Promise<void> {
+    await this.put(blobKey(key), contents);
+  }
+
+  async deleteBlob(key: string): Promise<void> {
+    const db = await this._db;
+    await promisify(db.transaction(STORE_NAME, 'readwrite').objectStore(STORE_NAME).delete(blobKey(key)));
+  }
+}
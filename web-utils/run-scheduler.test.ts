@@ -0,0 +1,89 @@
+import { describe, expect, it } from 'vitest';
+import { Deferred } from '../common/deferred';
+import { RunScheduler } from './run-scheduler';
+
+// Schedules runs that each wait to be released, recording when they start
+// and whether they were superseded.
+function setup() {
+  const events: string[] = [];
+  const depths: number[] = [];
+  const releases: Record<string, Deferred<void>> = {};
+  const scheduler = new RunScheduler({ onDepth: (d) => depths.push(d) });
+  const schedule = (name: string, key?: string) => {
+    releases[name] = new Deferred();
+    scheduler.schedule({
+      key,
+      start: async () => {
+        events.push(`start ${name}`);
+        await releases[name].promise;
+        events.push(`end ${name}`);
+      },
+      superseded: () => { events.push(`superseded ${name}`) },
+    });
+  };
+  return { scheduler, schedule, releases, events, depths };
+}
+
+describe('RunScheduler', () => {
+  it('runs one at a time in order', async () => {
+    const { scheduler, schedule, releases, events } = setup();
+    schedule('a');
+    schedule('b');
+    schedule('c');
+    expect(events).toEqual(['start a']);
+    releases['a'].resolve();
+    releases['b'].resolve();
+    releases['c'].resolve();
+    await scheduler.idle;
+    expect(events).toEqual(['start a', 'end a', 'start b', 'end b', 'start c', 'end c']);
+  });
+
+  it('supersedes waiting runs with the same key', async () => {
+    const { scheduler, schedule, releases, events } = setup();
+    schedule('a', 'slider');
+    schedule('b', 'slider');
+    schedule('c');
+    schedule('d', 'slider');
+    // The running one isn't affected, and the latest takes the place in line
+    // of the one it replaced.
+    expect(events).toEqual(['start a', 'superseded b']);
+    for (const name of ['a', 'c', 'd']) releases[name].resolve();
+    await scheduler.idle;
+    expect(events).toEqual([
+      'start a', 'superseded b', 'end a', 'start d', 'end d', 'start c', 'end c',
+    ]);
+  });
+
+  it('never lets later runs jump ahead of waiting events', async () => {
+    const { scheduler, schedule, releases, events } = setup();
+    schedule('a', 'slider');
+    schedule('b', 'slider');
+    schedule('download');
+    for (const name of ['a', 'b', 'download']) releases[name].resolve();
+    await scheduler.idle;
+    expect(events.filter((e) => e.startsWith('start'))).toEqual(
+      ['start a', 'start b', 'start download']);
+  });
+
+  it('reports the queue depth', async () => {
+    const { scheduler, schedule, releases, depths } = setup();
+    schedule('a', 'k');
+    schedule('b', 'k');
+    schedule('c', 'k');
+    schedule('d');
+    expect(scheduler.depth).toEqual(2);
+    for (const name of ['a', 'c', 'd']) releases[name].resolve();
+    await scheduler.idle;
+    expect(depths).toEqual([1, 0, 1, 2, 1, 0]);
+    expect(scheduler.depth).toEqual(0);
+  });
+
+  it('keeps going after a run fails', async () => {
+    const scheduler = new RunScheduler();
+    const started: string[] = [];
+    scheduler.schedule({ start: async () => { started.push('a'); throw new Error('oops') }, superseded: () => {} });
+    scheduler.schedule({ start: async () => { started.push('b') }, superseded: () => {} });
+    await scheduler.idle;
+    expect(started).toEqual(['a', 'b']);
+  });
+});
@@ -0,0 +1,74 @@
+export interface ScheduledRun {
+  // Runs with the same key supersede one another: if one is scheduled while
+  // another with its key is still waiting, only the newer one runs (in the
+  // older one's place in line). Runs without a key are never superseded.
+  key?: string;
+  start: () => Promise<void>;
+  // Called instead of start for a run that's been superseded.
+  superseded: () => void;
+}
+
+export interface RunSchedulerOptions {
+  // Called whenever the number of runs waiting to start changes.
+  onDepth?: (depth: number) => void;
+}
+
+// Runs scheduled work one at a time, in the order it was scheduled, since the
+// interpreters share state between runs (e.g., fiolin.continue_with) and can't
+// safely interleave or be reordered.
+export class RunScheduler {
+  private readonly _waiting: ScheduledRun[];
+  private readonly _onDepth?: (depth: number) => void;
+  private _running: boolean;
+  private _idle: Promise<void>;
+
+  constructor(opts?: RunSchedulerOptions) {
+    this._waiting = [];
+    this._onDepth = opts?.onDepth;
+    this._running = false;
+    this._idle = Promise.resolve();
+  }
+
+  // The number of runs waiting to start (not counting the one running).
+  get depth(): number {
+    return this._waiting.length;
+  }
+
+  // Resolves once there's nothing running or waiting.
+  get idle(): Promise<void> {
+    return this._idle;
+  }
+
+  schedule(run: ScheduledRun) {
+    const i = run.key === undefined ? -1 : this._waiting.findIndex((w) => w.key === run.key);
+    if (i >= 0) {
+      const old = this._waiting[i];
+      this._waiting[i] = run;
+      old.superseded();
+    } else {
+      this._waiting.push(run);
+      this._onDepth?.(this.depth);
+    }
+    if (!this._running) {
+      this._running = true;
+      this._idle = this.drain();
+    }
+  }
+
+  private async drain(): Promise<void> {
+    try {
+      while (this._waiting.length > 0) {
+        const run = this._waiting.shift()!;
+        this._onDepth?.(this.depth);
+        try {
+          await run.start();
+        } catch (e) {
+          // Reporting failures is up to the run itself.
+          console.error(e);
+        }
+      }
+    } finally {
+      this._running = false;
+    }
+  }
+}
@@ -0,0 +1,49 @@
+import { describe, expect, it } from 'vitest';
+import { MAX_REGISTERED_SCRIPTS, ScriptRegistry } from './script-registry';
+import { FiolinScript } from '../common/types';
+
+function mkScript(python: string): FiolinScript {
+  return {
+    meta: { title: 'title', description: 'desc' },
+    interface: { inputFiles: 'NONE', outputFiles: 'NONE' },
+    runtime: {},
+    code: { python },
+  };
+}
+
+describe('ScriptRegistry', () => {
+  it('only sends each script once', async () => {
+    const host = new ScriptRegistry();
+    const worker = new ScriptRegistry();
+    const script = mkScript('print(1)');
+    const first = await host.register(script);
+    expect(first.script).toBe(script);
+    expect(worker.resolve(first)).toBe(script);
+    const second = await host.register(mkScript('print(1)'));
+    expect(second).toEqual({ scriptHash: first.scriptHash });
+    expect(worker.resolve(second)).toBe(script);
+  });
+
+  it('forgets the least recently used script on both ends', async () => {
+    const host = new ScriptRegistry();
+    const worker = new ScriptRegistry();
+    const scripts = [...Array(MAX_REGISTERED_SCRIPTS + 1).keys()].map((i) => mkScript(`print(${i})`));
+    for (const s of scripts.slice(0, MAX_REGISTERED_SCRIPTS)) {
+      worker.resolve(await host.register(s));
+    }
+    // Using script 0 again makes script 1 the one to go.
+    worker.resolve(await host.register(scripts[0]));
+    worker.resolve(await host.register(scripts[MAX_REGISTERED_SCRIPTS]));
+    const again = await host.register(scripts[0]);
+    expect(again.script).toBeUndefined();
+    expect(worker.resolve(again)).toBe(scripts[0]);
+    const resent = await host.register(scripts[1]);
+    expect(resent.script).toBe(scripts[1]);
+    expect(worker.resolve(resent)).toBe(scripts[1]);
+  });
+
+  it('rejects unknown hashes', () => {
+    const worker = new ScriptRegistry();
+    expect(() => worker.resolve({ scriptHash: 'abc' })).toThrow(/unknown script hash/);
+  });
+});
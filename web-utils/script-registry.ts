@@ -0,0 +1,57 @@
+import { sha256Hex } from '../common/hash';
+import { FiolinScript } from '../common/types';
+
+// How many scripts a worker remembers.
+export const MAX_REGISTERED_SCRIPTS = 8;
+
+// The scripts a worker has been sent, by content hash, so that RUN messages
+// only have to carry a script the first time. The host and the worker each
+// keep one: the host's (which only needs the hashes) decides whether to send
+// the script along, and the worker's holds the scripts themselves. They
+// forget the least recently used script at the same moments, because the
+// worker sees RUN messages in the order the host registered them.
+export class ScriptRegistry {
+  private readonly _scripts: Map<string, FiolinScript | undefined>;
+
+  constructor() {
+    this._scripts = new Map();
+  }
+
+  // Host side: returns what the RUN message needs to carry.
+  async register(script: FiolinScript): Promise<{ scriptHash: string, script?: FiolinScript }> {
+    const scriptHash = await sha256Hex(JSON.stringify(script));
+    if (this.touch(scriptHash)) {
+      return { scriptHash };
+    }
+    this.add(scriptHash, undefined);
+    return { scriptHash, script };
+  }
+
+  // Worker side: returns the script a RUN message refers to.
+  resolve(msg: { scriptHash: string, script?: FiolinScript }): FiolinScript {
+    if (msg.script) {
+      this.add(msg.scriptHash, msg.script);
+      return msg.script;
+    }
+    if (!this.touch(msg.scriptHash)) {
+      throw new Error(`Worker was sent an unknown script hash ${msg.scriptHash}`);
+    }
+    return this._scripts.get(msg.scriptHash)!;
+  }
+
+  private touch(hash: string): boolean {
+    if (!this._scripts.has(hash)) return false;
+    const script = this._scripts.get(hash);
+    this._scripts.delete(hash);
+    this._scripts.set(hash, script);
+    return true;
+  }
+
+  private add(hash: string, script: FiolinScript | undefined) {
+    this._scripts.delete(hash);
+    this._scripts.set(hash, script);
+    if (this._scripts.size > MAX_REGISTERED_SCRIPTS) {
+      this._scripts.delete(this._scripts.keys().next().value!);
+    }
+  }
+}
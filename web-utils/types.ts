@@ -4,17 +4,23 @@ import { ExtractTagType } from '../common/tagged-unions';
 
 export type WorkerMessage = (
   LoadedMessage | LogMessage | InstallPackagesMessage |
-  PackagesInstalledMessage | RunMessage | SuccessMessage | ErrorMessage
+  PackagesInstalledMessage | RunMessage | SuccessMessage | ErrorMessage |
+  DeadlineMessage | SupersededMessage | QueueMessage
 );
 
 export type WorkerMessageType = ExtractTagType<WorkerMessage>;
 
-export interface LoadedMessage { type: 'LOADED' }
+export interface LoadedMessage {
+  type: 'LOADED';
+  // The worker's interrupt buffer, if it's in shared memory (see
+  // ../common/interrupt.ts), through which the host can stop runs.
+  interruptBuffer?: Int32Array;
+}
 
+// A batch of log entries, in order (see LogBatcher).
 export interface LogMessage {
   type: 'LOG';
-  level: FiolinLogLevel;
-  value: string;
+  entries: [FiolinLogLevel, string][];
 }
 
 export interface InstallPackagesMessage {
@@ -26,7 +32,10 @@ export interface PackagesInstalledMessage { type: 'PACKAGES_INSTALLED' }
 
 export interface RunMessage {
   type: 'RUN';
-  script: FiolinScript;
+  // The script's content hash; the script itself is only sent when the worker
+  // doesn't already have it (see ScriptRegistry).
+  scriptHash: string;
+  script?: FiolinScript;
   request: FiolinRunRequest;
   // Set/reset the canvases used in running pyodide. If left unset, it will run
   // with previously set canvases.
@@ -46,6 +55,24 @@ export interface ErrorMessage {
   response?: FiolinRunResponse;
 }
 
+// Sent by the worker when a run's deadline starts (with ms set) or stops
+// mattering (without). The host keeps the time, since the worker's thread is
+// busy running the script, and interrupts it through the shared buffer.
+export interface DeadlineMessage {
+  type: 'DEADLINE';
+  ms?: number;
+}
+
+// Sent in place of a result for a run that never started, because a later run
+// of the same kind replaced it (see FiolinScriptInterface.coalesceEvents).
+export interface SupersededMessage { type: 'SUPERSEDED' }
+
+// Sent whenever the number of runs waiting behind the current one changes.
+export interface QueueMessage {
+  type: 'QUEUE';
+  depth: number;
+}
+
 export function mkErrorMessage(e: unknown, lineno?: number, response?: FiolinRunResponse): ErrorMessage {
   const em: ErrorMessage = { type: 'ERROR', error: toErr(e), lineno, response };
   em.name = em.error.name;
@@ -0,0 +1,138 @@
+// Rows rendered beyond each edge of the visible area, so that small scrolls
+// don't show blank space before the next render.
+const OVERSCAN = 10;
+// Used until a row has actually been laid out.
+const FALLBACK_ROW_HEIGHT = 16;
+
+// Renders only the rows of a (possibly very long) list that are scrolled into
+// view within scroller, with spacers above and below standing in for the rest.
+// Rows may wrap onto several lines: each one's height is measured once it's
+// been rendered (and again if div changes width), and the rest are assumed to
+// be as tall as the first row measured. The items must be objects, since their
+// heights are remembered by identity. Re-renders itself when scroller is
+// scrolled or resized, unless div is hidden.
+export class VirtualRows<T extends object> {
+  private readonly scroller: HTMLElement;
+  private readonly div: HTMLElement;
+  private readonly renderRow: (item: T) => HTMLElement;
+  private readonly above: HTMLDivElement;
+  private readonly below: HTMLDivElement;
+  private count: number;
+  private get: (i: number) => T;
+  private rowHeight?: number;
+  private heights: WeakMap<T, number>;
+  private width?: number;
+  private pending: boolean;
+
+  constructor(scroller: HTMLElement, div: HTMLElement, renderRow: (item: T) => HTMLElement) {
+    this.scroller = scroller;
+    this.div = div;
+    this.renderRow = renderRow;
+    this.above = document.createElement('div');
+    this.below = document.createElement('div');
+    this.count = 0;
+    this.get = () => { throw new Error('VirtualRows has no rows') };
+    this.heights = new WeakMap();
+    this.pending = false;
+    this.scroller.addEventListener('scroll', () => this.scheduleRender());
+    // Also catches being shown again, e.g. by a class on some ancestor.
+    if (typeof ResizeObserver !== 'undefined') {
+      new ResizeObserver(() => this.scheduleRender()).observe(this.scroller);
+    }
+  }
+
+  private scheduleRender() {
+    if (this.pending || !this.visible()) return;
+    this.pending = true;
+    requestAnimationFrame(() => {
+      this.pending = false;
+      this.render();
+    });
+  }
+
+  setRows(count: number, get: (i: number) => T) {
+    this.count = count;
+    this.get = get;
+  }
+
+  // Renders the rows in view, first scrolling to the bottom if toBottom. Does
+  // nothing while div is hidden, since nothing can be measured; render again
+  // once it's shown.
+  render(opts?: { toBottom?: boolean }) {
+    if (!this.visible()) return;
+    const width = this.div.clientWidth;
+    if (width !== this.width) {
+      // Wrapping depends on the width.
+      this.width = width;
+      this.heights = new WeakMap();
+      this.rowHeight = undefined;
+    }
+    const est = this.estimateRowHeight();
+    const heights = new Array<number>(this.count);
+    let total = 0;
+    for (let i = 0; i < this.count; i++) {
+      heights[i] = this.heights.get(this.get(i)) ?? est;
+      total += heights[i];
+    }
+    if (opts?.toBottom) {
+      this.above.style.height = '0px';
+      this.below.style.height = `${total}px`;
+      this.div.replaceChildren(this.above, this.below);
+      this.scroller.scrollTop = this.scroller.scrollHeight;
+    }
+    // Where the visible area starts, relative to the top of div.
+    const viewTop = this.scroller.getBoundingClientRect().top - this.div.getBoundingClientRect().top;
+    let first = 0;
+    let top = 0;
+    while (first < this.count && top + heights[first] <= viewTop) {
+      top += heights[first++];
+    }
+    for (let n = 0; n < OVERSCAN && first > 0; n++) {
+      top -= heights[--first];
+    }
+    let end = first;
+    let bottom = top;
+    while (end < this.count && bottom < viewTop + this.scroller.clientHeight) {
+      bottom += heights[end++];
+    }
+    end = Math.min(this.count, end + OVERSCAN);
+    const rows: HTMLElement[] = [];
+    for (let i = first; i < end; i++) {
+      rows.push(this.renderRow(this.get(i)));
+    }
+    this.above.style.height = `${top}px`;
+    this.div.replaceChildren(this.above, ...rows, this.below);
+    // Now that they're laid out, the rendered rows' real heights are known.
+    let rendered = 0;
+    for (let i = first; i < end; i++) {
+      const h = rows[i - first].getBoundingClientRect().height;
+      this.heights.set(this.get(i), h);
+      rendered += h;
+      total += h - heights[i];
+    }
+    this.below.style.height = `${total - top - rendered}px`;
+    if (opts?.toBottom) {
+      this.scroller.scrollTop = this.scroller.scrollHeight;
+    }
+  }
+
+  // Hidden elements (or ones in hidden ancestors) have no layout boxes.
+  private visible(): boolean {
+    return this.div.getClientRects().length > 0;
+  }
+
+  private estimateRowHeight(): number {
+    if (this.rowHeight) return this.rowHeight;
+    if (this.count === 0) return FALLBACK_ROW_HEIGHT;
+    const first = this.get(0);
+    const row = this.renderRow(first);
+    this.div.replaceChildren(row);
+    const h = row.getBoundingClientRect().height;
+    if (h > 0) {
+      this.heights.set(first, h);
+      this.rowHeight = h;
+      return h;
+    }
+    return FALLBACK_ROW_HEIGHT;
+  }
+}
@@ -0,0 +1,70 @@
+// Compiled WebAssembly.Modules persisted in IndexedDB, keyed by URL. Not every
+// browser can store modules (Chrome stopped allowing it), in which case this
+// is just streaming compilation.
+const DB_NAME = 'fiolin-wasm';
+const STORE_NAME = 'modules';
+
+interface StoredModule {
+  // The ETag (or Last-Modified) of the response the module was compiled from.
+  version: string;
+  module: WebAssembly.Module;
+}
+
+function promisify<T>(req: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+  });
+}
+
+function openDb(): Promise<IDBDatabase> {
+  const req = indexedDB.open(DB_NAME, 1);
+  req.onupgradeneeded = () => { req.result.createObjectStore(STORE_NAME) };
+  return promisify(req);
+}
+
+async function getStored(db: IDBDatabase, key: string): Promise<StoredModule | undefined> {
+  return await promisify(db.transaction(STORE_NAME).objectStore(STORE_NAME).get(key));
+}
+
+async function putStored(db: IDBDatabase, key: string, stored: StoredModule): Promise<void> {
+  await promisify(db.transaction(STORE_NAME, 'readwrite').objectStore(STORE_NAME).put(stored, key));
+}
+
+async function compileResponse(resp: Response): Promise<WebAssembly.Module> {
+  // Streaming compilation requires the right MIME type.
+  if ('compileStreaming' in WebAssembly && resp.headers.get('content-type')?.startsWith('application/wasm')) {
+    return await WebAssembly.compileStreaming(resp);
+  }
+  return await WebAssembly.compile(await resp.arrayBuffer());
+}
+
+// Compiles the module at url, or reuses the copy compiled from the same
+// version of it last time. The request itself is still made (and is usually
+// answered by the HTTP cache), so that a new deployment is never masked by a
+// stale module.
+export async function compileWasm(url: URL): Promise<WebAssembly.Module> {
+  const resp = await fetch(url);
+  if (!resp.ok) {
+    throw new Error(`Failed to fetch ${url}: ${resp.status} ${resp.statusText}`);
+  }
+  const version = resp.headers.get('etag') || resp.headers.get('last-modified');
+  // Without a version there's no telling when a stored module is stale.
+  const db = version && 'indexedDB' in self ? await openDb().catch(() => undefined) : undefined;
+  if (!db || !version) {
+    return await compileResponse(resp);
+  }
+  try {
+    const stored = await getStored(db, url.href).catch(() => undefined);
+    if (stored?.version === version && stored.module instanceof WebAssembly.Module) {
+      await resp.body?.cancel();
+      return stored.module;
+    }
+    const module = await compileResponse(resp);
+    // Fails with a DataCloneError where modules can't be stored.
+    await putStored(db, url.href, { version, module }).catch(() => {});
+    return module;
+  } finally {
+    db.close();
+  }
+}
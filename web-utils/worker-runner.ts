@@ -0,0 +1,153 @@
+import { Deferred } from '../common/deferred';
+import { interrupt } from '../common/interrupt';
+import { FiolinRunner, FiolinRunRequest, FiolinRunResponse, FiolinScript } from '../common/types';
+import { ITypedWorker } from './typed-worker';
+import { ScriptRegistry } from './script-registry';
+import { WorkerMessage } from './types';
+
+// Presents a web worker (see ../web-worker/worker.ts) as a FiolinRunner. The
+// owner of the worker still receives all of its messages, and must pass each
+// one to consume(), which takes the ones answering this runner's requests.
+// Only one request is outstanding at a time, but the owner may also post runs
+// of its own (see postRun).
+export class WorkerRunner implements FiolinRunner {
+  private readonly _worker: ITypedWorker;
+  private readonly _scripts: ScriptRegistry;
+  private _pendingRun?: Deferred<FiolinRunResponse>;
+  private _pendingInstall?: Deferred<void>;
+  private _setCanvases?: Record<string, OffscreenCanvas>;
+  private _loaded: boolean;
+  private _loadError?: Error;
+  private _interruptBuffer?: Int32Array;
+  private _deadline?: ReturnType<typeof setTimeout>;
+
+  constructor(worker: ITypedWorker) {
+    this._worker = worker;
+    this._scripts = new ScriptRegistry();
+    this._loaded = false;
+  }
+
+  get busy(): boolean {
+    return !!(this._pendingRun || this._pendingInstall);
+  }
+
+  // Returns true if msg was the answer to an outstanding request (in which
+  // case its owner should otherwise ignore it).
+  consume(msg: WorkerMessage): boolean {
+    if (this._pendingRun && msg.type === 'SUCCESS') {
+      this.takeRun().resolve(msg.response);
+    } else if (this._pendingRun && msg.type === 'ERROR') {
+      this.takeRun().resolve(
+        msg.response ?
+        { ...msg.response, error: msg.error, lineno: msg.lineno } :
+        { outputs: [], log: [], error: msg.error, lineno: msg.lineno });
+    } else if (this._pendingRun && msg.type === 'SUPERSEDED') {
+      this.takeRun().reject(new Error('Run was superseded by a later one'));
+    } else if (this._pendingInstall && msg.type === 'PACKAGES_INSTALLED') {
+      this.takeInstall().resolve();
+    } else if (this._pendingInstall && msg.type === 'ERROR') {
+      this.takeInstall().reject(msg.error);
+    } else if (msg.type === 'DEADLINE') {
+      this.setDeadline(msg.ms);
+    } else {
+      // A worker that fails to load reports it once and then never answers
+      // again, so later requests have to fail here instead.
+      if (msg.type === 'LOADED') {
+        this._loaded = true;
+        this._interruptBuffer = msg.interruptBuffer;
+      } else if (msg.type === 'ERROR' && !this._loaded) {
+        this._loadError = msg.error;
+        this.fail(msg.error);
+      }
+      return false;
+    }
+    return true;
+  }
+
+  // Fails any outstanding request (e.g., when the worker itself errors).
+  fail(error: Error) {
+    if (this._pendingRun) {
+      this.takeRun().reject(error);
+    }
+    if (this._pendingInstall) {
+      this.takeInstall().reject(error);
+    }
+  }
+
+  // Stops the worker's current run (if any) without having to replace the
+  // worker; the run fails with a RunInterruptedError. Returns false if the
+  // worker can't be interrupted (i.e., the page isn't cross-origin isolated).
+  cancel(): boolean {
+    if (!this._interruptBuffer) return false;
+    interrupt(this._interruptBuffer, 'CANCELLED');
+    return true;
+  }
+
+  private setDeadline(ms?: number) {
+    clearTimeout(this._deadline);
+    this._deadline = undefined;
+    const buffer = this._interruptBuffer;
+    if (ms !== undefined && buffer) {
+      this._deadline = setTimeout(() => interrupt(buffer, 'TIMEOUT'), ms);
+    }
+  }
+
+  // Sent along with the next RUN message.
+  setCanvases(canvases: Record<string, OffscreenCanvas>) {
+    this._setCanvases = { ...this._setCanvases, ...canvases };
+  }
+
+  installPkgs(script: FiolinScript): Promise<void> {
+    if (this._loadError) {
+      return Promise.reject(this._loadError);
+    } else if (this.busy) {
+      return Promise.reject(new Error('WorkerRunner is already busy'));
+    }
+    this._pendingInstall = new Deferred();
+    this._worker.postMessage({ type: 'INSTALL_PACKAGES', script });
+    return this._pendingInstall.promise;
+  }
+
+  run(script: FiolinScript, request: FiolinRunRequest): Promise<FiolinRunResponse> {
+    if (this._loadError) {
+      return Promise.reject(this._loadError);
+    } else if (this.busy) {
+      return Promise.reject(new Error('WorkerRunner is already busy'));
+    }
+    const pending = new Deferred<FiolinRunResponse>();
+    this._pendingRun = pending;
+    this.postRun(script, request).catch((e) => {
+      if (this._pendingRun === pending) {
+        this.takeRun().reject(e);
+      }
+    });
+    return pending.promise;
+  }
+
+  // Sends a RUN message without waiting for (or consuming) its result, which
+  // the owner has to handle itself. Every RUN message to the worker has to go
+  // through here or run(), since they have to agree on what scripts the
+  // worker has already been sent.
+  async postRun(script: FiolinScript, request: FiolinRunRequest, setCanvases?: Record<string, OffscreenCanvas>) {
+    const registered = await this._scripts.register(script);
+    if (this._setCanvases) {
+      setCanvases = { ...this._setCanvases, ...setCanvases };
+      this._setCanvases = undefined;
+    }
+    this._worker.postMessage(
+      { type: 'RUN', ...registered, request, setCanvases },
+      setCanvases ? Object.values(setCanvases) : undefined);
+  }
+
+  private takeRun(): Deferred<FiolinRunResponse> {
+    const pending = this._pendingRun!;
+    this._pendingRun = undefined;
+    return pending;
+  }
+
+  private takeInstall(): Deferred<void> {
+    const pending = this._pendingInstall!;
+    this._pendingInstall = undefined;
+    return pending;
+  }
+}
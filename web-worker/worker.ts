@@ -1,14 +1,30 @@
 import { PyodideRunner } from '../common/runner';
+import { PyodideRunnerPool } from '../common/runner-pool';
 import { ThirdPartyValidator } from '../common/third-party-validator';
 import { parseAs } from '../common/parse';
 import { mkErrorMessage, InstallPackagesMessage, RunMessage, WorkerMessage } from '../web-utils/types';
 import { onlineWasmLoaders } from '../web-utils/loaders';
 import { pWorkerMessage } from '../web-utils/parse-msg';
-import { FiolinScript, ICanvasRenderingContext2D, OutputValidator } from '../common/types';
+import { FiolinRunner, FiolinRunRequest, FiolinScript, ICanvasRenderingContext2D, OutputValidator } from '../common/types';
+import { MemorySnapshotStore } from '../common/snapshot';
+import { PackageCache } from '../common/pkg-cache';
+import { BrowserPackageCacheStorage } from '../web-utils/pkg-cache-storage';
+import { WorkerFsInputMounter } from '../common/input-mount';
+import { LogBatcher } from '../web-utils/log-batcher';
+import { ScriptRegistry } from '../web-utils/script-registry';
+import { MemoizingRunner, RunCache } from '../common/run-cache';
+import { BrowserRunCacheStorage } from '../web-utils/run-cache-storage';
+import { RunScheduler } from '../web-utils/run-scheduler';
+import { canShareInterrupts, mkInterruptBuffer, Watchdog } from '../common/interrupt';
 
 // Typed messaging
 const _rawPost = self.postMessage;
+const logs = new LogBatcher((entries) => postMessage({ type: 'LOG', entries }));
 function postMessage(msg: WorkerMessage) {
+  // Anything else (e.g., the run's result) has to arrive after the logs so far.
+  if (msg.type !== 'LOG') {
+    logs.flush();
+  }
   try {
     _rawPost(msg);
   } catch (e) {
@@ -21,7 +37,31 @@ self.onmessage = async (e) => {
   await onMessage(msg);
 }
 
-let runner: PyodideRunner | undefined = undefined;
+// Shared by all the interpreters in the pool, which only run one at a time.
+// Each only watches it during its runs (not, e.g., while a replacement installs
+// packages in the background), so the host's interrupts reach the current run.
+const interruptBuffer = mkInterruptBuffer();
+
+// With shared memory, the host keeps time for the deadlines (see
+// DeadlineMessage), so that they also stop scripts that never yield.
+class HostWatchdog extends Watchdog {
+  arm(_: Int32Array, ms: number) {
+    postMessage({ type: 'DEADLINE', ms });
+  }
+
+  disarm() {
+    postMessage({ type: 'DEADLINE' });
+  }
+
+  // The host's deadline may belong to another interpreter's run by now.
+  async close() {}
+}
+
+// A long session shouldn't be able to grow an interpreter until the tab runs
+// out of memory.
+const RECYCLE_HEAP_BYTES = 1024 * 1024 * 1024;
+
+let runner: FiolinRunner | undefined = undefined;
 async function load(): Promise<void> {
   try {
     const type = new URLSearchParams(self.location.search).get('type');
@@ -31,19 +71,39 @@ async function load(): Promise<void> {
     } else if (type !== '1P' && type !== 'PLAYGROUND') {
       throw new Error(`Worker must be given a valid type parameter in URL; got ${type}`);
     }
-    const tmp = new PyodideRunner({
+    // Shared by all the interpreters in the pool. The snapshots let new
+    // interpreters skip micropip, and the package cache persists micropip
+    // downloads across page loads. The builtin pyodide packages come from the
+    // CDN and are left to the HTTP cache.
+    const snapshots = new MemorySnapshotStore();
+    const pkgCache = 'caches' in self ?
+      new PackageCache(new BrowserPackageCacheStorage('fiolin-packages')) :
+      undefined;
+    const tmp = new PyodideRunnerPool(() => new PyodideRunner({
       console: {
-        debug: (s) => postMessage({ type: 'LOG', level: 'DEBUG', value: s }),
-        info: (s) => postMessage({ type: 'LOG', level: 'INFO', value: s }),
-        warn: (s) => postMessage({ type: 'LOG', level: 'WARN', value: s }),
-        error: (s) => postMessage({ type: 'LOG', level: 'ERROR', value: s }),
+        debug: (s) => logs.log('DEBUG', s),
+        info: (s) => logs.log('INFO', s),
+        warn: (s) => logs.log('WARN', s),
+        error: (s) => logs.log('ERROR', s),
       },
       loaders: onlineWasmLoaders(),
       validators,
-    });
+      snapshots,
+      pkgCache,
+      // Read inputs straight from the Files rather than copying them in.
+      inputMounter: WorkerFsInputMounter.available() ? new WorkerFsInputMounter() : undefined,
+      interruptBuffer,
+      watchdog: canShareInterrupts() ? new HostWatchdog() : undefined,
+      // Builds only come from our own server; the playground and third-party
+      // scripts always go the long way.
+      trustBuilds: type === '1P',
+    }), { recycleHeapBytes: RECYCLE_HEAP_BYTES });
     await tmp.loaded;
-    runner = tmp;
-    postMessage({ type: 'LOADED' });
+    // Results of deterministic scripts are remembered across page loads.
+    runner = 'indexedDB' in self ?
+      new MemoizingRunner(tmp, new RunCache(new BrowserRunCacheStorage('fiolin-runs'))) :
+      tmp;
+    postMessage({ type: 'LOADED', interruptBuffer: canShareInterrupts() ? interruptBuffer : undefined });
   } catch (e) {
     postMessage(mkErrorMessage(e));
   }
@@ -56,22 +116,53 @@ async function onMessage(msg: WorkerMessage): Promise<void> {
   if (msg.type === 'INSTALL_PACKAGES') {
     await onInstallPackages(msg);
   } else if (msg.type === 'RUN') {
-    await onRun(msg);
+    onRun(msg);
   } else {
     throw new Error(`Expected INSTALL_PACKAGES or RUN message; got ${msg}`);
   }
 }
 
 let ctx2ds: Record<string, ICanvasRenderingContext2D> | undefined;
-async function onRun(msg: RunMessage): Promise<void> {
-  await loaded;
-  if (!runner) throw new Error(`runner missing after loaded completed`);
+const scripts = new ScriptRegistry();
+const scheduler = new RunScheduler({ onDepth: (depth) => postMessage({ type: 'QUEUE', depth }) });
+
+// Runs handling events that the script lets supersede one another (see
+// FiolinScriptInterface.coalesceEvents) are keyed by the kind of event and the
+// component it came from.
+function coalescingKey(script: FiolinScript, request: FiolinRunRequest): string | undefined {
+  const ev = request.event;
+  if (!script.interface.coalesceEvents || !ev) return undefined;
+  return JSON.stringify([ev.type, ev.subtype, ev.target.name, ev.target.value]);
+}
+
+function onRun(msg: RunMessage) {
+  // Resolved before any awaiting, so that the registry sees the RUN messages in
+  // the order they were sent.
+  let script: FiolinScript;
+  try {
+    script = scripts.resolve(msg);
+  } catch (e) {
+    postMessage(mkErrorMessage(e));
+    return;
+  }
+  // Taken on receipt, so that they aren't lost along with a superseded run.
   if (msg.setCanvases !== undefined) {
     ctx2ds = Object.fromEntries(Object.entries(msg.setCanvases).map(([k, c]) => [k, c.getContext('2d')!]));
   }
+  const canvases = ctx2ds;
+  const key = coalescingKey(script, msg.request);
+  scheduler.schedule({
+    key,
+    start: () => run(script, { ...msg.request, canvases }),
+    superseded: () => postMessage({ type: 'SUPERSEDED' }),
+  });
+}
+
+async function run(script: FiolinScript, request: FiolinRunRequest): Promise<void> {
+  await loaded;
+  if (!runner) throw new Error(`runner missing after loaded completed`);
   try {
-    msg.request.canvases = ctx2ds;
-    const response = await runner.run(msg.script, msg.request);
+    const response = await runner.run(script, request);
     if (response.error) {
       postMessage(mkErrorMessage(response.error, response.lineno, response));
     } else {